@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark for text_cleaning.clean_article_text
+Confronta il motore compilato con l'implementazione originale (riportata qui sotto
+senza modifiche) su un corpus fisso: gli output devono essere identici.
+
+Usage:
+    python benchmark_clean_text.py [--texts N] [--rounds N] [--db data.sqlite]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_connection import connect_monitor
+from db_writer import SchemaCapabilities
+from text_cleaning import clean_article_text
+
+# Configuration constants
+CORPUS_SEED = 20240101
+DEFAULT_TEXTS = 2000
+DEFAULT_ROUNDS = 3
+
+
+def clean_article_text_reference(text):
+    """Implementazione originale di scraper_optimized.clean_article_text (riferimento)"""
+    if not text:
+        return ""
+    
+    # Remove multiple whitespaces and normalize line breaks
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n\s*\n', '\n', text)
+    
+    # Remove common artifacts
+    text = re.sub(r'\s*\.\s*\n', '.\n', text)
+    text = re.sub(r'\s*;\s*\n', ';\n', text)
+    
+    # Clean up common legal document artifacts
+    text = re.sub(r'\s*\(\s*\)', '', text)  # Empty parentheses
+    text = re.sub(r'\s*\[\s*\]', '', text)  # Empty brackets
+    
+    # Remove navigation patterns
+    navigation_patterns = [
+        r'nascondi.*?visualizza.*?atto.*?intero',
+        r'precedente.*?successivo',
+        r'stampa.*?questa.*?pagina',
+        r'torna.*?su',
+        r'vai.*?al.*?contenuto',
+        r'menu.*?di.*?navigazione',
+        r'testo.*?in.*?vigore.*?dal.*?\d{2}/\d{2}/\d{4}',
+        r'vigente.*?al.*?\d{2}/\d{2}/\d{4}',
+        r'Gazzetta.*?Ufficiale',
+        r'visualizza.*?atto.*?intero',
+        r'elemento.*?grafico',
+        r'articolo.*?precedente',
+        r'articolo.*?successivo',
+        r'mostra.*?nascond[i|ere]',
+        r'chiudi.*?apri',
+        r'cerca.*?ricerca',
+        r'home.*?indietro',
+        r'condividi.*?stampa',
+        r'\(GU\s+n\.\d+\s+del\s+\d{2}-\d{2}-\d{4}\)',
+        r'visualizza\s+atto\s+intero',
+        r'nascondi\s*$',
+        r'vigente\s+al\s+\d{2}/\d{2}/\d{4}',
+    ]
+    
+    for pattern in navigation_patterns:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+    
+    return text.strip()
+
+
+# Frammenti del corpus: testo normativo, residui di navigazione, casi limite
+LEGAL_FRAGMENTS = [
+    "1. Le disposizioni del presente decreto si applicano a decorrere dal 1° gennaio 2024.",
+    "2. Il Ministro dell'economia e delle finanze, con proprio decreto, stabilisce le modalità di attuazione;",
+    "3. All'articolo 5, comma 2, della legge 7 agosto 1990, n. 241, le parole: «trenta giorni» sono sostituite dalle seguenti: «sessanta giorni».",
+    "a) per le imprese di cui al comma 1;\nb) per gli enti pubblici non economici.",
+    "Il presente decreto, munito del sigillo dello Stato, sarà inserito nella Raccolta ufficiale.",
+    "Dato a Roma, addì 12 marzo 2024",
+    "((Comma abrogato dal D.Lgs. 10 marzo 2023, n. 24))",
+    "Si applicano le sanzioni amministrative pecuniarie da euro 500 a euro 3.000.",
+    "L'Agenzia delle entrate provvede alla ricerca e alla verifica dei dati.",
+    "Il testo e' stato aggiornato; la norma e' vigente e si applica su tutto il territorio.",
+]
+
+NAVIGATION_FRAGMENTS = [
+    "nascondi", "Nascondi", "visualizza atto intero", "Visualizza   atto\nintero",
+    "articolo precedente", "articolo successivo", "Stampa questa pagina", "Torna su",
+    "vai al contenuto", "Menu di navigazione", "Testo in vigore dal: 01/02/2024",
+    "vigente al 15/03/2024", "Gazzetta Ufficiale", "(GU n.45 del 23-02-2024)",
+    "elemento grafico", "mostra/nascondi", "chiudi | apri", "cerca nella ricerca avanzata",
+    "Home > Indietro", "condividi e stampa", "precedente | successivo",
+]
+
+EDGE_FRAGMENTS = [
+    "()", "( )", "[ ]", "[()]", "([])", "[ ( ) ]", "((  ))", "[[]]",
+    "\n\n\t ", " . \n", " ; \n", "  \r\n  ",
+    "ſtampa queſta pagina", "ſu", "İl menu dı navigazione", "\u212aELVIN torna",
+    "VIGENTE AL 01/01/2000", "(gu n.1 del 01-01-2000)", "mostra nascondere",
+]
+
+
+def build_corpus(count=DEFAULT_TEXTS, seed=CORPUS_SEED):
+    """Corpus fisso e riproducibile di testi di articoli"""
+    rng = random.Random(seed)
+    corpus = ["", " ", "nascondi", "Articolo 1\n\nnascondi  \n"]
+    for index in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 40)):
+            roll = rng.random()
+            if roll < 0.75:
+                parts.append(rng.choice(LEGAL_FRAGMENTS))
+            elif roll < 0.92:
+                parts.append(rng.choice(NAVIGATION_FRAGMENTS))
+            else:
+                parts.append(rng.choice(EDGE_FRAGMENTS))
+        # Un terzo dei testi senza navigazione: il caso comune per gli articoli già puliti
+        if index % 3 == 0:
+            parts = [part for part in parts if part in LEGAL_FRAGMENTS] or [LEGAL_FRAGMENTS[0]]
+        corpus.append(rng.choice(["\n", " ", "\n\n", "  "]).join(parts))
+    return corpus
+
+
+def load_database_texts(db_path, limit):
+    """Testi reali di articoli e allegati già salvati"""
+    # Sola lettura: un percorso errato non crea un database vuoto
+    conn = connect_monitor(db_path)
+    try:
+        text_source = SchemaCapabilities.from_connection(conn).article_text_source
+        rows = conn.execute(
+            f"SELECT testo_completo FROM {text_source} WHERE testo_completo IS NOT NULL LIMIT ?", (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+
+def check_equivalence(corpus):
+    """Restituisce i testi per cui i due motori producono output diversi"""
+    return [text for text in corpus if clean_article_text(text) != clean_article_text_reference(text)]
+
+
+def time_engine(engine, corpus, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in corpus:
+            engine(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_article_text against the original implementation")
+    parser.add_argument('--texts', type=int, default=DEFAULT_TEXTS, help='Synthetic corpus size')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help='Timing rounds (best is reported)')
+    parser.add_argument('--db', help='Also use article texts from this database (e.g. data.sqlite)')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.texts)
+    if args.db:
+        corpus.extend(load_database_texts(args.db, args.texts))
+    total_chars = sum(len(text) for text in corpus)
+    print(f"Corpus: {len(corpus)} texts, {total_chars / 1e6:.2f} M chars")
+
+    mismatches = check_equivalence(corpus)
+    if mismatches:
+        print(f"❌ {len(mismatches)} texts differ from the reference, first: {mismatches[0][:200]!r}")
+        sys.exit(1)
+    print("✅ Output identical to the reference implementation")
+
+    reference = time_engine(clean_article_text_reference, corpus, args.rounds)
+    compiled = time_engine(clean_article_text, corpus, args.rounds)
+    print(f"Reference: {reference:.3f}s ({total_chars / reference / 1e6:.1f} M chars/s)")
+    print(f"Compiled:  {compiled:.3f}s ({total_chars / compiled / 1e6:.1f} M chars/s)")
+    print(f"Speedup:   {reference / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
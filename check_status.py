@@ -9,13 +9,16 @@ import json
 from datetime import datetime
 from collections import defaultdict
 
+from db_connection import connect_monitor
+from db_writer import SchemaCapabilities
+
 def check_database_status():
     """Check the current status of the database"""
     print("📊 NORMATTIVA DATABASE STATUS")
     print("=" * 50)
     
     try:
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_monitor()
         cursor = conn.cursor()
         
         # Basic statistics
@@ -59,11 +62,12 @@ def check_database_status():
         for tipo, count in type_stats:
             print(f"   {tipo}: {count}")
         
-        # Articles with content
-        cursor.execute("SELECT COUNT(*) FROM articoli WHERE testo_completo IS NOT NULL AND LENGTH(testo_completo) > 0")
+        # Articles with content (testi nel deposito testi_articoli: letti dalla vista articoli_testo)
+        text_source = SchemaCapabilities.from_connection(conn).article_text_source
+        cursor.execute(f"SELECT COUNT(*) FROM {text_source} WHERE testo_completo IS NOT NULL AND LENGTH(testo_completo) > 0")
         articles_with_content = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM articoli WHERE testo_pulito IS NOT NULL AND LENGTH(testo_pulito) > 0")
+        cursor.execute(f"SELECT COUNT(*) FROM {text_source} WHERE testo_pulito IS NOT NULL AND LENGTH(testo_pulito) > 0")
         articles_with_clean_text = cursor.fetchone()[0]
         
         print(f"\n📝 Content Quality:")
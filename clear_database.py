@@ -8,6 +8,8 @@ import os
 import sys
 from datetime import datetime
 
+from db_connection import connect_database, connect_monitor
+
 def clear_database(confirm=True):
     """
     Pulisce completamente il database rimuovendo tutti i dati dalle tabelle
@@ -28,7 +30,7 @@ def clear_database(confirm=True):
             return False
     
     try:
-        conn = sqlite3.connect(database_path)
+        conn = connect_database(database_path)
         cursor = conn.cursor()
         
         # Ottieni statistiche prima della pulizia
@@ -37,6 +39,7 @@ def clear_database(confirm=True):
         tables_to_check = [
             ('documenti_normativi', 'Documenti normativi'),
             ('articoli', 'Articoli'),
+            ('testi_articoli', 'Testi articoli'),
             ('articoli_versioni', 'Versioni articoli'),
             ('modifiche_normative', 'Modifiche normative'),
             ('citazioni_normative', 'Citazioni normative')
@@ -68,6 +71,7 @@ def clear_database(confirm=True):
             'modifiche_normative',  # Dipende da articoli_versioni
             'articoli_versioni',    # Dipende da articoli
             'articoli',             # Dipende da documenti_normativi  
+            'testi_articoli',       # Testi per hash: dopo articoli (l'indice FTS li legge alla cancellazione)
             'documenti_normativi'   # Tabella principale
         ]
         
@@ -156,14 +160,16 @@ def show_database_info():
         return
     
     try:
-        conn = sqlite3.connect(database_path)
+        conn = connect_monitor(database_path)
         cursor = conn.cursor()
         
         print("📊 INFORMAZIONI DATABASE:")
         print(f"📁 Path: {os.path.abspath(database_path)}")
         
-        # Dimensione file
+        # Dimensione file (in WAL le pagine non ancora copiate dal checkpoint sono nel file -wal)
         file_size = os.path.getsize(database_path)
+        if os.path.exists(database_path + '-wal'):
+            file_size += os.path.getsize(database_path + '-wal')
         if file_size < 1024:
             size_str = f"{file_size} bytes"
         elif file_size < 1024*1024:
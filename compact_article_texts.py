@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compattazione dei testi degli articoli in data.sqlite
+Le righe salvate prima del deposito testi_articoli hanno testo_completo e testo_pulito
+in linea, ripetuti per ogni versione orig/agg.N anche quando il testo non cambia.
+Questo script sposta i testi nel deposito (una copia per hash), lascia nella riga ''
+e gli hash, poi esegue VACUUM per restituire lo spazio al file system.
+
+La lettura resta trasparente tramite la vista articoli_testo.
+
+Usage:
+    python compact_article_texts.py [db_path] [--no-vacuum]
+"""
+
+import os
+import sys
+
+from db_connection import connect_database
+from db_writer import DEFAULT_DB_PATH, SQL_INSERT_TESTO, ensure_text_store, text_hash
+
+# Configuration constants
+COMPACT_BATCH_SIZE = 1000  # Righe convertite per transazione
+
+
+def compact_article_texts(db_path=DEFAULT_DB_PATH, vacuum=True):
+    """Sposta i testi in linea nel deposito testi_articoli; restituisce le statistiche"""
+    stats = {'rows': 0, 'texts_stored': 0, 'texts_shared': 0}
+    conn = connect_database(db_path)
+    try:
+        ensure_text_store(conn)
+        while True:
+            rows = conn.execute("""
+                SELECT id, testo_completo, testo_pulito FROM articoli
+                WHERE (hash_testo_completo IS NULL AND LENGTH(testo_completo) > 0)
+                   OR (hash_testo_pulito IS NULL AND LENGTH(testo_pulito) > 0)
+                LIMIT ?
+            """, [COMPACT_BATCH_SIZE]).fetchall()
+            if not rows:
+                break
+
+            for article_id, testo_completo, testo_pulito in rows:
+                hashes = []
+                for text in (testo_completo, testo_pulito):
+                    if not text:
+                        hashes.append(None)
+                        continue
+                    digest = text_hash(text)
+                    if conn.execute(SQL_INSERT_TESTO, [digest, text]).rowcount:
+                        stats['texts_stored'] += 1
+                    else:
+                        stats['texts_shared'] += 1
+                    hashes.append(digest)
+                conn.execute("""
+                    UPDATE articoli SET
+                        testo_completo = CASE WHEN ? IS NULL THEN testo_completo ELSE '' END,
+                        testo_pulito = CASE WHEN ? IS NULL THEN testo_pulito ELSE '' END,
+                        hash_testo_completo = COALESCE(?, hash_testo_completo),
+                        hash_testo_pulito = COALESCE(?, hash_testo_pulito)
+                    WHERE id = ?
+                """, [hashes[0], hashes[1], hashes[0], hashes[1], article_id])
+            conn.commit()
+            stats['rows'] += len(rows)
+
+        if vacuum and stats['rows']:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return stats
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db_path = args[0] if args else DEFAULT_DB_PATH
+    if not os.path.exists(db_path):
+        print(f"❌ Database not found: {db_path}")
+        sys.exit(1)
+
+    size_before = os.path.getsize(db_path)
+    stats = compact_article_texts(db_path, vacuum='--no-vacuum' not in sys.argv)
+    size_after = os.path.getsize(db_path)
+
+    print(f"✅ Compacted {stats['rows']} article rows")
+    print(f"   Texts stored: {stats['texts_stored']}, duplicates shared: {stats['texts_shared']}")
+    print(f"   Size: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Async crawl engine for scraper_optimized.py
+Scarica i documenti di un anno in parallelo rispettando un limite globale di
+richieste contemporanee (vedi http_client.BoundedSession).
+
+Pipeline:
+- scoperta: i numeri 1..N vengono verificati in parallelo (finestra scorrevole)
+- i documenti trovati vengono messi, in ordine di numero, in una coda limitata
+- i worker di elaborazione prendono i documenti dalla coda ed eseguono
+  parsing, scraping degli articoli/versioni/allegati e salvataggio nel database
+
+Le funzioni dello scraper vengono passate come parametri, così il motore non
+importa scraper_optimized (che spesso gira come __main__).
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from existence_index import DOCUMENT_UNCHANGED
+
+# Configuration constants
+MAX_CONSECUTIVE_404S = 10  # Stesso criterio di arresto del ciclo sequenziale
+DISCOVERY_WINDOW_FACTOR = 2  # Numeri in verifica contemporaneamente = concurrency * fattore
+
+# Verifica fallita per un errore (timeout, 5xx...): non è un 404 e non conta per l'arresto
+DISCOVERY_FAILED = object()
+
+
+class AsyncCrawlEngine:
+    """Motore asyncio per lo scraping di un anno con concorrenza limitata"""
+
+    def __init__(self, session, discover_document, process_document,
+                 concurrency=4, max_consecutive_404s=MAX_CONSECUTIVE_404S):
+        """
+        Args:
+            session: sessione condivisa (BoundedSession) usata da tutte le fasi
+            discover_document: funzione (anno, numero, session) -> risultato di _get_permalinks,
+                None (non trovato) o DOCUMENT_UNCHANGED (già salvato, da saltare)
+            process_document: funzione (risultato, session=...) -> risultato di process_permalinks
+            concurrency: numero di worker per la scoperta e per l'elaborazione
+            max_consecutive_404s: numeri mancanti consecutivi prima di fermarsi
+        """
+        self.session = session
+        self.discover_document = discover_document
+        self.process_document = process_document
+        self.concurrency = max(1, int(concurrency))
+        self.max_consecutive_404s = max_consecutive_404s
+
+    def _discover_one(self, anno, numero):
+        """Verifica (in un thread) se il documento esiste e restituisce la pagina scaricata"""
+        try:
+            return self.discover_document(anno, numero, self.session)
+        except Exception as e:
+            print(f"❌ [async] Error discovering document {anno};{numero}: {e}")
+            return DISCOVERY_FAILED
+
+    def _process_one(self, numero, permalinks_result):
+        """Elabora (in un thread) un documento già scaricato"""
+        try:
+            print(f"Processing document {numero} (async engine)")
+            return self.process_document(permalinks_result, session=self.session)
+        except Exception as e:
+            print(f"❌ [async] Error processing document {numero}: {e}")
+            return None
+
+    async def _discover(self, anno, n_norme, queue, executor, stats):
+        """Scoperta con finestra scorrevole: i risultati vengono consumati in ordine di numero"""
+        loop = asyncio.get_running_loop()
+        window = self.concurrency * DISCOVERY_WINDOW_FACTOR
+        pending = {}
+        next_numero = 1
+        consecutive_404s = 0
+
+        for numero in range(1, n_norme + 1):
+            while next_numero <= n_norme and len(pending) < window:
+                pending[next_numero] = loop.run_in_executor(
+                    executor, self._discover_one, anno, next_numero
+                )
+                next_numero += 1
+
+            result = await pending.pop(numero)
+            if result is DISCOVERY_FAILED:
+                # Come nel ciclo sequenziale: riprovato alla prossima esecuzione
+                stats['failed'] += 1
+            elif result is None:
+                consecutive_404s += 1
+                stats['not_found'] += 1
+                print(f"⚠️ Document {numero} not found (consecutive 404s: {consecutive_404s})")
+                if consecutive_404s >= self.max_consecutive_404s:
+                    print(f"🛑 Stopping year {anno} processing after {consecutive_404s} consecutive 404s")
+                    break
+            elif result == DOCUMENT_UNCHANGED:
+                consecutive_404s = 0
+                stats['unchanged'] += 1
+            else:
+                consecutive_404s = 0
+                await queue.put((numero, result))
+
+        # Le verifiche oltre il punto di arresto vengono scartate
+        for future in pending.values():
+            future.cancel()
+        if pending:
+            await asyncio.gather(*pending.values(), return_exceptions=True)
+
+    async def _process_worker(self, queue, executor, stats):
+        """Worker di elaborazione: consuma la coda finché non riceve None"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                numero, permalinks_result = item
+                result = await loop.run_in_executor(executor, self._process_one, numero, permalinks_result)
+                if result is None:
+                    stats['failed'] += 1
+                else:
+                    stats['processed'] += 1
+            finally:
+                queue.task_done()
+
+    async def crawl_year(self, anno, n_norme):
+        """Scarica ed elabora i documenti 1..n_norme dell'anno indicato"""
+        stats = {'processed': 0, 'unchanged': 0, 'failed': 0, 'not_found': 0}
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='discovery') as discovery_executor, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='process') as process_executor:
+            workers = [
+                asyncio.create_task(self._process_worker(queue, process_executor, stats))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                await self._discover(anno, n_norme, queue, discovery_executor, stats)
+            finally:
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+
+        return stats
+
+
+def run_year_async(anno, n_norme, session, discover_document, process_document, concurrency=4):
+    """Punto di ingresso sincrono: esegue il motore async per un anno e restituisce le statistiche"""
+    engine = AsyncCrawlEngine(
+        session,
+        discover_document,
+        process_document,
+        concurrency=concurrency,
+    )
+    return asyncio.run(engine.crawl_year(anno, n_norme))
@@ -35,7 +35,7 @@ CREATE TABLE documenti_normativi (
     testo_completo TEXT,
     
     -- Metadata per RAG (stored as JSON for SQLite compatibility)
-    embedding_documento TEXT, -- JSON serialized embedding
+    embedding_documento BLOB, -- float32/int8 packed embedding (embedding_store.py)
     
     -- Audit
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -79,7 +79,7 @@ CREATE TABLE articoli (
     url_documento TEXT, -- URL del documento originale per debug/reference
     
     -- Embedding per similarity search
-    embedding_articolo TEXT, -- JSON serialized embedding
+    embedding_articolo BLOB, -- float32/int8 packed embedding (embedding_store.py)
     
     -- Status e date
     status VARCHAR(20) DEFAULT 'vigente',
@@ -100,7 +100,7 @@ CREATE TABLE commi (
     testo TEXT NOT NULL,
     
     -- Embedding per ricerche granulari
-    embedding_comma TEXT, -- JSON serialized embedding
+    embedding_comma BLOB, -- float32/int8 packed embedding (embedding_store.py)
     
     -- Lettere e numeri del comma
     ha_sottopunti BOOLEAN DEFAULT FALSE,
@@ -170,6 +170,29 @@ CREATE TABLE citazioni_normative (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Allegati non salvati (es. oltre il limite di dimensione) e motivo dello scarto
+CREATE TABLE allegati_scartati (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    documento_id INTEGER REFERENCES documenti_normativi(id),
+    numero_allegato VARCHAR(20),
+    url TEXT,
+    motivo VARCHAR(50), -- 'content_length', 'download_cap', 'text_length', 'http_error', 'request_error'
+    dimensione INTEGER, -- Byte (o caratteri per 'text_length') al momento dello scarto
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Stato di legal_ai_enhancer.py: righe già elaborate e con quale contenuto/versione
+CREATE TABLE stato_arricchimento (
+    tabella VARCHAR(30) NOT NULL, -- 'articoli', 'documenti_normativi'
+    riga_id INTEGER NOT NULL,
+    hash_contenuto CHAR(64) NOT NULL, -- sha256 del testo elaborato
+    versione_enhancer VARCHAR(100) NOT NULL, -- ENHANCER_VERSION/modello di embedding
+    aggiornato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    PRIMARY KEY (tabella, riga_id)
+);
+
 -- ========================================
 -- INDICI PER PERFORMANCE
 -- ========================================
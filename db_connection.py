@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Connection factory for data.sqlite
+Tutti gli script del repository aprono il database da qui, con uno di due profili:
+
+- "bulk": scraper, writer, populate_fonte_origine, legal_ai_enhancer, clear_database.
+  WAL, synchronous=NORMAL, page cache grande, mmap e temp_store in memoria.
+- "monitor": monitor_overnight, monitor_progress, check_status e le statistiche.
+  Sola lettura (URI mode=ro + query_only): in WAL i lettori non bloccano mai lo
+  scraper e un monitor non può scrivere né prendere lock di scrittura per errore.
+
+Il journal_mode WAL è persistente nel file: basta che una connessione "bulk" lo
+imposti una volta (init_optimized_database) perché valga per tutti.
+"""
+
+import os
+import sqlite3
+from urllib.parse import quote
+
+# Configuration constants
+DEFAULT_DB_PATH = 'data.sqlite'
+BULK_PROFILE = 'bulk'
+MONITOR_PROFILE = 'monitor'
+
+BULK_CACHE_SIZE_KB = 256 * 1024  # Page cache della connessione di scrittura (256 MB)
+MONITOR_CACHE_SIZE_KB = 16 * 1024  # Page cache dei monitor (16 MB)
+MMAP_SIZE = 1024 ** 3  # Byte del database letti via mmap (1 GB)
+WAL_SIZE_LIMIT = 64 * 1024 ** 2  # Dimensione a cui viene troncato il file -wal dopo un checkpoint
+BULK_BUSY_TIMEOUT = 30.0  # Secondi di attesa su un lock prima di "database is locked"
+MONITOR_BUSY_TIMEOUT = 5.0
+
+PROFILE_PRAGMAS = {
+    BULK_PROFILE: [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{BULK_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA journal_size_limit={WAL_SIZE_LIMIT}",
+    ],
+    MONITOR_PROFILE: [
+        "PRAGMA query_only=ON",
+        f"PRAGMA cache_size=-{MONITOR_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    ],
+}
+
+
+def connect_database(db_path=DEFAULT_DB_PATH, profile=BULK_PROFILE, check_same_thread=True):
+    """
+    Apre data.sqlite con il profilo richiesto.
+
+    Args:
+        db_path: file del database
+        profile: BULK_PROFILE (lettura/scrittura) o MONITOR_PROFILE (sola lettura)
+        check_same_thread: come sqlite3.connect (False per connessioni condivise tra thread)
+    """
+    if profile not in PROFILE_PRAGMAS:
+        raise ValueError(f"Unknown connection profile: {profile}")
+
+    if profile == MONITOR_PROFILE:
+        # mode=ro: il file non viene creato se manca e nessun lock di scrittura è possibile
+        uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=MONITOR_BUSY_TIMEOUT,
+                               check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(db_path, timeout=BULK_BUSY_TIMEOUT, check_same_thread=check_same_thread)
+
+    for pragma in PROFILE_PRAGMAS[profile]:
+        conn.execute(pragma)
+    return conn
+
+
+def connect_monitor(db_path=DEFAULT_DB_PATH):
+    """Connessione in sola lettura per monitor e statistiche"""
+    return connect_database(db_path, MONITOR_PROFILE)
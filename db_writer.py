@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+"""
+Batched database writer for NORMATTIVA-SCRAPE
+Un'unica connessione di lunga durata a data.sqlite usata da tutti i percorsi save_*
+di scraper_optimized.py al posto di connect/commit/close per ogni riga.
+
+- statement SQL fissi: il modulo sqlite3 li tiene compilati nella sua cache
+- commit ogni BATCH_SIZE righe o a fine documento quando non ci sono altri record in coda
+- executemany per le versioni di un articolo
+- SAVEPOINT per articolo: un errore annulla solo l'articolo, non il batch
+- testi degli articoli nel deposito testi_articoli, una copia per hash (le versioni
+  orig/agg.N identiche non ripetono il testo); la vista articoli_testo li ricompone
+
+Producer/consumer: i thread di fetch/parsing producono record (DocumentRecord,
+ArticleRecord, ArticleUpdateRecord, CitationRecord, SkippedAllegatoRecord) in una coda limitata; un solo thread writer possiede
+la connessione e li applica. Gli id servono solo dove un passo successivo li usa
+(documento_id per gli articoli) e arrivano tramite Future. Se il disco è lento la
+coda si riempie e submit() blocca i thread di crawling (back-pressure).
+"""
+
+import hashlib
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from db_connection import connect_database
+
+# Configuration constants
+DEFAULT_DB_PATH = 'data.sqlite'
+BATCH_SIZE = 500  # Righe scritte prima di un commit forzato
+WRITE_QUEUE_SIZE = 256  # Record in attesa oltre i quali i thread di crawling si fermano
+
+# ========================================
+# SQL STATEMENTS
+# ========================================
+
+SQL_FIND_DOCUMENTO = """
+    SELECT id, titoloAtto FROM documenti_normativi
+    WHERE urn = ? OR (numero = ? AND anno = ? AND tipo_atto = ?)
+"""
+
+SQL_INSERT_DOCUMENTO = """
+    INSERT INTO documenti_normativi (
+        numero, anno, tipo_atto, titoloAtto, data_pubblicazione,
+        materia_principale, status, livello_gerarchia,
+        url_normattiva, urn, testo_completo
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_FIND_ARTICOLO = "SELECT id, titoloAtto FROM articoli WHERE documento_id = ? AND numero_articolo = ?"
+
+SQL_FIND_ARTICOLO_VERSIONS = """
+    SELECT id, numero_articolo, tipo_versione, articolo_base_id FROM articoli
+    WHERE documento_id = ? ORDER BY id
+"""
+
+SQL_UPDATE_ARTICOLO_CONTENT = """
+    UPDATE articoli SET
+        titoloAtto = ?, testo_completo = ?, testo_pulito = ?, articoli_correlati = ?,
+        allegati = ?, data_attivazione = ?, data_cessazione = ?, url_documento = ?, status = ?
+    WHERE id = ?
+"""
+
+SQL_INSERT_ARTICOLO_VERSIONED = """
+    INSERT INTO articoli (
+        documento_id, numero_articolo, titoloAtto, testo_completo,
+        testo_pulito, articoli_correlati, allegati, data_attivazione,
+        data_cessazione, url_documento, status,
+        articolo_base_id, tipo_versione, numero_aggiornamento
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_INSERT_ARTICOLO_BASIC = """
+    INSERT INTO articoli (
+        documento_id, numero_articolo, titoloAtto, testo_completo,
+        testo_pulito, articoli_correlati, allegati, data_attivazione,
+        data_cessazione, url_documento, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Varianti con deposito dei testi: le righe terminano con gli hash dei due testi
+SQL_UPDATE_ARTICOLO_CONTENT_HASHED = """
+    UPDATE articoli SET
+        titoloAtto = ?, testo_completo = ?, testo_pulito = ?, articoli_correlati = ?,
+        allegati = ?, data_attivazione = ?, data_cessazione = ?, url_documento = ?, status = ?,
+        hash_testo_completo = ?, hash_testo_pulito = ?
+    WHERE id = ?
+"""
+
+SQL_INSERT_ARTICOLO_VERSIONED_HASHED = """
+    INSERT INTO articoli (
+        documento_id, numero_articolo, titoloAtto, testo_completo,
+        testo_pulito, articoli_correlati, allegati, data_attivazione,
+        data_cessazione, url_documento, status,
+        articolo_base_id, tipo_versione, numero_aggiornamento,
+        hash_testo_completo, hash_testo_pulito
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_INSERT_ARTICOLO_BASIC_HASHED = """
+    INSERT INTO articoli (
+        documento_id, numero_articolo, titoloAtto, testo_completo,
+        testo_pulito, articoli_correlati, allegati, data_attivazione,
+        data_cessazione, url_documento, status,
+        hash_testo_completo, hash_testo_pulito
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_CREATE_TESTI_ARTICOLI = """
+    CREATE TABLE IF NOT EXISTS testi_articoli (
+        hash CHAR(64) PRIMARY KEY,
+        testo TEXT NOT NULL
+    )
+"""
+
+SQL_INSERT_TESTO = "INSERT OR IGNORE INTO testi_articoli (hash, testo) VALUES (?, ?)"
+
+# Lettura trasparente: testo dal deposito se la riga ha l'hash, altrimenti quello in linea
+# (righe salvate prima del deposito). Stesse colonne di articoli usate dai lettori.
+SQL_CREATE_ARTICOLI_TESTO = """
+    CREATE VIEW IF NOT EXISTS articoli_testo AS
+    SELECT a.id, a.documento_id, a.numero_articolo, a.titoloAtto, a.url_documento,
+           COALESCE(tc.testo, a.testo_completo) AS testo_completo,
+           COALESCE(tp.testo, a.testo_pulito) AS testo_pulito
+    FROM articoli a
+    LEFT JOIN testi_articoli tc ON tc.hash = a.hash_testo_completo
+    LEFT JOIN testi_articoli tp ON tp.hash = a.hash_testo_pulito
+"""
+
+SQL_INSERT_CITAZIONE = """
+    INSERT OR IGNORE INTO citazioni_normative (
+        articolo_citante_id, articolo_citato_id, tipo_citazione, contesto_citazione
+    ) VALUES (?, ?, ?, ?)
+"""
+
+SQL_CREATE_ALLEGATI_SCARTATI = """
+    CREATE TABLE IF NOT EXISTS allegati_scartati (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        documento_id INTEGER REFERENCES documenti_normativi(id),
+        numero_allegato VARCHAR(20),
+        url TEXT,
+        motivo VARCHAR(50),
+        dimensione INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SQL_INSERT_ALLEGATO_SCARTATO = """
+    INSERT INTO allegati_scartati (documento_id, numero_allegato, url, motivo, dimensione)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+# ========================================
+# SCHEMA CAPABILITIES
+# ========================================
+
+VERSIONING_COLUMNS = ('articolo_base_id', 'tipo_versione', 'numero_aggiornamento')
+TEXT_HASH_COLUMNS = ('hash_testo_completo', 'hash_testo_pulito')
+TEXT_COLUMN_INDICES = (3, 4)  # testo_completo, testo_pulito nelle righe articolo
+
+
+def text_hash(text):
+    """Chiave del testo nel deposito testi_articoli"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def ensure_text_store(conn):
+    """Crea (se mancano) il deposito testi_articoli, le colonne hash di articoli e la vista articoli_testo"""
+    conn.execute(SQL_CREATE_TESTI_ARTICOLI)
+    columns = {column[1] for column in conn.execute("PRAGMA table_info(articoli)").fetchall()}
+    for column in TEXT_HASH_COLUMNS:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE articoli ADD COLUMN {column} CHAR(64)")
+    conn.execute(SQL_CREATE_ARTICOLI_TESTO)
+    conn.commit()
+
+
+class SchemaCapabilities:
+    """
+    Colonne e tabelle di data.sqlite, lette una volta all'avvio (init_optimized_database)
+    invece di un PRAGMA table_info per ogni articolo salvato.
+    """
+
+    def __init__(self, articoli_columns, tables):
+        self.articoli_columns = frozenset(articoli_columns)
+        self.tables = frozenset(tables)
+        self.has_versioning = all(column in self.articoli_columns for column in VERSIONING_COLUMNS)
+        self.has_fonte_origine = 'fonte_origine' in self.articoli_columns
+        self.has_articoli_versioni = 'articoli_versioni' in self.tables
+        self.has_allegati_scartati = 'allegati_scartati' in self.tables
+        self.has_text_store = ('testi_articoli' in self.tables
+                               and all(column in self.articoli_columns for column in TEXT_HASH_COLUMNS))
+        # Statement di inserimento scelti una volta per tutte le scritture
+        if self.has_text_store:
+            self.insert_articolo_sql = (SQL_INSERT_ARTICOLO_VERSIONED_HASHED if self.has_versioning
+                                        else SQL_INSERT_ARTICOLO_BASIC_HASHED)
+            self.insert_version_sql = SQL_INSERT_ARTICOLO_VERSIONED_HASHED
+            self.update_articolo_sql = SQL_UPDATE_ARTICOLO_CONTENT_HASHED
+        else:
+            self.insert_articolo_sql = SQL_INSERT_ARTICOLO_VERSIONED if self.has_versioning else SQL_INSERT_ARTICOLO_BASIC
+            self.insert_version_sql = SQL_INSERT_ARTICOLO_VERSIONED
+            self.update_articolo_sql = SQL_UPDATE_ARTICOLO_CONTENT
+        # Da dove leggere testo_completo/testo_pulito (SELECT id, ..., testo_completo FROM <source>)
+        self.article_text_source = 'articoli_testo' if self.has_text_store else 'articoli'
+
+    @classmethod
+    def from_connection(cls, conn):
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(articoli)").fetchall()]
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]
+        return cls(columns, tables)
+
+    def describe(self):
+        return (f"versioning={'yes' if self.has_versioning else 'no'}, "
+                f"fonte_origine={'yes' if self.has_fonte_origine else 'no'}, "
+                f"articoli_versioni={'yes' if self.has_articoli_versioni else 'no'}, "
+                f"text_store={'yes' if self.has_text_store else 'no'}")
+
+
+# ========================================
+# WRITE RECORDS
+# ========================================
+
+class DocumentRecord:
+    """Documento da salvare (values nell'ordine di SQL_INSERT_DOCUMENTO)"""
+
+    def __init__(self, urn, numero, anno, tipo_atto, values):
+        self.urn = urn
+        self.numero = numero
+        self.anno = anno
+        self.tipo_atto = tipo_atto
+        self.values = values
+
+
+class ArticleRecord:
+    """
+    Articolo con tutte le sue versioni, salvato in un unico SAVEPOINT.
+    rows[0] è la versione base; le altre ricevono articolo_base_id = id di rows[base_index].
+    Le righe seguono le colonne di SchemaCapabilities.insert_articolo_sql.
+    """
+
+    def __init__(self, documento_id, numero_articolo, rows, base_index=0):
+        self.documento_id = documento_id
+        self.numero_articolo = numero_articolo
+        self.rows = rows
+        self.base_index = base_index
+
+
+class ArticleUpdateRecord:
+    """
+    Articolo già salvato con versioni nuove (modalità --update), applicato in un unico SAVEPOINT.
+    new_rows vengono aggiunte con articolo_base_id = base_id; refreshed contiene (id, riga)
+    delle versioni già presenti da riscrivere (es. la versione 'current').
+    Le righe seguono le colonne di SQL_INSERT_ARTICOLO_VERSIONED.
+    """
+
+    def __init__(self, documento_id, numero_articolo, base_id, new_rows, refreshed=()):
+        self.documento_id = documento_id
+        self.numero_articolo = numero_articolo
+        self.base_id = base_id
+        self.new_rows = new_rows
+        self.refreshed = refreshed
+
+
+class CitationRecord:
+    """Citazione normativa (values nell'ordine di SQL_INSERT_CITAZIONE)"""
+
+    def __init__(self, values):
+        self.values = values
+
+
+class SkippedAllegatoRecord:
+    """Allegato non salvato e motivo (values nell'ordine di SQL_INSERT_ALLEGATO_SCARTATO)"""
+
+    def __init__(self, values):
+        self.values = values
+
+
+class CommitRecord:
+    """Fine documento: commit se la coda è vuota (force=True: sempre)"""
+
+    def __init__(self, force=False):
+        self.force = force
+
+
+class WriteResult:
+    """Esito di un record: id scritti (o id esistente) e titolo della riga già presente"""
+
+    def __init__(self, ids, existing=False, title=None):
+        self.ids = ids
+        self.existing = existing
+        self.title = title
+
+
+# ========================================
+# DATABASE WRITER
+# ========================================
+
+class DatabaseWriter:
+    """Connessione unica a data.sqlite con commit a batch"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, batch_size=BATCH_SIZE, capabilities=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.pending_rows = 0
+        self.commits = 0
+        self._savepoint_counter = 0
+        self._savepoint_depth = 0
+        self.texts_stored = 0
+        self.texts_shared = 0
+        self.lock = threading.RLock()
+        self.conn = connect_database(db_path, check_same_thread=False)
+        self.capabilities = capabilities or SchemaCapabilities.from_connection(self.conn)
+
+    # ----------------------------------------
+    # Transactions
+    # ----------------------------------------
+
+    def _begin(self):
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+
+    def _row_written(self, count=1):
+        self.pending_rows += count
+        # Dentro un savepoint il commit viene rimandato alla sua chiusura
+        if self.pending_rows >= self.batch_size and self._savepoint_depth == 0:
+            self.commit()
+
+    def commit(self):
+        """Commit delle righe in sospeso (un solo fsync per batch)"""
+        with self.lock:
+            if self.conn.in_transaction:
+                self.conn.commit()
+                self.commits += 1
+            self.pending_rows = 0
+
+    def commit_document(self):
+        """Fine di un documento: chiude la transazione corrente"""
+        self.commit()
+
+    @contextmanager
+    def savepoint(self):
+        """Annulla solo le righe scritte nel blocco in caso di errore, lasciando intatto il batch"""
+        with self.lock:
+            self._begin()
+            self._savepoint_counter += 1
+            name = f"sp_{self._savepoint_counter}"
+            self.conn.execute(f"SAVEPOINT {name}")
+            self._savepoint_depth += 1
+            try:
+                yield self.conn.cursor()
+            except Exception:
+                self.conn.execute(f"ROLLBACK TO {name}")
+                self.conn.execute(f"RELEASE {name}")
+                raise
+            else:
+                self.conn.execute(f"RELEASE {name}")
+            finally:
+                self._savepoint_depth -= 1
+            if self._savepoint_depth == 0 and self.pending_rows >= self.batch_size:
+                self.commit()
+
+    # ----------------------------------------
+    # Documenti
+    # ----------------------------------------
+
+    def find_documento(self, urn, numero, anno, tipo_atto):
+        with self.lock:
+            return self.conn.execute(SQL_FIND_DOCUMENTO, [urn, numero, anno, tipo_atto]).fetchone()
+
+    def insert_documento(self, values):
+        """Inserisce un documento (valori nell'ordine di SQL_INSERT_DOCUMENTO) e restituisce l'id"""
+        with self.lock:
+            self._begin()
+            cursor = self.conn.execute(SQL_INSERT_DOCUMENTO, values)
+            self._row_written()
+            return cursor.lastrowid
+
+    def write_documento(self, record):
+        """Applica un DocumentRecord: restituisce l'id esistente o quello appena inserito"""
+        with self.lock:
+            existing = self.find_documento(record.urn, record.numero, record.anno, record.tipo_atto)
+            if existing:
+                return WriteResult([existing[0]], existing=True, title=existing[1])
+            return WriteResult([self.insert_documento(record.values)])
+
+    def get_documento_id_by_urn(self, urn):
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM documenti_normativi WHERE urn = ?", [urn]).fetchone()
+            return row[0] if row else None
+
+    def get_documento_title(self, documento_id):
+        with self.lock:
+            row = self.conn.execute("SELECT titoloAtto FROM documenti_normativi WHERE id = ?", [documento_id]).fetchone()
+            return row[0] if row else None
+
+    # ----------------------------------------
+    # Articoli
+    # ----------------------------------------
+
+    def find_articolo(self, documento_id, numero_articolo):
+        with self.lock:
+            return self.conn.execute(SQL_FIND_ARTICOLO, [documento_id, numero_articolo]).fetchone()
+
+    def get_first_articolo_id(self, documento_id):
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM articoli WHERE documento_id = ? LIMIT 1", [documento_id]).fetchone()
+            return row[0] if row else None
+
+    def store_texts(self, cursor, row):
+        """
+        Con il deposito dei testi: testo_completo/testo_pulito vanno in testi_articoli
+        (INSERT OR IGNORE, una copia per hash) e nella riga restano '' e i due hash in coda.
+        Senza deposito la riga resta invariata.
+        """
+        if not self.capabilities.has_text_store:
+            return row
+        row = list(row)
+        hashes = []
+        for index in TEXT_COLUMN_INDICES:
+            text = row[index]
+            if not text:
+                hashes.append(None)
+                continue
+            digest = text_hash(text)
+            cursor.execute(SQL_INSERT_TESTO, [digest, text])
+            if cursor.rowcount:
+                self.texts_stored += 1
+            else:
+                self.texts_shared += 1
+            row[index] = ''
+            hashes.append(digest)
+        return row + hashes
+
+    def insert_articolo(self, cursor, values):
+        """Inserisce una riga articolo dentro un savepoint e restituisce l'id"""
+        cursor.execute(self.capabilities.insert_articolo_sql, self.store_texts(cursor, values))
+        self._row_written()
+        return cursor.lastrowid
+
+    def insert_articolo_versions(self, cursor, base_values, version_rows):
+        """
+        Inserisce la versione base e poi tutte le altre con executemany.
+        Le righe di version_rows hanno articolo_base_id = None: viene impostato qui.
+        Restituisce gli id in ordine (il primo è l'articolo base).
+        """
+        base_id = self.insert_articolo(cursor, base_values)
+        if not version_rows:
+            return [base_id]
+
+        rows = []
+        for row in version_rows:
+            row = list(row)
+            row[11] = base_id  # articolo_base_id
+            rows.append(self.store_texts(cursor, row))
+        cursor.executemany(self.capabilities.insert_version_sql, rows)
+        self._row_written(len(rows))
+
+        # Gli id AUTOINCREMENT di un executemany nella stessa connessione sono consecutivi
+        last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return [base_id] + list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def write_articolo(self, record):
+        """Applica un ArticleRecord: salta gli articoli già presenti, altrimenti inserisce tutte le versioni"""
+        with self.lock:
+            existing = self.find_articolo(record.documento_id, record.numero_articolo)
+            if existing:
+                return WriteResult([existing[0]], existing=True, title=existing[1])
+
+            with self.savepoint() as cursor:
+                if self.capabilities.has_versioning and len(record.rows) > 1:
+                    ids = self.insert_articolo_versions(cursor, record.rows[0], record.rows[1:])
+                    if record.base_index:
+                        cursor.executemany(
+                            "UPDATE articoli SET articolo_base_id = ? WHERE id = ?",
+                            [(ids[record.base_index], article_id) for article_id in ids[1:]]
+                        )
+                else:
+                    ids = [self.insert_articolo(cursor, record.rows[0])]
+            return WriteResult(ids)
+
+    def get_articolo_versions(self, documento_id):
+        """
+        Articoli salvati di un documento: numero_articolo -> {'base_id', 'versions'}
+        con versions = {tipo_versione: id}. Senza colonne di versioning versions è vuoto.
+        """
+        articles = {}
+        with self.lock:
+            if not self.capabilities.has_versioning:
+                rows = self.conn.execute(
+                    "SELECT id, numero_articolo FROM articoli WHERE documento_id = ? ORDER BY id", [documento_id]
+                ).fetchall()
+                for article_id, numero_articolo in rows:
+                    articles.setdefault(numero_articolo, {'base_id': article_id, 'versions': {}})
+                return articles
+            rows = self.conn.execute(SQL_FIND_ARTICOLO_VERSIONS, [documento_id]).fetchall()
+
+        for article_id, numero_articolo, tipo_versione, articolo_base_id in rows:
+            entry = articles.setdefault(numero_articolo, {'base_id': None, 'versions': {}})
+            entry['versions'].setdefault(tipo_versione or 'orig', article_id)
+            # La base è la riga riferita dalle altre versioni; altrimenti la prima salvata
+            if articolo_base_id is not None and articolo_base_id != article_id:
+                entry.setdefault('referenced_base_id', articolo_base_id)
+            if entry['base_id'] is None:
+                entry['base_id'] = article_id
+        for entry in articles.values():
+            entry['base_id'] = entry.pop('referenced_base_id', entry['base_id'])
+        return articles
+
+    def write_articolo_update(self, record):
+        """Applica un ArticleUpdateRecord: riscrive le versioni esistenti e aggiunge quelle nuove sotto la base"""
+        with self.lock:
+            with self.savepoint() as cursor:
+                for article_id, row in record.refreshed:
+                    row = self.store_texts(cursor, row)
+                    # Colonne da titoloAtto a status, più gli hash in coda se c'è il deposito
+                    cursor.execute(self.capabilities.update_articolo_sql, list(row[2:11]) + list(row[14:]) + [article_id])
+                ids = []
+                for row in record.new_rows:
+                    row = list(row)
+                    row[11] = record.base_id  # articolo_base_id
+                    cursor.execute(self.capabilities.insert_version_sql, self.store_texts(cursor, row))
+                    ids.append(cursor.lastrowid)
+                self._row_written(len(record.refreshed) + len(record.new_rows))
+            return WriteResult(ids)
+
+    # ----------------------------------------
+    # Citazioni
+    # ----------------------------------------
+
+    def insert_citazione(self, values):
+        with self.lock:
+            self._begin()
+            self.conn.execute(SQL_INSERT_CITAZIONE, values)
+            self._row_written()
+
+    def insert_allegato_scartato(self, values):
+        if not self.capabilities.has_allegati_scartati:
+            return
+        with self.lock:
+            self._begin()
+            self.conn.execute(SQL_INSERT_ALLEGATO_SCARTATO, values)
+            self._row_written()
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.conn.close()
+
+
+# ========================================
+# WRITER THREAD
+# ========================================
+
+class DatabaseWriterThread:
+    """
+    Thread dedicato che possiede il DatabaseWriter e applica i record in coda.
+    Le letture (es. titolo del documento) non passano dalla coda: usano la stessa
+    connessione sotto il suo lock, così vedono anche le righe non ancora committate.
+    """
+
+    def __init__(self, writer, max_pending=WRITE_QUEUE_SIZE):
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.applied = 0
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, record):
+        """Accoda un record e restituisce il Future con il WriteResult (blocca se la coda è piena)"""
+        future = Future()
+        self.queue.put((record, future))
+        return future
+
+    def commit_document(self):
+        """Fine di un documento: commit appena il writer resta senza lavoro"""
+        return self.submit(CommitRecord())
+
+    def flush(self):
+        """Attende che tutti i record in coda siano applicati e committati"""
+        self.submit(CommitRecord(force=True)).result()
+
+    def _apply(self, record):
+        if isinstance(record, ArticleRecord):
+            return self.writer.write_articolo(record)
+        if isinstance(record, ArticleUpdateRecord):
+            return self.writer.write_articolo_update(record)
+        if isinstance(record, DocumentRecord):
+            return self.writer.write_documento(record)
+        if isinstance(record, CitationRecord):
+            self.writer.insert_citazione(record.values)
+            return WriteResult([])
+        if isinstance(record, SkippedAllegatoRecord):
+            self.writer.insert_allegato_scartato(record.values)
+            return WriteResult([])
+        if isinstance(record, CommitRecord):
+            # Con altri record già in coda la transazione prosegue (commit di gruppo)
+            if record.force or self.queue.empty():
+                self.writer.commit()
+            return None
+        raise TypeError(f"Unknown write record: {type(record).__name__}")
+
+    def _run(self):
+        while True:
+            record, future = self.queue.get()
+            if record is None:
+                self.writer.close()
+                future.set_result(None)
+                return
+            try:
+                result = self._apply(record)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                self.applied += 1
+                future.set_result(result)
+
+    # ----------------------------------------
+    # Letture
+    # ----------------------------------------
+
+    def get_documento_id_by_urn(self, urn):
+        return self.writer.get_documento_id_by_urn(urn)
+
+    def get_documento_title(self, documento_id):
+        return self.writer.get_documento_title(documento_id)
+
+    def get_first_articolo_id(self, documento_id):
+        return self.writer.get_first_articolo_id(documento_id)
+
+    def get_articolo_versions(self, documento_id):
+        return self.writer.get_articolo_versions(documento_id)
+
+    @property
+    def capabilities(self):
+        return self.writer.capabilities
+
+    def close(self):
+        """Applica i record rimasti, commit finale e chiusura della connessione"""
+        future = Future()
+        self.queue.put((None, future))
+        future.result()
+        self.thread.join()
+
+
+# ========================================
+# SHARED WRITER
+# ========================================
+
+_writer = None
+_writer_lock = threading.Lock()
+_schema_capabilities = None
+
+
+def set_schema_capabilities(capabilities):
+    """Registra le capacità dello schema calcolate da init_optimized_database"""
+    global _schema_capabilities
+    with _writer_lock:
+        _schema_capabilities = capabilities
+        if _writer is not None:
+            _writer.writer.capabilities = capabilities
+
+
+def get_database_writer(db_path=DEFAULT_DB_PATH):
+    """Restituisce il writer thread condiviso, avviandolo al primo utilizzo"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DatabaseWriterThread(DatabaseWriter(db_path, capabilities=_schema_capabilities))
+        return _writer
+
+
+def close_database_writer():
+    """Svuota la coda, commit finale e chiusura del writer condiviso (prima di altri script sul database)"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            print(f"[db_writer] Closed writer after {_writer.applied} records, {_writer.writer.commits} commits")
+            if _writer.writer.texts_shared:
+                print(f"[db_writer] Text store: {_writer.writer.texts_stored} texts stored, "
+                      f"{_writer.writer.texts_shared} duplicates shared")
+            _writer = None
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Binary embedding storage and similarity search for data.sqlite
+Gli embedding di articoli, commi e documenti erano liste JSON (~10 KB di testo per
+un vettore a 768 dimensioni) e ogni ricerca doveva decodificarle tutte in float Python.
+
+Formato nelle colonne embedding_articolo / embedding_comma / embedding_documento (BLOB):
+- b'F' + float32 little-endian                     (4 byte per dimensione)
+- b'Q' + scala float32 + int8 per dimensione        (quantizzato, 1 byte per dimensione)
+I valori JSON già salvati restano leggibili (unpack_embedding riconosce il testo) e
+convert_json_embeddings li riscrive nel formato binario.
+
+VectorIndex carica i vettori normalizzati in una matrice e restituisce i top-k per
+similarità coseno:
+- NumPy: prodotto matrice-vettore; oltre IVF_MIN_ROWS righe indice IVF (k-means
+  sferico, si confrontano solo le liste dei centroidi più vicini)
+- senza NumPy: scansione in puro Python (corpus piccoli, nessuna dipendenza)
+
+Usage:
+    python embedding_store.py --convert [--int8]
+    python embedding_store.py --similar ARTICOLO_ID [--k 10] [--commi | --documenti]
+"""
+
+import heapq
+import json
+import math
+import operator
+import struct
+import sys
+from array import array
+
+from db_connection import DEFAULT_DB_PATH, connect_database, connect_monitor
+
+# Optional import for vectorized search (fallback to pure Python if not available)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Configuration constants
+FORMAT_FLOAT32 = b'F'
+FORMAT_INT8 = b'Q'
+DEFAULT_TOP_K = 10
+IVF_MIN_ROWS = 50000  # Sotto questa soglia la ricerca esaustiva è già nell'ordine dei millisecondi
+IVF_DEFAULT_NPROBE = 8  # Liste esaminate per query
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLE_PER_LIST = 64  # Righe campionate per centroide durante il training
+IVF_ASSIGN_CHUNK = 65536  # Righe assegnate ai centroidi per blocco (memoria limitata)
+CONVERT_BATCH_SIZE = 1000
+
+# Tabella e colonna degli embedding per tipo di riga
+EMBEDDING_SOURCES = {
+    'articoli': ('articoli', 'embedding_articolo'),
+    'commi': ('commi', 'embedding_comma'),
+    'documenti': ('documenti_normativi', 'embedding_documento'),
+}
+
+_FLOAT32 = struct.Struct('<f')
+
+# ========================================
+# PACKING
+# ========================================
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def pack_embedding(vector, quantize=False):
+    """Vettore (lista, array o tensore convertito con tolist()) -> BLOB binario"""
+    if not quantize:
+        return FORMAT_FLOAT32 + _little_endian(array('f', vector)).tobytes()
+
+    # int8 simmetrico: scala = massimo valore assoluto / 127
+    peak = max((abs(value) for value in vector), default=0.0)
+    scale = peak / 127.0 if peak else 1.0
+    quantized = array('b', (max(-127, min(127, round(value / scale))) for value in vector))
+    return FORMAT_INT8 + _FLOAT32.pack(scale) + quantized.tobytes()
+
+
+def unpack_embedding(value):
+    """BLOB binario o JSON legacy -> array('f'); None se la colonna è vuota"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return array('f', json.loads(value))
+
+    value = bytes(value)
+    kind, payload = value[:1], value[1:]
+    if kind == FORMAT_FLOAT32:
+        vector = array('f')
+        vector.frombytes(payload)
+        return _little_endian(vector)
+    if kind == FORMAT_INT8:
+        scale = _FLOAT32.unpack_from(payload)[0]
+        quantized = array('b')
+        quantized.frombytes(payload[_FLOAT32.size:])
+        return array('f', (component * scale for component in quantized))
+    raise ValueError(f"Unknown embedding format: {kind!r}")
+
+
+def convert_json_embeddings(conn, quantize=False):
+    """Riscrive gli embedding JSON in formato binario; restituisce le righe convertite per tipo"""
+    converted = {}
+    for kind, (table, column) in EMBEDDING_SOURCES.items():
+        converted[kind] = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, {column} FROM {table} WHERE typeof({column}) = 'text' LIMIT ?", [CONVERT_BATCH_SIZE]
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                [(pack_embedding(unpack_embedding(value), quantize), row_id) for row_id, value in rows]
+            )
+            conn.commit()
+            converted[kind] += len(rows)
+    return converted
+
+
+# ========================================
+# SIMILARITY SEARCH
+# ========================================
+
+def _normalize(vector):
+    norm = math.sqrt(sum(component * component for component in vector))
+    return array('f', (component / norm for component in vector)) if norm else vector
+
+
+class VectorIndex:
+    """Top-k per similarità coseno su un insieme di embedding (id riga -> vettore)"""
+
+    def __init__(self, ids, vectors, ivf_lists=None, seed=0):
+        """
+        Args:
+            ids: id delle righe, nello stesso ordine di vectors
+            vectors: vettori della stessa dimensione (array('f'), liste o matrice NumPy)
+            ivf_lists: liste IVF (None = automatico oltre IVF_MIN_ROWS righe, 0 = ricerca esaustiva)
+            seed: seme del campionamento k-means
+        """
+        self.ids = list(ids)
+        self.dimension = len(vectors[0]) if len(vectors) else 0
+        self.centroids = None
+        self.lists = None
+
+        if not NUMPY_AVAILABLE:
+            self.matrix = [_normalize(vector) for vector in vectors]
+            return
+
+        self.ids = np.asarray(self.ids)
+        if len(vectors) and isinstance(vectors[0], array):
+            # Vettori decodificati dai BLOB: un'unica copia dei byte, niente conversione per elemento
+            matrix = np.frombuffer(b''.join(vector.tobytes() for vector in vectors), dtype=np.float32)
+        else:
+            matrix = np.asarray(vectors, dtype=np.float32)
+        matrix = matrix.reshape(len(vectors), self.dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+        if ivf_lists is None:
+            ivf_lists = int(math.sqrt(len(self.ids))) if len(self.ids) >= IVF_MIN_ROWS else 0
+        if ivf_lists:
+            self._train_ivf(min(ivf_lists, len(self.ids)), seed)
+
+    @classmethod
+    def from_database(cls, conn, kind='articoli', ivf_lists=None):
+        """Carica gli embedding di articoli, commi o documenti (righe senza embedding escluse)"""
+        table, column = EMBEDDING_SOURCES[kind]
+        ids = []
+        vectors = []
+        for row_id, value in conn.execute(f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL"):
+            vector = unpack_embedding(value)
+            if vectors and len(vector) != len(vectors[0]):
+                print(f"⚠️ [embedding_store] {table} id {row_id}: dimension {len(vector)} != {len(vectors[0])}, skipped")
+                continue
+            ids.append(row_id)
+            vectors.append(vector)
+        return cls(ids, vectors, ivf_lists=ivf_lists)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _train_ivf(self, lists, seed):
+        """k-means sferico su un campione, poi ogni riga assegnata al centroide più vicino"""
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(self.matrix), lists * IVF_TRAIN_SAMPLE_PER_LIST)
+        sample = self.matrix[rng.choice(len(self.matrix), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, lists, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for centroid_index in range(lists):
+                members = sample[assignment == centroid_index]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm:
+                        centroids[centroid_index] = centroid / norm
+
+        assignment = np.concatenate([
+            np.argmax(self.matrix[start:start + IVF_ASSIGN_CHUNK] @ centroids.T, axis=1)
+            for start in range(0, len(self.matrix), IVF_ASSIGN_CHUNK)
+        ])
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == centroid_index) for centroid_index in range(lists)]
+
+    def search(self, query, k=DEFAULT_TOP_K, nprobe=IVF_DEFAULT_NPROBE):
+        """
+        Le k righe più simili a query (vettore o BLOB).
+
+        Returns:
+            list di (id riga, similarità coseno) in ordine decrescente
+        """
+        if isinstance(query, (bytes, str)):
+            query = unpack_embedding(query)
+        if not len(self.ids) or k <= 0:
+            return []
+
+        if not NUMPY_AVAILABLE:
+            query = _normalize(query)
+            scores = ((sum(map(operator.mul, query, vector)), position) for position, vector in enumerate(self.matrix))
+            return [(self.ids[position], score) for score, position in heapq.nlargest(k, scores)]
+
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if self.centroids is None:
+            candidates = None
+            scores = self.matrix @ query
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.concatenate([self.lists[centroid_index] for centroid_index in probe])
+            scores = self.matrix[candidates] @ query
+
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        positions = top if candidates is None else candidates[top]
+        return [(self.ids[position].item(), float(scores[index])) for position, index in zip(positions, top)]
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--convert' in args:
+        conn = connect_database(DEFAULT_DB_PATH)
+        converted = convert_json_embeddings(conn, quantize='--int8' in args)
+        conn.close()
+        for kind, count in converted.items():
+            print(f"✅ {kind}: {count} JSON embeddings converted")
+        sys.exit(0)
+
+    if '--similar' not in args:
+        print(__doc__)
+        sys.exit(1)
+
+    kind = 'commi' if '--commi' in args else 'documenti' if '--documenti' in args else 'articoli'
+    row_id = int(args[args.index('--similar') + 1])
+    k = int(args[args.index('--k') + 1]) if '--k' in args else DEFAULT_TOP_K
+    table, column = EMBEDDING_SOURCES[kind]
+
+    conn = connect_monitor(DEFAULT_DB_PATH)
+    row = conn.execute(f"SELECT {column} FROM {table} WHERE id = ?", [row_id]).fetchone()
+    if not row or row[0] is None:
+        print(f"❌ No embedding for {table} id {row_id}")
+        sys.exit(1)
+    index = VectorIndex.from_database(conn, kind)
+    conn.close()
+    for similar_id, score in index.search(row[0], k=k + 1):
+        if similar_id != row_id:
+            print(f"{score:.4f}  {table} id {similar_id}")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Persistent document-existence index for NORMATTIVA-SCRAPE
+Ricorda, tra un'esecuzione e l'altra, quali numeri (anno, numero) esistono su
+normattiva.it, con quale formato URN e con quale contenuto, in un file SQLite
+laterale (existence_index.sqlite, come http_cache.sqlite).
+
+- numeri mancanti verificati di recente: saltati senza richieste
+- documenti trovati: URL con il formato vincente usato direttamente
+- documenti trovati, già salvati e verificati entro FOUND_TTL: non vengono riscaricati
+- oltre il TTL il documento viene riscaricato: se l'hash del contenuto non è
+  cambiato non viene rielaborato
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+# Configuration constants
+DEFAULT_INDEX_PATH = 'existence_index.sqlite'
+FOUND_TTL = 30 * 24 * 3600  # Secondi prima di riverificare un documento esistente
+MISSING_TTL = 7 * 24 * 3600  # Secondi prima di riprovare un numero mancante
+
+STATUS_FOUND = 'found'
+STATUS_MISSING = 'missing'
+
+# Risultato della scoperta per documenti già salvati e verificati entro FOUND_TTL
+DOCUMENT_UNCHANGED = 'unchanged'
+
+
+def content_hash(content):
+    """Hash del contenuto della pagina del documento (bytes)"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ExistenceIndex:
+    """Indice (anno, numero) -> formato, URL, URN, stato, ultimo controllo, hash del contenuto"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, found_ttl=FOUND_TTL, missing_ttl=MISSING_TTL):
+        """
+        Args:
+            path: file SQLite dell'indice
+            found_ttl: secondi prima di riverificare un documento trovato (None = mai)
+            missing_ttl: secondi prima di riprovare un numero mancante (None = mai)
+        """
+        self.path = path
+        self.found_ttl = found_ttl
+        self.missing_ttl = missing_ttl
+        self.skipped_missing = 0
+        self.skipped_unchanged = 0
+        self.known_format = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS document_index (
+                anno INTEGER NOT NULL,
+                numero INTEGER NOT NULL,
+                formato TEXT,
+                url TEXT,
+                urn TEXT,
+                status TEXT NOT NULL,
+                last_checked REAL NOT NULL,
+                content_hash TEXT,
+                PRIMARY KEY (anno, numero)
+            );
+            CREATE INDEX IF NOT EXISTS idx_document_index_status ON document_index(anno, status);
+        """)
+        self.conn.commit()
+
+    # ----------------------------------------
+    # Lookup
+    # ----------------------------------------
+
+    def lookup(self, anno, numero):
+        """Voce dell'indice (dict con 'fresh') o None se il numero non è mai stato verificato"""
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT formato, url, urn, status, last_checked, content_hash
+                FROM document_index WHERE anno = ? AND numero = ?
+            """, [anno, numero]).fetchone()
+        if not row:
+            return None
+
+        formato, url, urn, status, last_checked, stored_hash = row
+        ttl = self.found_ttl if status == STATUS_FOUND else self.missing_ttl
+        return {
+            'formato': formato,
+            'url': url,
+            'urn': urn,
+            'status': status,
+            'last_checked': last_checked,
+            'content_hash': stored_hash,
+            'fresh': ttl is None or (time.time() - last_checked) < ttl,
+        }
+
+    def known_formats(self, before_year=1900):
+        """Righe (anno, numero, formato) dei documenti trovati prima di before_year (per format_selector.py)"""
+        with self._lock:
+            return self.conn.execute("""
+                SELECT anno, numero, formato FROM document_index
+                WHERE status = ? AND anno < ? AND formato IS NOT NULL
+            """, [STATUS_FOUND, before_year]).fetchall()
+
+    # ----------------------------------------
+    # Record
+    # ----------------------------------------
+
+    def record_found(self, anno, numero, formato, url, urn, page_hash):
+        """Documento esistente: salva formato vincente, URL e hash della pagina"""
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO document_index
+                    (anno, numero, formato, url, urn, status, last_checked, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [anno, numero, formato, url, urn, STATUS_FOUND, time.time(), page_hash])
+            self.conn.commit()
+
+    def record_missing(self, anno, numero):
+        """Numero non trovato in nessun formato"""
+        with self._lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO document_index
+                    (anno, numero, formato, url, urn, status, last_checked, content_hash)
+                VALUES (?, ?, NULL, NULL, NULL, ?, ?, NULL)
+            """, [anno, numero, STATUS_MISSING, time.time()])
+            self.conn.commit()
+
+    def stats(self):
+        """Statistiche di utilizzo dell'indice per questa esecuzione"""
+        with self._lock:
+            counts = dict(self.conn.execute(
+                "SELECT status, COUNT(*) FROM document_index GROUP BY status"
+            ).fetchall())
+        return {
+            'found': counts.get(STATUS_FOUND, 0),
+            'missing': counts.get(STATUS_MISSING, 0),
+            'skipped_missing': self.skipped_missing,
+            'skipped_unchanged': self.skipped_unchanged,
+            'known_format': self.known_format,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Adaptive URN-NIR format selection for pre-1900 documents
+Prima del 1900 lo stesso numero può esistere come regio.decreto, legge, decreto
+ministeriale, ecc. Invece di provare sempre i formati nello stesso ordine, il
+selettore impara quale formato funziona per anno e per fascia di numeri e prova
+per primo quello più probabile.
+
+- tasso di successo per formato stimato su tre livelli (fascia di numeri, anno,
+  tutti gli anni), ognuno "ristretto" verso il livello superiore finché ha pochi dati
+- opzionale: se il formato più probabile fallisce, gli altri vengono provati in parallelo
+- la risposta del formato vincente viene restituita, così il chiamante non la riscarica
+
+La funzione di download viene passata come parametro (come in year_discovery.py),
+così il modulo non importa scraper_optimized.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration constants
+FORMAT_RANGE_SIZE = 500  # Numeri per fascia: i formati cambiano tra blocchi di numerazione
+PRIOR_WEIGHT = 4  # Tentativi "virtuali" presi dal livello superiore (anno, poi tutti gli anni)
+
+
+class UrnFormatSelector:
+    """Statistiche (successi, tentativi) per formato, per fascia di numeri, anno e globali"""
+
+    def __init__(self, range_size=FORMAT_RANGE_SIZE, concurrent=False):
+        """
+        Args:
+            range_size: ampiezza delle fasce di numeri
+            concurrent: se il primo formato fallisce, prova gli altri in parallelo
+        """
+        self.range_size = range_size
+        self.concurrent = concurrent
+        self.counts = {}  # chiave livello -> {formato: [successi, tentativi]}
+        self.located = 0
+        self.first_try = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _levels(self, year, numero):
+        """Chiavi dal livello più generale al più specifico"""
+        return [('all',), ('year', year), ('range', year, int(numero) // self.range_size)]
+
+    # ----------------------------------------
+    # Learning
+    # ----------------------------------------
+
+    def record(self, year, numero, formato, success):
+        """Registra un tentativo del formato per il documento year;numero"""
+        with self._lock:
+            for key in self._levels(year, numero):
+                stats = self.counts.setdefault(key, {}).setdefault(formato, [0, 0])
+                stats[0] += 1 if success else 0
+                stats[1] += 1
+
+    def seed(self, known_formats):
+        """Inizializza le statistiche da righe (anno, numero, formato) già note (es. existence_index)"""
+        seeded = 0
+        for year, numero, formato in known_formats:
+            if formato:
+                self.record(year, numero, formato, True)
+                seeded += 1
+        return seeded
+
+    def hit_rate(self, year, numero, formato):
+        """Tasso di successo stimato del formato per year;numero"""
+        rate = 0.5
+        with self._lock:
+            for key in self._levels(year, numero):
+                hits, attempts = self.counts.get(key, {}).get(formato, (0, 0))
+                rate = (hits + PRIOR_WEIGHT * rate) / (attempts + PRIOR_WEIGHT)
+        return rate
+
+    def order(self, year, numero, candidates):
+        """Candidati (nome, url) dal più al meno probabile; a parità resta l'ordine originale"""
+        ranked = sorted(enumerate(candidates),
+                        key=lambda item: (-self.hit_rate(year, numero, item[1][0]), item[0]))
+        return [candidate for _, candidate in ranked]
+
+    # ----------------------------------------
+    # Probing
+    # ----------------------------------------
+
+    def _try(self, year, numero, candidate, fetch):
+        formato, url = candidate
+        print(f"🔍 Trying format '{formato}' for {year};{numero}")
+        with self._lock:
+            self.requests += 1
+        try:
+            result = fetch(url)
+        except Exception as e:
+            # Errore transitorio (timeout, 5xx): non dice nulla sul formato, non va registrato
+            print(f"⚠️ [format_selector] Error fetching format '{formato}' for {year};{numero}: {e}")
+            raise
+        self.record(year, numero, formato, result is not None)
+        if result is None:
+            print(f"❌ Format '{formato}' failed for {year};{numero}")
+        else:
+            print(f"✅ Format '{formato}' works for {year};{numero}")
+        return result
+
+    def probe(self, year, numero, candidates, fetch):
+        """
+        Prova i formati nell'ordine appreso.
+
+        Args:
+            candidates: lista (nome formato, url)
+            fetch: funzione url -> risultato o None se il documento non esiste in quel formato
+
+        Returns:
+            (formato, url, risultato) del primo formato che funziona, o None se tutti
+            i formati rispondono "non trovato"
+
+        Raises:
+            il primo errore di fetch, se nessun formato funziona e almeno uno è fallito
+            per un errore: il documento non va considerato mancante
+        """
+        ranked = self.order(year, numero, candidates)
+        if not ranked:
+            return None
+
+        errors = []
+
+        def attempt(candidate):
+            try:
+                return self._try(year, numero, candidate, fetch)
+            except Exception as e:
+                errors.append(e)
+                return None
+
+        winner = None
+        result = attempt(ranked[0])
+        if result is not None:
+            winner = (ranked[0], result)
+            with self._lock:
+                self.first_try += 1
+        elif self.concurrent and len(ranked) > 1:
+            # Il formato più probabile è fallito: gli altri in parallelo, vince il primo nell'ordine appreso
+            rest = ranked[1:]
+            with ThreadPoolExecutor(max_workers=len(rest)) as executor:
+                results = list(executor.map(attempt, rest))
+            winner = next(((candidate, res) for candidate, res in zip(rest, results) if res is not None), None)
+        else:
+            for candidate in ranked[1:]:
+                result = attempt(candidate)
+                if result is not None:
+                    winner = (candidate, result)
+                    break
+
+        if winner is None:
+            if errors:
+                print(f"⚠️ No format worked for {year};{numero}, {len(errors)} failed with errors")
+                raise errors[0]
+            print(f"❌ No format worked for {year};{numero}")
+            return None
+
+        (formato, url), result = winner
+        with self._lock:
+            self.located += 1
+        return formato, url, result
+
+    def stats(self):
+        """Documenti trovati, trovati al primo tentativo e richieste fatte in questa esecuzione"""
+        with self._lock:
+            return {'located': self.located, 'first_try': self.first_try, 'requests': self.requests}
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP response cache for NORMATTIVA-SCRAPE
+Cache su disco delle risposte di normattiva.it, montata sulla sessione condivisa
+(vedi http_client.create_session), così una ripresa dopo un crash o una seconda
+esecuzione dello stesso anno legge le pagine dal disco invece che dalla rete.
+
+Caratteristiche:
+- chiave = URL normalizzato (schema ignorato: http:// e https:// condividono la voce)
+- corpi content-addressed (sha256): pagine identiche, es. le pagine di errore, salvate una volta
+- compressione zstd se disponibile (pip install zstandard), altrimenti zlib
+- TTL e limite di dimensione con eviction delle voci usate meno di recente
+- rivalidazione con If-None-Match / If-Modified-Since quando il server fornisce ETag/Last-Modified
+"""
+
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from http_client import ThrottledAdapter
+
+# Optional zstd compression (fallback to zlib if not available)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Configuration constants
+DEFAULT_CACHE_PATH = 'http_cache.sqlite'
+DEFAULT_TTL = 7 * 24 * 3600  # Secondi prima di rivalidare una voce
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # Byte compressi massimi prima dell'eviction (2 GB)
+EVICTION_CHECK_INTERVAL = 200  # Salvataggi tra due controlli di dimensione
+
+# Header conservati insieme al corpo
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Content-Language', 'Location')
+
+# Risposte salvate: pagine (anche quelle "Errore nel caricamento", servite con 200) e redirect
+CACHEABLE_STATUSES = (200, 301, 302, 303, 307, 308)
+
+
+def normalize_url(url):
+    """Chiave di cache: host in minuscolo + path + query, senza schema, porta di default e frammento"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+    query = f"?{parts.query}" if parts.query else ''
+    return f"{host}{path}{query}"
+
+
+class ResponseCache:
+    """Cache delle risposte HTTP su un file SQLite laterale (http_cache.sqlite)"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE, track_access=True):
+        """
+        Args:
+            path: file SQLite della cache
+            ttl: secondi prima della rivalidazione (None = mai, es. archivi di replay)
+            max_size: byte compressi massimi (None = nessun limite)
+            track_access: aggiorna last_access a ogni lettura (serve all'eviction LRU)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.track_access = track_access
+        # Timestamp: le voci salvate prima vengono sempre rivalidate (es. scraper_optimized --update)
+        self.revalidate_before = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._stores_since_check = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_bodies (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cache_responses (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT,
+                body_hash TEXT NOT NULL REFERENCES cache_bodies(hash),
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_responses_access ON cache_responses(last_access);
+            CREATE INDEX IF NOT EXISTS idx_cache_responses_body ON cache_responses(body_hash);
+        """)
+        self.conn.commit()
+
+        self._zstd_compressor = zstandard.ZstdCompressor(level=10) if ZSTD_AVAILABLE else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if ZSTD_AVAILABLE else None
+
+    # ----------------------------------------
+    # Compression
+    # ----------------------------------------
+
+    def _compress(self, body):
+        if self._zstd_compressor is not None:
+            return 'zstd', self._zstd_compressor.compress(body)
+        return 'zlib', zlib.compress(body, 6)
+
+    def _decompress(self, codec, data):
+        if codec == 'zstd':
+            if self._zstd_decompressor is None:
+                raise RuntimeError("Cache entry is zstd-compressed but zstandard is not installed")
+            return self._zstd_decompressor.decompress(data)
+        return zlib.decompress(data)
+
+    # ----------------------------------------
+    # Lookup / store
+    # ----------------------------------------
+
+    def lookup(self, url):
+        """Restituisce la voce di cache per l'URL (dict con body decompresso) o None"""
+        url_key = normalize_url(url)
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT r.status, r.headers, r.etag, r.last_modified, r.stored_at, b.codec, b.body
+                FROM cache_responses r JOIN cache_bodies b ON b.hash = r.body_hash
+                WHERE r.url_key = ?
+            """, [url_key]).fetchone()
+            if not row:
+                return None
+            if self.track_access:
+                self.conn.execute("UPDATE cache_responses SET last_access = ? WHERE url_key = ?", [time.time(), url_key])
+                self.conn.commit()
+
+        status, headers, etag, last_modified, stored_at, codec, body = row
+        return {
+            'url_key': url_key,
+            'status': status,
+            'headers': json.loads(headers) if headers else {},
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at,
+            'body': self._decompress(codec, body),
+        }
+
+    def is_fresh(self, entry):
+        """True se la voce è più giovane del TTL (TTL None = non scade mai)"""
+        if self.revalidate_before is not None and entry['stored_at'] < self.revalidate_before:
+            return False
+        if self.ttl is None:
+            return True
+        return (time.time() - entry['stored_at']) < self.ttl
+
+    def store(self, url, status, headers, body):
+        """Salva una risposta; il corpo è condiviso tra URL con lo stesso contenuto"""
+        url_key = normalize_url(url)
+        body_hash = hashlib.sha256(body).hexdigest()
+        stored_headers = {name: headers[name] for name in STORED_HEADERS if name in headers}
+        now = time.time()
+
+        with self._lock:
+            exists = self.conn.execute("SELECT 1 FROM cache_bodies WHERE hash = ?", [body_hash]).fetchone()
+            if not exists:
+                codec, compressed = self._compress(body)
+                self.conn.execute(
+                    "INSERT INTO cache_bodies (hash, codec, size, body) VALUES (?, ?, ?, ?)",
+                    [body_hash, codec, len(compressed), compressed]
+                )
+            self.conn.execute("""
+                INSERT OR REPLACE INTO cache_responses
+                    (url_key, url, status, headers, body_hash, etag, last_modified, stored_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                url_key, url, status, json.dumps(stored_headers), body_hash,
+                stored_headers.get('ETag'), stored_headers.get('Last-Modified'), now, now
+            ])
+            self.conn.commit()
+            self._stores_since_check += 1
+            check_size = self._stores_since_check >= EVICTION_CHECK_INTERVAL
+
+        if check_size:
+            self.evict()
+
+    def refresh(self, url):
+        """Segna come fresca una voce rivalidata dal server (304 Not Modified)"""
+        with self._lock:
+            now = time.time()
+            self.conn.execute(
+                "UPDATE cache_responses SET stored_at = ?, last_access = ? WHERE url_key = ?",
+                [now, now, normalize_url(url)]
+            )
+            self.conn.commit()
+
+    # ----------------------------------------
+    # Eviction
+    # ----------------------------------------
+
+    def total_size(self):
+        """Byte compressi occupati dai corpi in cache"""
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_bodies").fetchone()[0]
+
+    def evict(self):
+        """Rimuove le voci scadute da più di un TTL e, se serve, le meno usate fino a rientrare in max_size"""
+        with self._lock:
+            self._stores_since_check = 0
+            removed = 0
+
+            if self.ttl is not None:
+                cursor = self.conn.execute(
+                    "DELETE FROM cache_responses WHERE stored_at < ?",
+                    [time.time() - 2 * self.ttl]
+                )
+                removed += cursor.rowcount
+
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_bodies").fetchone()[0]
+            if self.max_size is not None and total > self.max_size:
+                rows = self.conn.execute("""
+                    SELECT r.url_key, b.size
+                    FROM cache_responses r JOIN cache_bodies b ON b.hash = r.body_hash
+                    ORDER BY r.last_access
+                """).fetchall()
+                target = int(self.max_size * 0.9)
+                to_delete = []
+                for url_key, size in rows:
+                    if total <= target:
+                        break
+                    to_delete.append((url_key,))
+                    total -= size
+                self.conn.executemany("DELETE FROM cache_responses WHERE url_key = ?", to_delete)
+                removed += len(to_delete)
+
+            # Corpi non più referenziati
+            self.conn.execute("""
+                DELETE FROM cache_bodies
+                WHERE hash NOT IN (SELECT DISTINCT body_hash FROM cache_responses)
+            """)
+            self.conn.commit()
+
+        if removed:
+            print(f"[http_cache] Evicted {removed} cached responses")
+        return removed
+
+    # ----------------------------------------
+    # Statistics
+    # ----------------------------------------
+    # L'adapter è condiviso dai worker del motore async e dai pool di versioni/allegati
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_revalidated(self):
+        with self._lock:
+            self.revalidated += 1
+
+    def stats(self):
+        """Statistiche di utilizzo della cache per questa esecuzione"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+            }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class CachingAdapter(ThrottledAdapter):
+    """
+    Transport adapter requests che serve le GET dalla ResponseCache.
+    Le voci fresche non toccano la rete; quelle scadute vengono rivalidate
+    con richieste condizionali quando hanno ETag o Last-Modified.
+    Solo le richieste che vanno in rete passano dal limitatore (ThrottledAdapter).
+    """
+
+    def __init__(self, cache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def _build_response(self, request, entry):
+        response = Response()
+        response.status_code = entry['status']
+        response.reason = 'OK' if entry['status'] == 200 else 'Redirect'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(entry['body'])
+        response._content = entry['body']
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def _is_storable(self, request, response):
+        """Non salva i redirect verso la stessa chiave (es. http -> https), che creerebbero un ciclo"""
+        if not response.is_redirect:
+            return True
+        location = urljoin(request.url, response.headers['Location'])
+        return normalize_url(location) != normalize_url(request.url)
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method != 'GET':
+            return super().send(request, stream=stream, **kwargs)
+
+        entry = self.cache.lookup(request.url)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.cache.record_hit()
+                return self._build_response(request, entry)
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+
+        response = super().send(request, stream=stream, **kwargs)
+        response.from_cache = False
+
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            self.cache.refresh(request.url)
+            self.cache.record_revalidated()
+            return self._build_response(request, entry)
+
+        self.cache.record_miss()
+        # Le risposte in streaming (es. allegati con limite di dimensione) non vengono lette qui
+        if response.status_code in CACHEABLE_STATUSES and not stream and self._is_storable(request, response):
+            self.cache.store(request.url, response.status_code, response.headers, response.content)
+
+        return response
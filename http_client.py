@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+HTTP client condiviso per NORMATTIVA-SCRAPE
+Fornisce la sessione requests usata da tutte le fasi di scraping (documenti,
+articoli, versioni, allegati) con:
+
+- limitatore adattivo condiviso: token bucket (richieste/secondo) più finestra di
+  concorrenza, regolati con AIMD (aumento additivo sulle risposte veloci, dimezzamento
+  su 429/5xx, errori di rete e latenze molto sopra la media; Retry-After rispettato)
+- retry con backoff esponenziale e jitter per errori di rete, 429 e 5xx
+- deadline per richiesta: tempo massimo complessivo, retry compresi
+- opzionalmente, la cache persistente delle risposte (vedi http_cache.py)
+
+Il limitatore è montato sul transport adapter, quindi le risposte servite dalla
+cache su disco non consumano token né slot di concorrenza.
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuration constants
+DEFAULT_CONCURRENCY = 4  # Richieste HTTP contemporanee massime verso normattiva.it
+DEFAULT_TIMEOUT = 30  # Secondi, applicato a ogni tentativo senza timeout esplicito
+DEFAULT_RATE = 10.0  # Richieste al secondo massime (None = nessun limite di frequenza)
+DEFAULT_DEADLINE = 180  # Secondi massimi per una richiesta, retry compresi
+MAX_RETRIES = 4  # Tentativi aggiuntivi per errori transitori
+
+BACKOFF_BASE = 1.0  # Secondi di attesa prima del primo retry (poi raddoppia)
+BACKOFF_CAP = 60.0  # Attesa massima tra due tentativi
+MIN_RATE = 0.5  # Richieste al secondo minime dopo i dimezzamenti
+DECREASE_FACTOR = 0.5  # Fattore moltiplicativo di AIMD
+SLOW_LATENCY_FACTOR = 3.0  # Latenza oltre N volte la media = segnale di congestione
+LATENCY_SMOOTHING = 0.1  # Peso dell'ultima latenza nella media mobile esponenziale
+
+# Risposte che indicano sovraccarico o errori transitori del server
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = ('GET', 'HEAD')
+
+DEFAULT_HEADERS = {
+    'User-agent': "Mozilla/5.0"
+        "(Macintosh; Intel Mac OS X 10_11_6) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/55.0.2883.95 Safari/537.36",
+    'Connection': 'keep-alive'
+}
+
+
+def retry_after_seconds(response):
+    """Valore di Retry-After in secondi (solo la forma numerica), o None"""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Token bucket + finestra di concorrenza regolati con AIMD.
+    Condiviso da tutti i thread che usano la sessione.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
+        """
+        Args:
+            max_concurrency: richieste contemporanee massime
+            rate: richieste al secondo massime (None = solo limite di concorrenza)
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = float(self.max_concurrency)
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.latency = None  # Media mobile esponenziale delle latenze
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Attende uno slot di concorrenza e un token"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self._cond.wait()
+                elif self.rate is not None and self.tokens < 1:
+                    self._cond.wait((1 - self.tokens) / self.rate)
+                else:
+                    if self.rate is not None:
+                        self.tokens -= 1
+                    self.in_flight += 1
+                    return
+
+    def release(self, latency=None, status=None, error=False, retry_after=None):
+        """
+        Libera lo slot e aggiorna i limiti con l'esito della richiesta.
+
+        Args:
+            latency: secondi fino alla risposta (None se non misurata)
+            status: codice HTTP della risposta
+            error: errore di rete o timeout
+            retry_after: secondi di pausa chiesti dal server
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            congested = error or status in RETRY_STATUSES
+            if latency is not None and not congested:
+                if self.latency is not None and latency > SLOW_LATENCY_FACTOR * self.latency:
+                    congested = True
+                self.latency = latency if self.latency is None else (
+                    LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency
+                )
+
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+            if congested:
+                # Un solo dimezzamento per "round trip": le risposte lente in volo insieme contano una volta
+                if now - self.last_decrease >= max(self.latency or 0.0, 1.0):
+                    self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+                    if self.rate is not None:
+                        self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+                    self.last_decrease = now
+                    self.decreases += 1
+            elif latency is not None:
+                if self.limit < self.max_concurrency or (self.rate is not None and self.rate < self.max_rate):
+                    self.increases += 1
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                if self.rate is not None:
+                    self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'rate': self.rate,
+                'latency': self.latency,
+                'increases': self.increases,
+                'decreases': self.decreases,
+            }
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """Transport adapter che fa passare ogni richiesta di rete dal limitatore adattivo"""
+
+    def __init__(self, limiter=None, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        if self.limiter is None:
+            return super().send(request, **kwargs)
+
+        self.limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.limiter.release(error=True)
+            raise
+        except Exception:
+            self.limiter.release()
+            raise
+        self.limiter.release(time.monotonic() - started, response.status_code,
+                             retry_after=retry_after_seconds(response))
+        return response
+
+
+class BoundedSession(requests.Session):
+    """
+    Sessione requests con limitatore adattivo condiviso, retry e deadline.
+    Tutti i thread che usano la sessione (scoperta documenti, articoli, versioni e
+    allegati) rispettano gli stessi limiti e ritentano gli errori transitori.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, rate=DEFAULT_RATE,
+                 deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES):
+        super().__init__()
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter(self.max_concurrency, rate)
+        self.retries = 0
+        self.gave_up = 0
+        self._stats_lock = threading.Lock()
+
+    def _backoff(self, attempt, response):
+        """Retry-After se presente, altrimenti backoff esponenziale con jitter"""
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            return min(retry_after, BACKOFF_CAP)
+        delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def request(self, method, url, deadline=None, **kwargs):
+        # requests ignora session.timeout: lo applichiamo esplicitamente a ogni tentativo
+        timeout = kwargs.pop('timeout', None) or self.timeout
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        retryable = method.upper() in RETRY_METHODS
+
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            attempt_timeout = timeout if isinstance(timeout, tuple) else max(1.0, min(timeout, remaining))
+            response, error = None, None
+            try:
+                response = super().request(method, url, timeout=attempt_timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            if response is not None and (response.status_code not in RETRY_STATUSES or not retryable):
+                return response
+
+            delay = self._backoff(attempt, response)
+            if not retryable or attempt >= self.max_retries or time.monotonic() + delay >= deadline_at:
+                with self._stats_lock:
+                    self.gave_up += 1
+                reason = error or f"HTTP {response.status_code}"
+                print(f"❌ [http_client] Giving up after {attempt + 1} attempts ({reason}): {url}")
+                if error is not None:
+                    raise error
+                return response
+
+            reason = type(error).__name__ if error is not None else f"HTTP {response.status_code}"
+            print(f"⚠️ [http_client] {reason}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s: {url}")
+            if response is not None:
+                response.close()
+            with self._stats_lock:
+                self.retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        """Retry, richieste abbandonate e stato del limitatore"""
+        stats = self.limiter.stats()
+        stats.update({'retries': self.retries, 'gave_up': self.gave_up})
+        return stats
+
+
+def create_session(max_concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, cache=None, rate=DEFAULT_RATE,
+                   deadline=DEFAULT_DEADLINE):
+    """
+    Crea la sessione condivisa con header, pool di connessioni e limitatore adattivo.
+    Se cache è una http_cache.ResponseCache, le GET passano dalla cache su disco.
+    """
+    session = BoundedSession(max_concurrency=max_concurrency, timeout=timeout, rate=rate, deadline=deadline)
+    session.headers.update(DEFAULT_HEADERS)
+
+    # Un pool abbastanza grande da non serializzare i thread sul pool di urllib3
+    pool_kwargs = {'pool_connections': 4, 'pool_maxsize': max(10, session.max_concurrency)}
+    if cache is not None:
+        from http_cache import CachingAdapter
+        adapter = CachingAdapter(cache, limiter=session.limiter, **pool_kwargs)
+    else:
+        adapter = ThrottledAdapter(limiter=session.limiter, **pool_kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
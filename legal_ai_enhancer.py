@@ -4,13 +4,18 @@ Legal AI Enhancement Script
 Implements the critical missing features for legal AI system
 """
 
-import sqlite3
 import json
 import re
+import sys
+from itertools import islice
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import requests
 
+from db_connection import connect_database
+from db_writer import SchemaCapabilities, text_hash
+from embedding_store import pack_embedding
+
 # Optional imports for embeddings (fallback if not available)
 try:
     from transformers import AutoTokenizer, AutoModel
@@ -22,47 +27,150 @@ except ImportError:
     print("⚠️ Transformers not available. Install with: pip install transformers torch numpy")
     print("   Embeddings will be skipped, but other enhancements will run.")
 
+# Configuration constants
+EMBEDDING_MAX_TOKENS = 512  # Limite del modello BERT (troncamento in token, non in caratteri)
+EMBEDDING_BATCH_SIZE = 32  # Testi per forward pass
+EMBEDDING_SORT_WINDOW = 64  # Batch ordinati insieme per lunghezza (memoria limitata sui corpus grandi)
+EMBEDDING_WRITE_CHUNK = 256  # Embedding scritti nel database per blocco
+EMBEDDING_THREADS = None  # Thread intra-op di torch su CPU (None = default di torch, un thread per core fisico)
+EMBEDDING_MODEL_NAME = "dbmdz/bert-base-italian-cased"
+ENHANCER_VERSION = 1  # Da incrementare quando cambiano classificazione, estrazione di commi/citazioni o embedding
+ENHANCE_CHECKPOINT_SIZE = 200  # Righe elaborate per commit (ripresa dopo un'interruzione)
+
+# Per riga: hash del contenuto elaborato e versione dell'enhancer che l'ha elaborato
+SQL_CREATE_STATO_ARRICCHIMENTO = """
+    CREATE TABLE IF NOT EXISTS stato_arricchimento (
+        tabella VARCHAR(30) NOT NULL,
+        riga_id INTEGER NOT NULL,
+        hash_contenuto CHAR(64) NOT NULL,
+        versione_enhancer VARCHAR(100) NOT NULL,
+        aggiornato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (tabella, riga_id)
+    )
+"""
+
+
+def plan_batches(lengths, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Indici dei testi raggruppati in batch di lunghezza (in token) simile: ordinati per
+    lunghezza, il padding di ogni batch arriva solo al testo più lungo dei suoi vicini.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def iter_windows(items, size):
+    """Blocchi consecutivi di al massimo size elementi da un iterabile"""
+    iterator = iter(items)
+    while True:
+        window = list(islice(iterator, size))
+        if not window:
+            return
+        yield window
+
+
+def configure_torch_threads(threads=EMBEDDING_THREADS):
+    """
+    Thread di torch per l'inferenza su CPU, da chiamare una volta all'avvio dello script
+    (impostazione globale del processo). threads=None lascia il default di torch.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        # Un solo modello alla volta: niente parallelismo tra operatori
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Già impostato (può essere fatto una sola volta per processo)
+
+
 class LegalAIEnhancer:
-    def __init__(self, db_path: str = "data.sqlite"):
+    def __init__(self, db_path: str = "data.sqlite", quantize_embeddings: bool = False):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        # Embedding salvati come BLOB float32 (o int8 quantizzati), vedi embedding_store.py
+        self.quantize_embeddings = quantize_embeddings
+        self.conn = connect_database(db_path)
         self.cursor = self.conn.cursor()
         
         # Initialize Italian legal language model
         if TRANSFORMERS_AVAILABLE:
             try:
-                self.tokenizer = AutoTokenizer.from_pretrained("dbmdz/bert-base-italian-cased")
-                self.model = AutoModel.from_pretrained("dbmdz/bert-base-italian-cased")
+                self.tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+                self.model = AutoModel.from_pretrained(EMBEDDING_MODEL_NAME)
+                self.model.eval()
                 self.embedding_model_available = True
             except Exception as e:
                 print(f"⚠️ Embedding model not available: {e}")
                 self.embedding_model_available = False
         else:
             self.embedding_model_available = False
+
+        # Righe elaborate senza modello (o con un altro formato) vanno rielaborate quando cambia
+        if self.embedding_model_available:
+            self.enhancer_version = f"{ENHANCER_VERSION}/{EMBEDDING_MODEL_NAME}{'/int8' if quantize_embeddings else ''}"
+        else:
+            self.enhancer_version = f"{ENHANCER_VERSION}/no-embeddings"
     
     def generate_embeddings(self, text: str) -> Optional[List[float]]:
         """Generate embeddings for legal text using Italian BERT"""
+        for batch in self.generate_embeddings_batch([(0, text)], batch_size=1):
+            return batch[0][1]
+        return None
+
+    def generate_embeddings_batch(self, items, batch_size: int = EMBEDDING_BATCH_SIZE):
+        """
+        Embedding di molti testi: items sono coppie (chiave, testo), restituite a blocchi
+        come liste di (chiave, embedding), un blocco per batch.
+
+        I testi vengono tokenizzati una volta (troncati a EMBEDDING_MAX_TOKENS token),
+        ordinati per lunghezza dentro finestre di EMBEDDING_SORT_WINDOW batch e completati
+        con il padding solo fino al testo più lungo del batch.
+        """
         if not self.embedding_model_available:
-            return None
-        
-        try:
-            # Truncate text if too long
-            max_length = 512
-            if len(text) > max_length:
-                text = text[:max_length]
-            
-            # Tokenize and encode
-            inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length)
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                # Use CLS token embedding
-                embeddings = outputs.last_hidden_state[:, 0, :].squeeze()
-                return embeddings.tolist()
-        
-        except Exception as e:
-            print(f"⚠️ Error generating embedding: {e}")
-            return None
+            return
+
+        for window in iter_windows(items, batch_size * EMBEDDING_SORT_WINDOW):
+            try:
+                encoded = self.tokenizer(
+                    [text for _, text in window], truncation=True, max_length=EMBEDDING_MAX_TOKENS
+                )['input_ids']
+            except Exception as e:
+                print(f"⚠️ Error tokenizing {len(window)} texts: {e}")
+                continue
+
+            for batch in plan_batches([len(ids) for ids in encoded], batch_size):
+                try:
+                    inputs = self.tokenizer.pad({'input_ids': [encoded[i] for i in batch]}, return_tensors="pt")
+                    with torch.inference_mode():
+                        outputs = self.model(**inputs)
+                    # Use CLS token embedding
+                    vectors = outputs.last_hidden_state[:, 0, :].float().tolist()
+                except Exception as e:
+                    print(f"⚠️ Error generating embeddings for a batch of {len(batch)} texts: {e}")
+                    continue
+                yield [(window[i][0], vector) for i, vector in zip(batch, vectors)]
+
+    def store_embeddings(self, items, table: str, column: str, commit: bool = True) -> List[int]:
+        """
+        Calcola in batch gli embedding di (id, testo) e li scrive in table.column a blocchi
+        (commit=False: il commit resta al checkpoint del chiamante).
+        Restituisce gli id scritti: le righe dei batch falliti non ci sono.
+        """
+        pending = []
+        stored = []
+        for batch in self.generate_embeddings_batch(items):
+            pending.extend((pack_embedding(embedding, self.quantize_embeddings), row_id) for row_id, embedding in batch)
+            if len(pending) >= EMBEDDING_WRITE_CHUNK:
+                stored.extend(self._write_embeddings(table, column, pending, commit))
+                pending = []
+        if pending:
+            stored.extend(self._write_embeddings(table, column, pending, commit))
+        return stored
+
+    def _write_embeddings(self, table, column, rows, commit):
+        self.cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", rows)
+        if commit:
+            self.conn.commit()
+        return [row_id for _, row_id in rows]
     
     def classify_article_type(self, text: str) -> Dict[str, Any]:
         """Classify article type based on content analysis"""
@@ -203,27 +311,121 @@ class LegalAIEnhancer:
         
         return matched_categories
     
-    def enhance_database(self):
-        """Main method to enhance the database with AI-ready features"""
+    def enhance_database(self, full: bool = False):
+        """
+        Main method to enhance the database with AI-ready features.
+        Solo articoli e documenti nuovi o modificati (hash del contenuto o versione
+        dell'enhancer diversi da stato_arricchimento); full=True rielabora tutto.
+        Commit ogni ENHANCE_CHECKPOINT_SIZE righe: dopo un'interruzione si riprende da lì.
+        """
         print("🚀 Starting Legal AI Enhancement Process...")
-        
-        # 1. Generate embeddings for all articles
-        print("\n1. Generating embeddings for articles...")
-        self.cursor.execute("SELECT id, testo_completo FROM articoli WHERE testo_completo IS NOT NULL")
+        self.conn.execute(SQL_CREATE_STATO_ARRICCHIMENTO)
+        results = {
+            'embeddings_generated': 0,
+            'articles_classified': 0,
+            'articles_unchanged': 0,
+            'commi_extracted': 0,
+            'commi_embeddings_generated': 0,
+            'documents_categorized': 0,
+            'documents_unchanged': 0,
+            'citations_extracted': 0,
+            'doc_embeddings_generated': 0
+        }
+
+        # 1. Articles: classification, commi, citations, embeddings
+        print("\n1. Enhancing new or changed articles...")
+        text_source = SchemaCapabilities.from_connection(self.conn).article_text_source
+        self.cursor.execute(f"SELECT id, testo_completo FROM {text_source} WHERE testo_completo IS NOT NULL")
         articles = self.cursor.fetchall()
-        
-        embeddings_generated = 0
-        for article_id, text in articles:
-            if self.embedding_model_available:
-                embedding = self.generate_embeddings(text)
-                if embedding:
-                    embedding_json = json.dumps(embedding)
-                    self.cursor.execute(
-                        "UPDATE articoli SET embedding_articolo = ? WHERE id = ?",
-                        (embedding_json, article_id)
-                    )
-                    embeddings_generated += 1
-            
+        pending = self.pending_rows('articoli', articles, full)
+        results['articles_unchanged'] = len(articles) - len(pending)
+        print(f"   {len(pending)} to process, {results['articles_unchanged']} unchanged")
+
+        for chunk in iter_windows(pending, ENHANCE_CHECKPOINT_SIZE):
+            self.mark_enhanced('articoli', self.enhance_articles(chunk, results))
+            self.conn.commit()  # Checkpoint
+
+        print(f"   Generated {results['embeddings_generated']} embeddings")
+        print(f"   Classified {results['articles_classified']} articles")
+        print(f"   Extracted {results['commi_extracted']} commi ({results['commi_embeddings_generated']} embeddings)")
+        print(f"   Extracted {results['citations_extracted']} citations")
+
+        # 2. Documents: categories and embeddings
+        print("\n2. Enhancing new or changed documents...")
+        self.cursor.execute("SELECT id, testo_completo, titoloAtto FROM documenti_normativi")
+        documents = [(doc_id, f"{title}\n{text or ''}", text, title) for doc_id, text, title in self.cursor.fetchall()]
+        pending = self.pending_rows('documenti_normativi', documents, full)
+        results['documents_unchanged'] = len(documents) - len(pending)
+        print(f"   {len(pending)} to process, {results['documents_unchanged']} unchanged")
+
+        for chunk in iter_windows(pending, ENHANCE_CHECKPOINT_SIZE):
+            self.mark_enhanced('documenti_normativi', self.enhance_documents(chunk, results))
+            self.conn.commit()  # Checkpoint
+
+        print(f"   Categorized {results['documents_categorized']} documents")
+        print(f"   Generated {results['doc_embeddings_generated']} document embeddings")
+
+        print("\n✅ Legal AI Enhancement Complete!")
+        print(f"   - {results['embeddings_generated']} article embeddings")
+        print(f"   - {results['articles_classified']} articles classified ({results['articles_unchanged']} unchanged)")
+        print(f"   - {results['commi_extracted']} commi extracted")
+        print(f"   - {results['documents_categorized']} documents categorized ({results['documents_unchanged']} unchanged)")
+        print(f"   - {results['citations_extracted']} citations extracted")
+        print(f"   - {results['doc_embeddings_generated']} document embeddings")
+
+        return results
+
+    # ----------------------------------------
+    # Stato incrementale
+    # ----------------------------------------
+
+    def pending_rows(self, table: str, rows, full: bool = False):
+        """
+        Righe (id, contenuto, ...) da elaborare: quelle senza stato o con hash del
+        contenuto / versione dell'enhancer diversi. Restituisce (id, ..., hash).
+        """
+        done = {}
+        if not full:
+            done = {
+                row_id: (content_hash, version)
+                for row_id, content_hash, version in self.conn.execute(
+                    "SELECT riga_id, hash_contenuto, versione_enhancer FROM stato_arricchimento WHERE tabella = ?", [table]
+                )
+            }
+        pending = []
+        for row in rows:
+            content_hash = text_hash(row[1] or '')
+            if done.get(row[0]) != (content_hash, self.enhancer_version):
+                pending.append(tuple(row) + (content_hash,))
+        return pending
+
+    def mark_enhanced(self, table: str, rows):
+        """Registra hash e versione delle righe elaborate (nella transazione del checkpoint)"""
+        self.cursor.executemany("""
+            INSERT OR REPLACE INTO stato_arricchimento (tabella, riga_id, hash_contenuto, versione_enhancer, aggiornato_il)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [(table, row[0], row[-1], self.enhancer_version) for row in rows])
+
+    def _completed_rows(self, chunk, expected, embedded, table):
+        """
+        Righe del blocco da registrare come elaborate: senza modello tutte, altrimenti solo
+        quelle con tutti gli embedding attesi scritti (le altre verranno rielaborate)
+        """
+        if not self.embedding_model_available:
+            return chunk
+        failed = {row_id for row_id, key in expected if key not in embedded}
+        if failed:
+            print(f"⚠️ {table}: embeddings missing for {len(failed)} rows, they will be retried on the next run")
+        return [row for row in chunk if row[0] not in failed]
+
+    def enhance_articles(self, chunk, results):
+        """
+        Classificazione, commi, citazioni ed embedding di un blocco di articoli (id, testo, hash).
+        Restituisce le righe completate, da passare a mark_enhanced.
+        """
+        commi_texts = []
+        commi_owner = []  # (articolo, comma) per verificare gli embedding dei commi
+        for article_id, text, _ in chunk:
             # Add semantic classification
             classification = self.classify_article_type(text)
             self.cursor.execute("""
@@ -238,42 +440,56 @@ class LegalAIEnhancer:
                 json.dumps(classification['ambito_applicazione']),
                 article_id
             ))
-        
-        print(f"   Generated {embeddings_generated} embeddings")
-        print(f"   Classified {len(articles)} articles")
-        
-        # 2. Extract and populate commi
-        print("\n2. Extracting individual commi...")
-        commi_extracted = 0
-        for article_id, text in articles:
-            commi = self.extract_commi(text)
-            for comma in commi:
-                embedding = None
-                if self.embedding_model_available:
-                    embedding = self.generate_embeddings(comma['testo'])
-                
+            results['articles_classified'] += 1
+
+            # Commi dell'articolo sostituiti in blocco: rielaborare non li duplica
+            self.cursor.execute("DELETE FROM commi WHERE articolo_id = ?", (article_id,))
+            for comma in self.extract_commi(text):
                 self.cursor.execute("""
-                    INSERT INTO commi (articolo_id, numero_comma, testo, embedding_comma, ha_sottopunti)
-                    VALUES (?, ?, ?, ?, ?)
+                    INSERT INTO commi (articolo_id, numero_comma, testo, ha_sottopunti)
+                    VALUES (?, ?, ?, ?)
                 """, (
                     article_id,
                     comma['numero_comma'],
                     comma['testo'],
-                    json.dumps(embedding) if embedding else None,
                     comma['ha_sottopunti']
                 ))
-                commi_extracted += 1
-        
-        print(f"   Extracted {commi_extracted} commi")
-        
-        # 3. Categorize documents
-        print("\n3. Categorizing documents...")
-        self.cursor.execute("SELECT id, testo_completo, titoloAtto FROM documenti_normativi")
-        documents = self.cursor.fetchall()
-        
-        categorized_docs = 0
-        for doc_id, text, title in documents:
-            categories = self.categorize_document(text, title)
+                commi_texts.append((self.cursor.lastrowid, comma['testo']))
+                commi_owner.append((article_id, ('commi', self.cursor.lastrowid)))
+                results['commi_extracted'] += 1
+
+            # Citazioni estratte dal testo (senza articolo citato risolto): stessa sostituzione
+            self.cursor.execute(
+                "DELETE FROM citazioni_normative WHERE articolo_citante_id = ? AND articolo_citato_id IS NULL",
+                (article_id,)
+            )
+            for citation in self.extract_citations(text):
+                self.cursor.execute("""
+                    INSERT INTO citazioni_normative (articolo_citante_id, tipo_citazione, contesto_citazione)
+                    VALUES (?, ?, ?)
+                """, (article_id, citation['tipo_citazione'], citation['contesto']))
+                results['citations_extracted'] += 1
+
+        embedded_articles = self.store_embeddings(
+            ((article_id, text) for article_id, text, _ in chunk), 'articoli', 'embedding_articolo', commit=False
+        )
+        embedded_commi = self.store_embeddings(commi_texts, 'commi', 'embedding_comma', commit=False)
+        results['embeddings_generated'] += len(embedded_articles)
+        results['commi_embeddings_generated'] += len(embedded_commi)
+
+        embedded = {('articoli', row_id) for row_id in embedded_articles}
+        embedded.update(('commi', row_id) for row_id in embedded_commi)
+        expected = [(article_id, ('articoli', article_id)) for article_id, _, _ in chunk] + commi_owner
+        return self._completed_rows(chunk, expected, embedded, 'articoli')
+
+    def enhance_documents(self, chunk, results):
+        """
+        Categorie ed embedding di un blocco di documenti (id, contenuto, testo, titolo, hash).
+        Restituisce le righe completate, da passare a mark_enhanced.
+        """
+        for doc_id, _, text, title, _ in chunk:
+            categories = self.categorize_document(text or '', title or '')
+            self.cursor.execute("DELETE FROM documento_categorie WHERE documento_id = ?", (doc_id,))
             for category_id in categories:
                 # Calculate relevance based on keyword frequency
                 relevance = min(1.0, len(categories) / 3.0)  # Simple relevance calculation
@@ -282,61 +498,16 @@ class LegalAIEnhancer:
                     INSERT OR REPLACE INTO documento_categorie (documento_id, categoria_id, rilevanza)
                     VALUES (?, ?, ?)
                 """, (doc_id, category_id, relevance))
-            categorized_docs += 1
-        
-        print(f"   Categorized {categorized_docs} documents")
-        
-        # 4. Extract citations
-        print("\n4. Extracting legal citations...")
-        citations_extracted = 0
-        for article_id, text in articles:
-            citations = self.extract_citations(text)
-            for citation in citations:
-                self.cursor.execute("""
-                    INSERT INTO citazioni_normative (articolo_citante_id, tipo_citazione, contesto_citazione)
-                    VALUES (?, ?, ?)
-                """, (article_id, citation['tipo_citazione'], citation['contesto']))
-                citations_extracted += 1
-        
-        print(f"   Extracted {citations_extracted} citations")
-        
-        # 5. Generate document embeddings
-        print("\n5. Generating document embeddings...")
-        doc_embeddings_generated = 0
-        for doc_id, text, title in documents:
-            if self.embedding_model_available and text:
-                # Use title + first 1000 chars for document embedding
-                doc_text = f"{title}\n{text[:1000]}"
-                embedding = self.generate_embeddings(doc_text)
-                if embedding:
-                    embedding_json = json.dumps(embedding)
-                    self.cursor.execute(
-                        "UPDATE documenti_normativi SET embedding_documento = ? WHERE id = ?",
-                        (embedding_json, doc_id)
-                    )
-                    doc_embeddings_generated += 1
-        
-        print(f"   Generated {doc_embeddings_generated} document embeddings")
-        
-        # Commit all changes
-        self.conn.commit()
-        
-        print("\n✅ Legal AI Enhancement Complete!")
-        print(f"   - {embeddings_generated} article embeddings")
-        print(f"   - {len(articles)} articles classified")
-        print(f"   - {commi_extracted} commi extracted")
-        print(f"   - {categorized_docs} documents categorized")
-        print(f"   - {citations_extracted} citations extracted")
-        print(f"   - {doc_embeddings_generated} document embeddings")
-        
-        return {
-            'embeddings_generated': embeddings_generated,
-            'articles_classified': len(articles),
-            'commi_extracted': commi_extracted,
-            'documents_categorized': categorized_docs,
-            'citations_extracted': citations_extracted,
-            'doc_embeddings_generated': doc_embeddings_generated
-        }
+            results['documents_categorized'] += 1
+
+        # Use title + first 1000 chars for document embedding (troncato poi a EMBEDDING_MAX_TOKENS)
+        embedded = self.store_embeddings(
+            ((doc_id, f"{title}\n{text[:1000]}") for doc_id, _, text, title, _ in chunk if text),
+            'documenti_normativi', 'embedding_documento', commit=False
+        )
+        results['doc_embeddings_generated'] += len(embedded)
+        expected = [(doc_id, doc_id) for doc_id, _, text, _, _ in chunk if text]
+        return self._completed_rows(chunk, expected, set(embedded), 'documenti_normativi')
     
     def close(self):
         """Close database connection"""
@@ -344,10 +515,13 @@ class LegalAIEnhancer:
 
 def main():
     """Main enhancement script"""
-    enhancer = LegalAIEnhancer()
+    if TRANSFORMERS_AVAILABLE:
+        threads = int(sys.argv[sys.argv.index('--threads') + 1]) if '--threads' in sys.argv else EMBEDDING_THREADS
+        configure_torch_threads(threads)
+    enhancer = LegalAIEnhancer(quantize_embeddings='--int8' in sys.argv)
     
     try:
-        results = enhancer.enhance_database()
+        results = enhancer.enhance_database(full='--full' in sys.argv)
         print("\n📊 Enhancement Results:")
         for key, value in results.items():
             print(f"   {key}: {value}")
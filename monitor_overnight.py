@@ -4,16 +4,17 @@ Overnight Progress Monitor
 Monitors the progress of the overnight complete scraping process
 """
 
-import sqlite3
 import time
 import os
 from datetime import datetime
 import sys
 
+from db_connection import connect_monitor
+
 def get_database_stats():
     """Get current database statistics"""
     try:
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_monitor()
         cursor = conn.cursor()
         
         # Get document counts
@@ -6,10 +6,11 @@ Run this script periodically to check progress during the overnight run
 
 import os
 import glob
-import sqlite3
 from datetime import datetime
 import time
 
+from db_connection import connect_monitor
+
 def get_latest_log_file():
     """Find the most recent historical population log file"""
     log_files = glob.glob("historical_population_*.log")
@@ -56,7 +57,7 @@ def parse_log_progress(log_file):
 def get_database_stats():
     """Get current database statistics"""
     try:
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_monitor()
         cursor = conn.cursor()
         
         # Count documents
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Process pool for the HTML parsing stage of scraper_optimized.py
+lxml.html.fromstring, clean_article_text, extract_correlated_articles e la ricerca
+del titolo sono CPU-bound: con i fetch concorrenti il GIL li serializza su un core
+mentre la rete resta ferma. I thread di crawling passano i byte grezzi a processi
+worker che restituiscono record compatti (titolo, date, testo, testo pulito, link,
+URL degli allegati); nel frattempo gli altri thread continuano a scaricare.
+
+Le funzioni di parsing vengono passate come parametro (come in crawl_engine.py),
+così il modulo non importa scraper_optimized. Devono essere funzioni di modulo
+(serializzabili con pickle) e non devono usare il database né la sessione HTTP.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Configuration constants
+DEFAULT_PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Un core resta ai thread di rete e al writer
+
+
+class ParsePool:
+    """ProcessPoolExecutor condiviso per il parsing, con esecuzione nel thread chiamante come fallback"""
+
+    def __init__(self, workers=DEFAULT_PARSE_WORKERS):
+        """
+        Args:
+            workers: processi di parsing (0 = parsing nel thread chiamante)
+        """
+        self.workers = max(0, int(workers))
+        self.submitted = 0
+        self.inline = 0
+        self._executor = None
+        self._broken = False
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Creato al primo uso: nessun processo avviato se non c'è nulla da parsare
+        with self._lock:
+            if self._executor is None and self.workers > 0 and not self._broken:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def run(self, fn, *args):
+        """Esegue fn(*args) in un processo worker e ne restituisce il risultato"""
+        executor = self._get_executor()
+        if executor is None:
+            self.inline += 1
+            return fn(*args)
+
+        try:
+            # RuntimeError: pool chiuso da un altro thread dopo un guasto
+            future = executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            return self._run_inline_after_failure(e, fn, args)
+        self.submitted += 1
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            return self._run_inline_after_failure(e, fn, args)
+
+    def _run_inline_after_failure(self, error, fn, args):
+        # Un worker terminato (es. memoria esaurita) rompe il pool: si prosegue nel thread
+        with self._lock:
+            if not self._broken:
+                print(f"⚠️ [parse_pool] Process pool unavailable ({error}), parsing in the crawl threads from now on")
+            self._broken = True
+        self.shutdown(wait=False)
+        self.inline += 1
+        return fn(*args)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -8,6 +8,9 @@ import sqlite3
 import re
 from typing import Dict, List, Optional
 
+from db_connection import connect_database
+from db_writer import SchemaCapabilities
+
 class FonteOriginePopulator:
     def __init__(self, db_path: str = 'data.sqlite'):
         """Initialize the populator with database connection."""
@@ -16,7 +19,7 @@ class FonteOriginePopulator:
         
     def connect(self):
         """Connect to the database."""
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = connect_database(self.db_path)
         self.conn.row_factory = sqlite3.Row
         
     def disconnect(self):
@@ -29,10 +32,7 @@ class FonteOriginePopulator:
         cursor = self.conn.cursor()
         
         # Check if column already exists
-        cursor.execute("PRAGMA table_info(articoli)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'fonte_origine' not in columns:
+        if not SchemaCapabilities.from_connection(self.conn).has_fonte_origine:
             print("Adding fonte_origine column...")
             cursor.execute("ALTER TABLE articoli ADD COLUMN fonte_origine VARCHAR(100)")
             self.conn.commit()
@@ -99,10 +99,11 @@ class FonteOriginePopulator:
         """Populate the fonte_origine column for all articles."""
         cursor = self.conn.cursor()
         
-        # Get all articles
-        cursor.execute("""
+        # Get all articles (testi nel deposito testi_articoli: letti dalla vista articoli_testo)
+        text_source = SchemaCapabilities.from_connection(self.conn).article_text_source
+        cursor.execute(f"""
             SELECT id, numero_articolo, testo_completo, titoloAtto, url_documento
-            FROM articoli
+            FROM {text_source}
         """)
         
         articles = cursor.fetchall()
@@ -161,12 +162,13 @@ class FonteOriginePopulator:
             ("allegati", "Protocollo", "Allegati > Protocollo"),
         ]
         
+        text_source = SchemaCapabilities.from_connection(self.conn).article_text_source
         for url_pattern, section_pattern, fonte_value in patterns:
-            cursor.execute("""
+            cursor.execute(f"""
                 UPDATE articoli 
                 SET fonte_origine = ?
                 WHERE (url_documento LIKE ? OR 
-                       testo_completo LIKE ? OR 
+                       id IN (SELECT id FROM {text_source} WHERE testo_completo LIKE ?) OR 
                        titoloAtto LIKE ?)
                   AND fonte_origine IS NULL
             """, (fonte_value, f"%{url_pattern}%", f"%{section_pattern}%", f"%{section_pattern}%"))
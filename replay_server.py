@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Offline replay server for NORMATTIVA-SCRAPE
+Server HTTP locale che sostituisce normattiva.it servendo un crawl registrato,
+per benchmark e test di regressione riproducibili senza rete.
+
+Registrazione (l'archivio usa lo stesso formato di http_cache.py, senza scadenza):
+    python scraper_optimized.py 2024 20 --record crawl_2024.sqlite
+
+Replay (avvia il server in background e punta normattiva_url su di esso):
+    python scraper_optimized.py 2024 20 --replay crawl_2024.sqlite
+
+Server stand-alone:
+    python replay_server.py crawl_2024.sqlite [--port 8765]
+    python scraper_optimized.py 2024 20 --base-url http://127.0.0.1:8765 --no-cache
+
+Il server imita:
+- /uri-res/N2Ls?urn:nir:... e le URL showArticle registrate (redirect compresi)
+- la pagina "Errore nel caricamento delle informazioni" per i documenti non registrati
+"""
+
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_cache import ResponseCache
+
+# Configuration constants
+DEFAULT_PORT = 8765
+ARCHIVE_HOST = 'www.normattiva.it'  # Host con cui le pagine sono state registrate
+
+# Pagina restituita da normattiva.it per URN inesistenti (servita con 200, come il sito)
+NOT_FOUND_PAGE = (
+    "<html><head><title>Normattiva</title></head><body>"
+    "<div class=\"alert alert-danger\">Errore nel caricamento delle informazioni</div>"
+    "</body></html>"
+).encode('utf-8')
+
+# URL assolute verso normattiva.it dentro le pagine registrate
+NORMATTIVA_ABSOLUTE_URL = re.compile(rb'https?://www\.normattiva\.it')
+
+
+def open_archive(path):
+    """Apre un archivio di crawl in sola lettura logica (nessuna scadenza, nessun aggiornamento LRU)"""
+    return ResponseCache(path, ttl=None, max_size=None, track_access=False)
+
+
+def open_recording_archive(path):
+    """Apre (o crea) un archivio in cui registrare un crawl"""
+    return ResponseCache(path, ttl=None, max_size=None)
+
+
+class NormattivaStandInHandler(BaseHTTPRequestHandler):
+    """Serve le risposte registrate; gli URN non registrati ricevono la pagina di errore di normattiva"""
+
+    def _rewrite(self, data):
+        """Riscrive le URL assolute di normattiva.it verso il server locale"""
+        return NORMATTIVA_ABSOLUTE_URL.sub(self.server.base_url.encode('ascii'), data)
+
+    def do_GET(self):
+        entry = self.server.archive.lookup(f"http://{ARCHIVE_HOST}{self.path}")
+
+        if entry is None:
+            with self.server.counter_lock:
+                self.server.misses += 1
+            status, body, headers = 200, NOT_FOUND_PAGE, {'Content-Type': 'text/html; charset=utf-8'}
+        else:
+            with self.server.counter_lock:
+                self.server.hits += 1
+            status, body, headers = entry['status'], self._rewrite(entry['body']), entry['headers']
+
+        self.send_response(status)
+        self.send_header('Content-Type', headers.get('Content-Type', 'text/html; charset=utf-8'))
+        if 'Location' in headers:
+            self.send_header('Location', self._rewrite(headers['Location'].encode('ascii')).decode('ascii'))
+        for name in ('ETag', 'Last-Modified'):
+            if name in headers:
+                self.send_header(name, headers[name])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Stand-in locale di normattiva.it basato su un archivio registrato"""
+
+    daemon_threads = True
+
+    def __init__(self, archive_path, host='127.0.0.1', port=DEFAULT_PORT):
+        super().__init__((host, port), NormattivaStandInHandler)
+        self.archive = open_archive(archive_path)
+        self.base_url = f"http://{host}:{self.server_address[1]}"
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()  # Un thread per richiesta (ThreadingHTTPServer)
+
+    def start_in_background(self):
+        """Avvia il server in un thread daemon e restituisce la base URL"""
+        thread = threading.Thread(target=self.serve_forever, name='replay-server', daemon=True)
+        thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.archive.close()
+
+
+def main():
+    """Avvia il server stand-alone"""
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help', 'help']:
+        print("USAGE:")
+        print("  python replay_server.py ARCHIVIO.sqlite [--port N]")
+        sys.exit(0)
+
+    port = DEFAULT_PORT
+    if '--port' in sys.argv:
+        port = int(sys.argv[sys.argv.index('--port') + 1])
+
+    server = ReplayServer(sys.argv[1], port=port)
+    print(f"🗄️ Replaying {sys.argv[1]} on {server.base_url}")
+    print(f"💡 Run: python scraper_optimized.py [anno] [num_docs] --base-url {server.base_url} --no-cache")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Replay server stopped ({server.hits} hits, {server.misses} not found)")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
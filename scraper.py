@@ -1,12 +1,13 @@
 from collections import OrderedDict
 import re
 import json
-import sqlite3
 from datetime import datetime
 import lxml.html
 import requests
 import scraperwiki
 
+from db_connection import connect_database, connect_monitor
+
 # Import the new article updates functionality
 try:
     from article_updates_scraper import (
@@ -29,10 +30,8 @@ normattiva_url = "http://www.normattiva.it"
 def init_optimized_database():
     """Inizializza il database con la nuova struttura ottimizzata"""
     try:
-        import sqlite3
-        
         # Connessione diretta al database
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         # Verifica se esistono già le nuove tabelle
@@ -171,8 +170,7 @@ def get_livello_gerarchia(tipo_atto: str) -> int:
 def save_documento_normativo(documento_data: dict) -> int:
     """Salva un documento normativo nel database ottimizzato"""
     try:
-        import sqlite3
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         # Verifica se il documento esiste già
@@ -227,8 +225,7 @@ def save_documento_normativo(documento_data: dict) -> int:
 def save_articolo(articolo_data: dict) -> int:
     """Salva un articolo nel database"""
     try:
-        import sqlite3
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         insert_query = """
@@ -259,8 +256,7 @@ def save_articolo(articolo_data: dict) -> int:
 def save_citazione_normativa(citazione_data: dict):
     """Salva una citazione normativa"""
     try:
-        import sqlite3
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         insert_query = """
@@ -287,8 +283,7 @@ def save_citazione_normativa(citazione_data: dict):
 def get_documento_by_urn(urn: str):
     """Recupera un documento dal database tramite URN"""
     try:
-        import sqlite3
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         cursor.execute("SELECT id FROM documenti_normativi WHERE urn = ?", [urn])
@@ -303,8 +298,7 @@ def get_documento_by_urn(urn: str):
 def get_articoli_by_documento(documento_id: int):
     """Recupera gli articoli di un documento"""
     try:
-        import sqlite3
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         cursor.execute("SELECT id FROM articoli WHERE documento_id = ? LIMIT 1", [documento_id])
@@ -756,8 +750,7 @@ if __name__ == '__main__':
 
         # Statistiche finali
         try:
-            import sqlite3
-            conn = sqlite3.connect('data.sqlite')
+            conn = connect_monitor()
             cursor = conn.cursor()
             
             cursor.execute("SELECT COUNT(*) FROM documenti_normativi")
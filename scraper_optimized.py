@@ -14,7 +14,6 @@ Main entry point: python scraper_optimized.py [year] [num_docs]
 from collections import OrderedDict
 import re
 import json
-import sqlite3
 from datetime import datetime, date
 import lxml.html
 import requests
@@ -23,6 +22,9 @@ from urllib.parse import urljoin, urlparse, parse_qs
 import time
 import copy
 import os
+from concurrent.futures import ThreadPoolExecutor, Future
+from functools import lru_cache
+import threading
 
 # Ensure UTF-8 output for Unicode (emoji) in Windows terminals
 if sys.stdout.encoding and sys.stdout.encoding.lower() != "utf-8":
@@ -36,10 +38,57 @@ except ImportError:
     print("Warning: populate_fonte_origine.py not found. Fonte origine will not be populated automatically.")
     FonteOriginePopulator = None
 
+from http_client import create_session, DEFAULT_CONCURRENCY, DEFAULT_RATE, RETRY_STATUSES
+from year_discovery import find_last_document
+from format_selector import UrnFormatSelector
+from parse_pool import ParsePool, DEFAULT_PARSE_WORKERS
+from text_cleaning import clean_article_text
+from search_index import ensure_search_index
+from existence_index import (
+    ExistenceIndex, DEFAULT_INDEX_PATH, STATUS_FOUND, STATUS_MISSING,
+    DOCUMENT_UNCHANGED, content_hash
+)
+from http_cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_TTL, normalize_url
+from db_connection import connect_database, connect_monitor
+from db_writer import (
+    get_database_writer, close_database_writer,
+    set_schema_capabilities, SchemaCapabilities, SQL_CREATE_ALLEGATI_SCARTATI, ensure_text_store,
+    DocumentRecord, ArticleRecord, ArticleUpdateRecord, CitationRecord, SkippedAllegatoRecord, WriteResult
+)
+
 normattiva_url = "http://www.normattiva.it"
 
+# Indice persistente dei numeri esistenti (existence_index.py), aperto da main; None = disattivato
+existence_index = None
+
+# Ordine dei formati URN-NIR pre-1900 appreso durante l'esecuzione (format_selector.py)
+format_selector = UrnFormatSelector()
+
+# Processi per il parsing HTML (parse_pool.py), creati da main; None = parsing nel thread chiamante
+parse_pool = None
+
+# Modalità --update: i documenti già salvati vengono riverificati e si scaricano solo
+# gli articoli con versioni (agg.N) nuove, aggiunte sotto l'articolo base esistente
+update_mode = False
+update_stats = {'unchanged': 0, 'updated': 0, 'appended': 0}
+update_stats_lock = threading.Lock()  # Incrementato dai worker del motore async e del pool delle versioni
+
 # Configuration constants
 MAX_ALLEGATO_LENGTH = 50000  # Maximum character length for allegati (50K chars)
+MAX_ALLEGATO_BYTES = MAX_ALLEGATO_LENGTH * 3  # Byte HTML scaricati al massimo per un allegato (markup incluso)
+ALLEGATO_CHUNK_SIZE = 16 * 1024  # Byte letti per volta dallo stream di un allegato
+ALLEGATO_TIMEOUT = 30  # Secondi per tentativo per le richieste degli allegati
+
+# Motivi di scarto degli allegati (tabella allegati_scartati)
+SKIP_CONTENT_LENGTH = 'content_length'  # Content-Length dichiarato oltre il limite: nessun byte scaricato
+SKIP_DOWNLOAD_CAP = 'download_cap'  # Download interrotto al superamento del limite
+SKIP_TEXT_LENGTH = 'text_length'  # Testo estratto oltre MAX_ALLEGATO_LENGTH caratteri
+SKIP_HTTP_ERROR = 'http_error'
+SKIP_REQUEST_ERROR = 'request_error'
+SKIP_PARSE_ERROR = 'parse_error'
+
+VERSION_FETCH_WORKERS = 4  # Versioni (orig./agg.N) di un articolo scaricate in parallelo
+DOCUMENT_TITLE_CACHE_SIZE = 256  # Titoli dei documenti letti dal database (fallback senza DocumentContext)
 
 # ========================================
 # URL UTILITY FUNCTIONS
@@ -71,6 +120,38 @@ def convert_to_permalink_format(full_url):
         print(f"⚠️ Error converting URL to permalink: {e}")
         return full_url if full_url else ""
 
+# ========================================
+# SINGLE-FETCH DOCUMENT PIPELINE
+# ========================================
+
+class DocumentFetch:
+    """
+    Pagina di un documento scaricata una sola volta.
+    Contiene i byte grezzi e un unico albero lxml condiviso da _get_permalinks,
+    process_permalinks e enhanced_article_scraping_with_versioning.
+    """
+    
+    def __init__(self, url, status_code, content):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self._tree = None
+    
+    @property
+    def tree(self):
+        """Albero lxml della pagina, parsato al primo accesso e poi riutilizzato"""
+        if self._tree is None:
+            self._tree = lxml.html.fromstring(self.content)
+        return self._tree
+
+def fetch_document(url, session):
+    """Scarica la pagina di un documento con una sola richiesta HTTP (retry gestiti dalla sessione)"""
+    response = session.get(url)
+    if response.status_code in RETRY_STATUSES:
+        # Errore transitorio anche dopo i retry: non va scambiato per un documento mancante
+        response.raise_for_status()
+    return DocumentFetch(url, response.status_code, response.content)
+
 # ========================================
 # HELPER FUNCTIONS FOR ARTICLE PROCESSING
 # ========================================
@@ -205,36 +286,55 @@ def extract_article_end_date(article_element):
         print(f"⚠️ Error extracting article end date: {e}")
         return None
 
-def extract_allegati_content(article_element, session, base_url):
-    """Estrae il contenuto degli allegati se presenti"""
-    allegati = []
+def extract_allegato_links(article_element, base_url):
+    """Link agli allegati di una pagina: lista di dict (numero, titolo, url assoluto), senza richieste HTTP"""
+    links = []
     
     try:
         # Cerca link agli allegati
-        allegato_links = article_element.xpath('.//a[contains(@href, "allegato") or contains(text(), "Allegato")]')
-        
-        for link in allegato_links:
+        for link in article_element.xpath('.//a[contains(@href, "allegato") or contains(text(), "Allegato")]'):
             href = link.get('href')
             text = link.text_content().strip()
             
             if href:
-                # Converti in URL assoluto
-                allegato_url = urljoin(base_url, href)
-                
-                # Estrai il numero dell'allegato
-                allegato_number = extract_allegato_number(text)
-                
-                # Fetch contenuto allegato
-                allegato_content = fetch_allegato_content(allegato_url, session)
-                
-                allegati.append({
-                    'numero': allegato_number,
+                links.append({
+                    'numero': extract_allegato_number(text),
                     'titolo': text,
-                    'url': allegato_url,
-                    'contenuto': allegato_content
+                    # Converti in URL assoluto
+                    'url': urljoin(base_url, href)
                 })
-                
-                print(f"📎 Found allegato {allegato_number}: {text}")
+        
+        return links
+        
+    except Exception as e:
+        print(f"❌ Error extracting allegati: {e}")
+        return []
+
+def fetch_allegati(allegato_links, session, registry=None):
+    """
+    Scarica il contenuto degli allegati trovati da extract_allegato_links.
+    Con un AllegatoRegistry ogni allegato viene scaricato una volta per documento e, se è
+    già salvato come riga Allegato-N, l'allegato viene riferito tramite articolo_id.
+    """
+    allegati = []
+    
+    try:
+        for link in allegato_links:
+            allegato = dict(link)
+            articolo_id = registry.row_id(link['url']) if registry is not None else None
+            if articolo_id is not None:
+                # Una sola copia del testo: quella della riga Allegato-N
+                allegato['articolo_id'] = articolo_id
+            else:
+                # Fetch contenuto allegato
+                allegato_content, skip_reason = fetch_allegato_text(link['url'], session, registry)
+                allegato['contenuto'] = allegato_content
+                if skip_reason:
+                    # Motivo salvato nel JSON allegati dell'articolo
+                    allegato['scartato'] = skip_reason
+            allegati.append(allegato)
+            
+            print(f"📎 Found allegato {link['numero']}: {link['titolo']}")
         
         return allegati
         
@@ -242,6 +342,10 @@ def extract_allegati_content(article_element, session, base_url):
         print(f"❌ Error extracting allegati: {e}")
         return []
 
+def extract_allegati_content(article_element, session, base_url, registry=None):
+    """Estrae il contenuto degli allegati se presenti"""
+    return fetch_allegati(extract_allegato_links(article_element, base_url), session, registry)
+
 def extract_allegato_number(text):
     """Estrae il numero dell'allegato dal testo"""
     match = re.search(r'allegato\s*([A-Z0-9]+)', text, re.IGNORECASE)
@@ -255,113 +359,219 @@ def extract_allegato_number(text):
     
     return "1"
 
-def fetch_allegato_content(allegato_url, session):
-    """Fetch e pulisce il contenuto di un allegato"""
+def download_allegato(allegato_url, session, max_bytes=MAX_ALLEGATO_BYTES):
+    """
+    Scarica un allegato in streaming fermandosi al superamento di max_bytes.
+    Il Content-Length, se presente, viene controllato prima di leggere il corpo.
+    
+    Returns:
+        tuple: (contenuto in byte o None, motivo dello scarto o None, dimensione vista)
+    """
     try:
-        # Add timeout for allegato requests
-        response = session.get(allegato_url, timeout=30)
-        if response.status_code == 200:
-            # Pre-check content length before processing
-            content_length = len(response.content)
-            if content_length > MAX_ALLEGATO_LENGTH * 3:
-                print(f"⚠️ Allegato content too large ({content_length} bytes), skipping")
-                return ""
-            
-            html_content = lxml.html.fromstring(response.content)
-            
-            # Cerca il contenuto dell'allegato
-            content_selectors = [
-                './/div[contains(@class, "bodyTesto")]',
-                './/div[contains(@class, "allegato")]',
-                './/div[@id="contenuto"]',
-                './/div[contains(@class, "contenuto")]'
-            ]
-            
-            for selector in content_selectors:
-                elements = html_content.xpath(selector)
-                if elements:
-                    content = elements[0].text_content().strip()
-                    if content:
-                        cleaned_content = clean_article_text(content)
-                        # Check content length before returning
-                        if len(cleaned_content) > MAX_ALLEGATO_LENGTH:
-                            print(f"⚠️ Allegato content too long ({len(cleaned_content)} chars), skipping")
-                            return ""
-                        return cleaned_content
-            
-            # Fallback: tutto il testo
-            fallback_content = clean_article_text(html_content.text_content())
-            if len(fallback_content) > MAX_ALLEGATO_LENGTH:
-                print(f"⚠️ Allegato fallback content too long ({len(fallback_content)} chars), skipping")
-                return ""
-            return fallback_content
-            
-    except requests.exceptions.Timeout:
-        print(f"⚠️ Timeout fetching allegato content from {allegato_url}")
-        return ""
+        response = session.get(allegato_url, stream=True, timeout=ALLEGATO_TIMEOUT)
     except requests.exceptions.RequestException as e:
-        print(f"⚠️ Request error fetching allegato content: {e}")
-        return ""
-    except Exception as e:
-        print(f"❌ Error fetching allegato content: {e}")
-        return ""
+        print(f"⚠️ Request error fetching allegato {allegato_url}: {e}")
+        return None, SKIP_REQUEST_ERROR, None
     
-    return ""
-
-def process_allegato_content(allegato_url, allegato_number, session, documento_id, main_document_url):
-    """Process an allegato as a special type of article"""
-    try:
-        print(f"[process_allegato] Fetching allegato {allegato_number}: {allegato_url}")
+    with response:
+        if response.status_code != 200:
+            return None, SKIP_HTTP_ERROR, response.status_code
+        
+        declared = response.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            print(f"⚠️ Allegato too large ({declared} bytes declared > {max_bytes} max), not downloaded")
+            return None, SKIP_CONTENT_LENGTH, int(declared)
         
-        # Add timeout to prevent hanging on large allegati
+        chunks = []
+        size = 0
         try:
-            allegato_response = session.get(allegato_url, timeout=30)
+            for chunk in response.iter_content(ALLEGATO_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    print(f"⚠️ Allegato too large (> {max_bytes} bytes), download aborted")
+                    return None, SKIP_DOWNLOAD_CAP, size
+                chunks.append(chunk)
         except requests.exceptions.RequestException as e:
-            print(f"⚠️ SKIPPING Allegato {allegato_number}: Request failed: {e}")
-            return None
-        
-        if allegato_response.status_code != 200:
-            print(f"[process_allegato] Error {allegato_response.status_code} for allegato {allegato_number}")
-            return None
-        
-        # Pre-filter by response content length to avoid processing huge allegati
-        content_length = len(allegato_response.content)
-        if content_length > MAX_ALLEGATO_LENGTH * 3:  # Give more buffer for HTML markup
-            print(f"⚠️ SKIPPING Allegato {allegato_number}: Response too large ({content_length} bytes > {MAX_ALLEGATO_LENGTH * 3} max)")
+            print(f"⚠️ Error reading allegato {allegato_url}: {e}")
+            return None, SKIP_REQUEST_ERROR, size
+        content = b''.join(chunks)
+        
+        # Le GET in streaming non vengono salvate dalla cache HTTP: lo facciamo qui,
+        # solo per gli allegati entro il limite (anche per le registrazioni di replay)
+        adapter = session.get_adapter(allegato_url) if hasattr(session, 'get_adapter') else None
+        cache = getattr(adapter, 'cache', None)
+        if cache is not None and not getattr(response, 'from_cache', False):
+            cache.store(response.url, response.status_code, response.headers, content)
+    
+    return content, None, size
+
+def record_skipped_allegato(documento_id, allegato_number, allegato_url, reason, size):
+    """Registra in allegati_scartati un allegato non salvato e il motivo"""
+    try:
+        get_database_writer().submit(SkippedAllegatoRecord([documento_id, allegato_number, allegato_url, reason, size]))
+    except Exception as e:
+        print(f"Error recording skipped allegato: {e}")
+
+class DocumentContext:
+    """
+    Dati del documento in memoria, passati lungo la pipeline di articoli e versioni:
+    evitano di rileggere (e ripulire) il titolo dal database per ogni articolo.
+    """
+    
+    def __init__(self, documento_id, titolo, urn=None, anno=None, numero=None, existing=False):
+        self.documento_id = documento_id
+        self.titolo = normalize_document_title(titolo)
+        self.urn = urn
+        self.anno = anno
+        self.numero = numero
+        self.existing = existing  # Documento già presente nel database prima di questa esecuzione
+
+class AllegatoRegistry:
+    """
+    Allegati di un documento: ogni URL distinto viene scaricato (e il suo testo estratto)
+    una sola volta, anche se linkato dalla navigazione e dal testo di più articoli e
+    versioni elaborati in parallelo. Le righe Allegato-N salvate vengono ricordate per URL,
+    così il JSON allegati degli articoli le riferisce per id invece di copiarne il testo.
+    """
+    
+    def __init__(self, session):
+        self.session = session
+        self.downloads = 0
+        self.reused = 0
+        self._results = {}  # (tipo, url normalizzato) -> Future
+        self._rows = {}  # url normalizzato -> Future del salvataggio della riga Allegato-N
+        self._lock = threading.Lock()
+    
+    def _once(self, kind, url, compute):
+        """Calcola compute() una volta per URL; le chiamate concorrenti attendono lo stesso Future"""
+        key = (kind, normalize_url(url))
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+            else:
+                self.reused += 1
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+    
+    def download(self, url):
+        """(contenuto, motivo dello scarto, dimensione) come download_allegato, scaricato una volta"""
+        def fetch():
+            with self._lock:
+                self.downloads += 1
+            return download_allegato(url, self.session)
+        return self._once('download', url, fetch)
+    
+    def text(self, url):
+        """(testo pulito, motivo dello scarto) come fetch_allegato_text, estratto una volta"""
+        def extract():
+            content, reason, size = self.download(url)
+            return run_parse(extract_allegato_text, content) if content is not None else ("", reason)
+        return self._once('text', url, extract)
+    
+    def register_row(self, url, future):
+        """Ricorda il salvataggio (Future del WriteResult) della riga Allegato-N di url"""
+        with self._lock:
+            self._rows[normalize_url(url)] = future
+    
+    def row_id(self, url):
+        """Id della riga Allegato-N salvata per url, o None"""
+        with self._lock:
+            future = self._rows.get(normalize_url(url))
+        if future is None:
             return None
-        
-        # Quick check: if response is suspiciously large, skip it immediately
-        if content_length > MAX_ALLEGATO_LENGTH:
-            print(f"⚠️ SKIPPING Allegato {allegato_number}: Content too large ({content_length} bytes > {MAX_ALLEGATO_LENGTH} max)")
+        try:
+            result = future.result()
+        except Exception:
             return None
+        return result.ids[0] if result is not None and result.ids else None
+
+def extract_allegato_text(content):
+    """Testo pulito di una pagina di allegato già scaricata; restituisce (testo, motivo dello scarto o None)"""
+    try:
+        html_content = lxml.html.fromstring(content)
         
-        allegato_html = lxml.html.fromstring(allegato_response.content)
+        # Cerca il contenuto dell'allegato
+        content_selectors = [
+            './/div[contains(@class, "bodyTesto")]',
+            './/div[contains(@class, "allegato")]',
+            './/div[@id="contenuto"]',
+            './/div[contains(@class, "contenuto")]'
+        ]
         
-        # Extract allegato content
-        allegato_title = f"Allegato {allegato_number}"
+        for selector in content_selectors:
+            elements = html_content.xpath(selector)
+            if elements:
+                content = elements[0].text_content().strip()
+                if content:
+                    cleaned_content = clean_article_text(content)
+                    # Check content length before returning
+                    if len(cleaned_content) > MAX_ALLEGATO_LENGTH:
+                        print(f"⚠️ Allegato content too long ({len(cleaned_content)} chars), skipping")
+                        return "", SKIP_TEXT_LENGTH
+                    return cleaned_content, None
+        
+        # Fallback: tutto il testo
+        fallback_content = clean_article_text(html_content.text_content())
+        if len(fallback_content) > MAX_ALLEGATO_LENGTH:
+            print(f"⚠️ Allegato fallback content too long ({len(fallback_content)} chars), skipping")
+            return "", SKIP_TEXT_LENGTH
+        return fallback_content, None
         
-        # Look for bodyTesto div or fallback content
-        body_testo = allegato_html.xpath('.//div[contains(@class, "bodyTesto")]')
+    except Exception as e:
+        print(f"❌ Error parsing allegato content: {e}")
+        return "", SKIP_PARSE_ERROR
+
+def fetch_allegato_text(allegato_url, session, registry=None):
+    """Fetch e pulisce il contenuto di un allegato; restituisce (testo, motivo dello scarto o None)"""
+    if registry is not None:
+        return registry.text(allegato_url)
+    
+    content, reason, size = download_allegato(allegato_url, session)
+    if content is None:
+        return "", reason
+    return run_parse(extract_allegato_text, content)
+
+def fetch_allegato_content(allegato_url, session):
+    """Fetch e pulisce il contenuto di un allegato"""
+    content, _ = fetch_allegato_text(allegato_url, session)
+    return content
+
+def process_allegato_content(allegato_url, allegato_number, session, documento_id, main_document_url, registry=None):
+    """Process an allegato as a special type of article"""
+    try:
+        print(f"[process_allegato] Fetching allegato {allegato_number}: {allegato_url}")
         
-        if body_testo:
-            testo_completo = body_testo[0].text_content().strip()
-            testo_pulito = clean_article_text(testo_completo)
+        # Download in streaming interrotto oltre MAX_ALLEGATO_BYTES, condiviso con i link dagli articoli
+        if registry is not None:
+            content, reason, size = registry.download(allegato_url)
         else:
-            # Fallback extraction for allegati
-            content = extract_article_content_fallback(allegato_html)
-            testo_completo = content
-            testo_pulito = clean_article_text(content)
+            content, reason, size = download_allegato(allegato_url, session)
+        if content is None:
+            print(f"⚠️ SKIPPING Allegato {allegato_number}: {reason} ({size})")
+            record_skipped_allegato(documento_id, allegato_number, allegato_url, reason, size)
+            return None
         
-        # Extract activation date
-        activation_date = extract_article_activation_date(allegato_html)
+        # Parsing nel pool di processi
+        page = run_parse(parse_allegato_page, content)
+        testo_completo = page['testo_completo']
+        testo_pulito = page['testo_pulito']
+        activation_date = page['data_attivazione']
+        end_date = page['data_cessazione']
         
-        # Extract end date
-        end_date = extract_article_end_date(allegato_html)
+        # Extract allegato content
+        allegato_title = f"Allegato {allegato_number}"
         
         # Check if allegato content is too long
         if len(testo_completo) > MAX_ALLEGATO_LENGTH:
             print(f"⚠️ SKIPPING Allegato {allegato_number}: Content too long ({len(testo_completo)} chars > {MAX_ALLEGATO_LENGTH} max)")
             print(f"   Allegato title: {allegato_title}")
+            record_skipped_allegato(documento_id, allegato_number, allegato_url, SKIP_TEXT_LENGTH, len(testo_completo))
             return None
         
         print(f"✓ Allegato {allegato_number} size OK: {len(testo_completo)} chars")
@@ -393,7 +603,10 @@ def process_allegato_content(allegato_url, allegato_number, session, documento_i
         }
         
         print(f"📎 Processed allegato {allegato_number}: {len(testo_completo)} chars")
-        return save_articolo_with_versions(articolo_data)
+        future = save_articolo_with_versions(articolo_data)
+        if registry is not None and future is not None:
+            registry.register_row(allegato_url, future)
+        return future
         
     except Exception as e:
         print(f"❌ Error processing allegato {allegato_number}: {e}")
@@ -403,10 +616,24 @@ def process_allegato_content(allegato_url, allegato_number, session, documento_i
 # DATABASE INITIALIZATION WITH VERSIONING
 # ========================================
 
+def load_schema_capabilities():
+    """Legge una volta colonne e tabelle di data.sqlite e le registra per tutte le scritture"""
+    conn = connect_database()
+    capabilities = SchemaCapabilities.from_connection(conn)
+    conn.close()
+    set_schema_capabilities(capabilities)
+    print(f"+ Schema capabilities: {capabilities.describe()}")
+    return capabilities
+
+def report_search_index(rebuilt):
+    """Segnala le tabelle FTS appena create e popolate dalle righe esistenti"""
+    for table in rebuilt:
+        print(f"+ Full-text index {table} built from existing rows")
+
 def init_simplified_database():
     """Initialize database with simplified article versioning"""
     try:
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         # Check if we need to apply simplified schema
@@ -436,11 +663,20 @@ def init_simplified_database():
                 print("✓ Simplified versioning columns added successfully")
             else:
                 print("+ Using existing simplified database schema")
-            
+        
+        # Database creati prima del download in streaming degli allegati
+        conn.execute(SQL_CREATE_ALLEGATI_SCARTATI)
+        conn.commit()
+        # Database creati prima del deposito dei testi (testi_articoli + vista articoli_testo)
+        # e dell'indice full-text (articoli_fts/commi_fts, popolati alla creazione)
+        ensure_text_store(conn)
+        report_search_index(ensure_search_index(conn))
         conn.close()
     except Exception as e:
         print(f"❌ Error initializing simplified database: {e}")
         raise
+    
+    return load_schema_capabilities()
 
 # ========================================
 # UTILITY FUNCTIONS FOR NEW DATABASE
@@ -450,14 +686,13 @@ def init_optimized_database():
     """Inizializza il database con la nuova struttura ottimizzata e versioning semplificato"""
     try:
         # Try simplified schema first
-        init_simplified_database()
-        return
+        return init_simplified_database()
     except Exception as e:
         print(f"⚠️ Simplified schema not available, falling back to optimized schema: {e}")
     
     try:
         # Fallback to optimized schema
-        conn = sqlite3.connect('data.sqlite')
+        conn = connect_database()
         cursor = conn.cursor()
         
         # Verifica se esistono già le nuove tabelle
@@ -473,68 +708,62 @@ def init_optimized_database():
             print("New database schema initialized successfully")
         else:
             print("Using existing optimized database schema")
-            
+        
+        conn.execute(SQL_CREATE_ALLEGATI_SCARTATI)
+        ensure_text_store(conn)
+        report_search_index(ensure_search_index(conn))
+        conn.commit()
         conn.close()
     except Exception as e:
         print(f"Error initializing database: {e}")
         raise
+    
+    return load_schema_capabilities()
 
 # ========================================
 # TEXT PROCESSING AND CORRELATION EXTRACTION
 # ========================================
 
-def clean_article_text(text):
-    """Clean article text by removing extra whitespace and normalizing"""
-    if not text:
-        return ""
-    
-    # Remove multiple whitespaces and normalize line breaks
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\n\s*\n', '\n', text)
-    
-    # Remove common artifacts
-    text = re.sub(r'\s*\.\s*\n', '.\n', text)
-    text = re.sub(r'\s*;\s*\n', ';\n', text)
-    
-    # Clean up common legal document artifacts
-    text = re.sub(r'\s*\(\s*\)', '', text)  # Empty parentheses
-    text = re.sub(r'\s*\[\s*\]', '', text)  # Empty brackets
-    
-    # Remove navigation patterns
-    navigation_patterns = [
-        r'nascondi.*?visualizza.*?atto.*?intero',
-        r'precedente.*?successivo',
-        r'stampa.*?questa.*?pagina',
-        r'torna.*?su',
-        r'vai.*?al.*?contenuto',
-        r'menu.*?di.*?navigazione',
-        r'testo.*?in.*?vigore.*?dal.*?\d{2}/\d{2}/\d{4}',
-        r'vigente.*?al.*?\d{2}/\d{2}/\d{4}',
-        r'Gazzetta.*?Ufficiale',
-        r'visualizza.*?atto.*?intero',
-        r'elemento.*?grafico',
-        r'articolo.*?precedente',
-        r'articolo.*?successivo',
-        r'mostra.*?nascond[i|ere]',
-        r'chiudi.*?apri',
-        r'cerca.*?ricerca',
-        r'home.*?indietro',
-        r'condividi.*?stampa',
-        r'\(GU\s+n\.\d+\s+del\s+\d{2}-\d{2}-\d{4}\)',
-        r'visualizza\s+atto\s+intero',
-        r'nascondi\s*$',
-        r'vigente\s+al\s+\d{2}/\d{2}/\d{4}',
-    ]
-    
-    for pattern in navigation_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
-    
-    return text.strip()
+# Riferimenti ad articoli nel testo dei link (common patterns), nell'ordine di estrazione
+ARTICLE_REFERENCE_PATTERNS = [
+    re.compile(r'art\.\s*(\d+)', re.IGNORECASE),  # art. 123
+    re.compile(r'articolo\s+(\d+)', re.IGNORECASE),  # articolo 123
+    re.compile(r'art\s+(\d+)', re.IGNORECASE),  # art 123
+    re.compile(r'comma\s+(\d+)', re.IGNORECASE),  # comma 123
+    re.compile(r'lettera\s+([a-z])', re.IGNORECASE),  # lettera a
+]
+HREF_ARTICLE_PATTERN = re.compile(r'art[^0-9]*(\d+)', re.IGNORECASE)
+# Destinazione del link: /uri-res/N2Ls?urn:nir:stato:legge:2020;5~art3 o caricaArticolo?...art.idArticolo=3
+HREF_URN_PATTERN = re.compile(r'urn:nir:[^~!@#&?\s]+')
+HREF_TARGET_ARTICLE_PATTERNS = [
+    re.compile(r'~art(\d+[a-z]*)', re.IGNORECASE),
+    re.compile(r'art\.idArticolo=(\d+)'),
+]
+
+
+def resolve_link_target(href):
+    """Risolve l'href di un link nel testo in URN dell'atto e numero dell'articolo citato"""
+    urn_match = HREF_URN_PATTERN.search(href)
+    target_article = None
+    for pattern in HREF_TARGET_ARTICLE_PATTERNS:
+        article_match = pattern.search(href)
+        if article_match:
+            target_article = article_match.group(1)
+            break
+    return {
+        'urn': urn_match.group(0) if urn_match else None,
+        'target_article': target_article
+    }
+
 
 def extract_correlated_articles(body_element):
     """Extract correlated articles from links within the bodyTesto div"""
     try:
         correlated_articles = []
+        # Deduplica in tempo costante: (href, numero) per i riferimenti nel testo, href per quelli nell'URL
+        seen_references = set()
+        seen_hrefs = set()
+        targets = {}
         
         # Find all links within the bodyTesto
         links = body_element.xpath('.//a[@href]')
@@ -546,46 +775,40 @@ def extract_correlated_articles(body_element):
             if not href or not link_text:
                 continue
             
-            # Check if link refers to an article (common patterns)
-            article_patterns = [
-                r'art\.\s*(\d+)',  # art. 123
-                r'articolo\s+(\d+)',  # articolo 123
-                r'art\s+(\d+)',  # art 123
-                r'comma\s+(\d+)',  # comma 123
-                r'lettera\s+([a-z])',  # lettera a
-            ]
+            target = targets.get(href)
+            if target is None:
+                target = targets[href] = resolve_link_target(href)
             
             # Extract article references from link text
-            for pattern in article_patterns:
-                matches = re.findall(pattern, link_text, re.IGNORECASE)
-                for match in matches:
-                    article_ref = {
+            for pattern in ARTICLE_REFERENCE_PATTERNS:
+                for match in pattern.findall(link_text):
+                    # Avoid duplicates
+                    if (href, match) in seen_references:
+                        continue
+                    seen_references.add((href, match))
+                    seen_hrefs.add(href)
+                    correlated_articles.append({
                         'text': link_text,
                         'href': href,
                         'article_number': match,
-                        'type': 'article_reference'
-                    }
-                    
-                    # Avoid duplicates
-                    if not any(ref['href'] == href and ref['article_number'] == match 
-                             for ref in correlated_articles):
-                        correlated_articles.append(article_ref)
+                        'type': 'article_reference',
+                        **target
+                    })
             
             # Also check if the href contains article references
-            if 'art' in href.lower() or 'articolo' in href.lower():
+            if href not in seen_hrefs and 'art' in href.lower():
                 # Extract from URL
-                url_match = re.search(r'art[^0-9]*(\d+)', href, re.IGNORECASE)
+                url_match = HREF_ARTICLE_PATTERN.search(href)
                 if url_match:
-                    article_ref = {
+                    seen_references.add((href, url_match.group(1)))
+                    seen_hrefs.add(href)
+                    correlated_articles.append({
                         'text': link_text,
                         'href': href,
                         'article_number': url_match.group(1),
-                        'type': 'url_reference'
-                    }
-                    
-                    # Avoid duplicates
-                    if not any(ref['href'] == href for ref in correlated_articles):
-                        correlated_articles.append(article_ref)
+                        'type': 'url_reference',
+                        **target
+                    })
         
         print(f"LINKS: Found {len(correlated_articles)} correlated articles")
         return correlated_articles
@@ -733,174 +956,139 @@ def get_livello_gerarchia(tipo_atto: str) -> int:
     
     return gerarchia_map.get(tipo_atto, 6)
 
-def save_documento_normativo(documento_data: dict) -> int:
-    """Salva un documento normativo nel database ottimizzato"""
+def save_documento_context(documento_data: dict):
+    """
+    Salva un documento normativo nel database ottimizzato (attende l'id dal thread writer)
+    e restituisce il DocumentContext per articoli, versioni e allegati (None in caso di errore)
+    """
     try:
-        conn = sqlite3.connect('data.sqlite')
-        cursor = conn.cursor()
-        
-        # Verifica se il documento esiste già
-        cursor.execute(
-            "SELECT id, titoloAtto FROM documenti_normativi WHERE urn = ? OR (numero = ? AND anno = ? AND tipo_atto = ?)",
-            [documento_data.get('urn', ''), documento_data.get('numero', ''), 
-             documento_data.get('anno', 0), documento_data.get('tipo_atto', '')]
+        record = DocumentRecord(
+            documento_data.get('urn', ''), documento_data.get('numero', ''),
+            documento_data.get('anno', 0), documento_data.get('tipo_atto', ''),
+            [
+                documento_data.get('numero', 'N/A'),
+                documento_data.get('anno', 2000),
+                documento_data.get('tipo_atto', 'Documento'),
+                documento_data.get('titoloAtto', 'Documento senza titolo'),
+                documento_data.get('data_pubblicazione', f"{documento_data.get('anno', 2000)}-01-01"),
+                documento_data.get('materia_principale', 'Altro'),
+                documento_data.get('status', 'vigente'),
+                documento_data.get('livello_gerarchia', 6),
+                documento_data.get('url_normattiva', None),
+                documento_data.get('urn', ''),
+                documento_data.get('testo_completo', '')
+            ]
+        )
+        # Gli articoli hanno bisogno del documento_id: qui si attende il writer
+        result = get_database_writer().submit(record).result()
+        doc_id = result.ids[0]
+        
+        # Il titolo è quello della riga salvata: per un documento già presente, quello esistente
+        context = DocumentContext(
+            doc_id,
+            result.title if result.existing else record.values[3],
+            urn=documento_data.get('urn', ''),
+            anno=documento_data.get('anno'),
+            numero=documento_data.get('numero'),
+            existing=result.existing
         )
-        existing = cursor.fetchone()
         
-        if existing:
-            doc_id, existing_title = existing
+        if result.existing:
             print(f"✅ Document already exists with id: {doc_id}")
-            print(f"   Title: {existing_title}")
+            print(f"   Title: {result.title}")
             print(f"   URN: {documento_data.get('urn', 'N/A')}")
             print(f"   Numero: {documento_data.get('numero', 'N/A')}, Anno: {documento_data.get('anno', 'N/A')}")
-            conn.close()
-            return doc_id
-        
-        # Insert nuovo documento
-        insert_query = """
-            INSERT INTO documenti_normativi (
-                numero, anno, tipo_atto, titoloAtto, data_pubblicazione,
-                materia_principale, status, livello_gerarchia,
-                url_normattiva, urn, testo_completo
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        
-        cursor.execute(insert_query, [
-            documento_data.get('numero', 'N/A'),
-            documento_data.get('anno', 2000),
-            documento_data.get('tipo_atto', 'Documento'),
-            documento_data.get('titoloAtto', 'Documento senza titolo'),
-            documento_data.get('data_pubblicazione', f"{documento_data.get('anno', 2000)}-01-01"),
-            documento_data.get('materia_principale', 'Altro'),
-            documento_data.get('status', 'vigente'),
-            documento_data.get('livello_gerarchia', 6),
-            documento_data.get('url_normattiva', None),
-            documento_data.get('urn', ''),
-            documento_data.get('testo_completo', '')
-        ])
-        
-        # Ottieni l'ID del documento appena inserito
-        doc_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            return context
         
         print(f"Saved document with id: {doc_id}")
-        return doc_id
+        return context
         
     except Exception as e:
         print(f"Error saving document: {e}")
         return None
 
-def save_articolo(articolo_data: dict) -> int:
-    """Salva un articolo nel database usando lo schema semplificato"""
+def save_documento_normativo(documento_data: dict) -> int:
+    """Salva un documento normativo nel database ottimizzato e restituisce l'id"""
+    context = save_documento_context(documento_data)
+    return context.documento_id if context else None
+
+def save_articolo(articolo_data: dict):
+    """Accoda un articolo usando lo schema semplificato; restituisce il Future del thread writer"""
     try:
-        conn = sqlite3.connect('data.sqlite')
-        cursor = conn.cursor()
-        
-        # Check if article already exists
-        cursor.execute(
-            "SELECT id, titoloAtto FROM articoli WHERE documento_id = ? AND numero_articolo = ?",
-            [articolo_data['documento_id'], articolo_data['numero_articolo']]
-        )
-        existing_article = cursor.fetchone()
-        
-        if existing_article:
-            article_id, existing_title = existing_article
-            print(f"✅ Article {articolo_data['numero_articolo']} already exists with id: {article_id}")
-            print(f"   Title: {existing_title}")
-            print(f"   Document ID: {articolo_data['documento_id']}")
-            conn.close()
-            return article_id
+        writer = get_database_writer()
         
         # Determine status based on data_cessazione
         status = 'abrogato' if articolo_data.get('data_cessazione') else 'vigente'
         
-        # Check if we have the simplified versioning columns
-        cursor.execute("PRAGMA table_info(articoli)")
-        columns = [column[1] for column in cursor.fetchall()]
-        has_simplified_columns = 'articolo_base_id' in columns
-        
+        # Versioning columns come from the schema capabilities read at startup
+        has_simplified_columns = writer.capabilities.has_versioning
+        
+        values = [
+            articolo_data.get('documento_id'),
+            articolo_data.get('numero_articolo', '1'),
+            articolo_data.get('titoloAtto', ''),
+            articolo_data.get('testo_completo', ''),
+            articolo_data.get('testo_pulito', ''),
+            articolo_data.get('articoli_correlati', '[]'),
+            articolo_data.get('allegati', '[]'),
+            articolo_data.get('data_attivazione'),
+            articolo_data.get('data_cessazione'),
+            articolo_data.get('url_documento', ''),
+            status
+        ]
         if has_simplified_columns:
-            insert_query = """
-                INSERT INTO articoli (
-                    documento_id, numero_articolo, titoloAtto, testo_completo, testo_pulito, 
-                    url_documento, articoli_correlati, allegati, data_attivazione, data_cessazione, 
-                    status, articolo_base_id, tipo_versione, numero_aggiornamento
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(insert_query, [
-                articolo_data.get('documento_id'),
-                articolo_data.get('numero_articolo', '1'),
-                articolo_data.get('titoloAtto', ''),
-                articolo_data.get('testo_completo', ''),
-                articolo_data.get('testo_pulito', ''),
-                articolo_data.get('url_documento', ''),
-                articolo_data.get('articoli_correlati', '[]'),
-                articolo_data.get('allegati', '[]'),
-                articolo_data.get('data_attivazione'),
-                articolo_data.get('data_cessazione'),
-                status,
+            values += [
                 None,  # articolo_base_id (NULL for single articles)
                 'orig',  # tipo_versione
                 None   # numero_aggiornamento
-            ])
-        else:
-            # Fallback for older schema without simplified columns
-            insert_query = """
-                INSERT INTO articoli (
-                    documento_id, numero_articolo, titoloAtto, testo_completo, testo_pulito, 
-                    url_documento, articoli_correlati, allegati, data_attivazione, data_cessazione
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(insert_query, [
-                articolo_data.get('documento_id'),
-                articolo_data.get('numero_articolo', '1'),
-                articolo_data.get('titoloAtto', ''),
-                articolo_data.get('testo_completo', ''),
-                articolo_data.get('testo_pulito', ''),
-                articolo_data.get('url_documento', ''),
-                articolo_data.get('articoli_correlati', '[]'),
-                articolo_data.get('allegati', '[]'),
-                articolo_data.get('data_attivazione'),
-                articolo_data.get('data_cessazione')
-            ])
-        
-        art_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            ]
         
-        print(f"Saved article with id: {art_id} (status: {status})")
-        return art_id
+        record = ArticleRecord(articolo_data['documento_id'], articolo_data['numero_articolo'], [values])
+        return _submit_articolo(writer, record, articolo_data, lambda result: print(
+            f"Saved article with id: {result.ids[0]} (status: {status})"
+        ))
         
     except Exception as e:
         print(f"Error saving article: {e}")
         return None
 
+def _submit_articolo(writer, record, articolo_data, report_saved):
+    """Accoda un ArticleRecord; l'esito viene stampato dal thread writer quando il record è applicato"""
+    def report(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[ERROR] Error saving article {articolo_data['numero_articolo']}: {e}")
+            return
+        if result.existing:
+            print(f"✅ Article {articolo_data['numero_articolo']} already exists with id: {result.ids[0]}")
+            print(f"   Title: {result.title}")
+            print(f"   Document ID: {articolo_data['documento_id']}")
+        else:
+            report_saved(result)
+    
+    future = writer.submit(record)
+    future.add_done_callback(report)
+    return future
+
 def save_citazione_normativa(citazione_data: dict):
-    """Salva una citazione normativa"""
+    """Accoda una citazione normativa al thread writer"""
     try:
-        conn = sqlite3.connect('data.sqlite')
-        cursor = conn.cursor()
-        
-        insert_query = """
-            INSERT OR IGNORE INTO citazioni_normative (
-                articolo_citante_id, articolo_citato_id, tipo_citazione, contesto_citazione
-            ) VALUES (?, ?, ?, ?)
-        """
-        
-        cursor.execute(insert_query, [
+        future = get_database_writer().submit(CitationRecord([
             citazione_data.get('articolo_citante_id'),
             citazione_data.get('articolo_citato_id'),
             citazione_data.get('tipo_citazione', 'rinvio'),
             citazione_data.get('contesto_citazione', '')
-        ])
+        ]))
         
-        conn.commit()
-        conn.close()
+        def report(future):
+            if future.exception() is not None:
+                print(f"Error saving citation: {future.exception()}")
+            else:
+                print(f"Saved citation from {citazione_data.get('articolo_citante_id')} to {citazione_data.get('articolo_citato_id')}")
         
-        print(f"Saved citation from {citazione_data.get('articolo_citante_id')} to {citazione_data.get('articolo_citato_id')}")
+        future.add_done_callback(report)
+        return future
         
     except Exception as e:
         print(f"Error saving citation: {e}")
@@ -908,14 +1096,7 @@ def save_citazione_normativa(citazione_data: dict):
 def get_documento_by_urn(urn: str):
     """Recupera un documento dal database tramite URN"""
     try:
-        conn = sqlite3.connect('data.sqlite')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM documenti_normativi WHERE urn = ?", [urn])
-        result = cursor.fetchone()
-        conn.close()
-        
-        return result[0] if result else None
+        return get_database_writer().get_documento_id_by_urn(urn)
     except Exception as e:
         print(f"Error getting document by URN: {e}")
         return None
@@ -923,14 +1104,7 @@ def get_documento_by_urn(urn: str):
 def get_articoli_by_documento(documento_id: int):
     """Recupera gli articoli di un documento"""
     try:
-        conn = sqlite3.connect('data.sqlite')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id FROM articoli WHERE documento_id = ? LIMIT 1", [documento_id])
-        result = cursor.fetchone()
-        conn.close()
-        
-        return result[0] if result else None
+        return get_database_writer().get_first_articolo_id(documento_id)
     except Exception as e:
         print(f"Error getting articles by document: {e}")
         return None
@@ -979,11 +1153,11 @@ def extract_article_number_from_element_id(element_id):
         return match.group(1)
     return None
 
-def _get_absolute_url(relative_url, base_url=normattiva_url):
+def _get_absolute_url(relative_url, base_url=None):
     """Converte URL relativo in assoluto"""
     if relative_url.startswith('http'):
         return relative_url
-    return f"{base_url}{relative_url}"
+    return f"{base_url or normattiva_url}{relative_url}"
 
 def extract_article_links_from_navigation(html_element):
     """Estrae tutti i link degli articoli dalla navigazione laterale, inclusi bis, ter, allegati e versioni aggiornate"""
@@ -1100,11 +1274,73 @@ def extract_article_number_from_text(text):
     
     return None
 
+# ========================================
+# PARSE STAGE (PROCESS POOL)
+# ========================================
+
+def run_parse(fn, *args):
+    """Esegue una funzione di parsing nel pool di processi, se attivo, altrimenti nel thread corrente"""
+    if parse_pool is not None:
+        return parse_pool.run(fn, *args)
+    return fn(*args)
+
+def parse_article_page(content, article_url, article_number, document_title=None):
+    """
+    Parsing di una pagina di articolo (eseguito nei processi di parse_pool).
+    Nessun accesso a database o rete: il titolo del documento arriva dal chiamante.
+    
+    Returns:
+        dict: titoloAtto, date, testo di bodyTesto, testo pulito, articoli correlati, link agli allegati
+    """
+    article_html = lxml.html.fromstring(content)
+    
+    # Extract content from bodyTesto
+    body_testo = article_html.xpath('.//div[contains(@class, "bodyTesto")]')
+    if body_testo:
+        body_div = body_testo[0]
+        testo_completo = body_div.text_content().strip()
+        testo_pulito = clean_article_text(testo_completo)
+        articoli_correlati = extract_correlated_articles(body_div)
+    else:
+        # Fallback extraction
+        testo_completo = extract_article_content_fallback(article_html)
+        testo_pulito = clean_article_text(testo_completo)
+        articoli_correlati = []
+    
+    return {
+        'titoloAtto': extract_article_title_enhanced(article_html, article_number, document_title=document_title),
+        'data_attivazione': extract_article_activation_date(article_html),
+        'data_cessazione': extract_article_end_date(article_html),
+        'testo_completo': testo_completo,
+        'testo_pulito': testo_pulito,
+        'articoli_correlati': articoli_correlati,
+        'allegati': extract_allegato_links(article_html, article_url)
+    }
+
+def parse_allegato_page(content):
+    """Parsing della pagina di un allegato salvato come riga Allegato-N (eseguito nei processi di parse_pool)"""
+    allegato_html = lxml.html.fromstring(content)
+    
+    # Look for bodyTesto div or fallback content
+    body_testo = allegato_html.xpath('.//div[contains(@class, "bodyTesto")]')
+    if body_testo:
+        testo_completo = body_testo[0].text_content().strip()
+    else:
+        # Fallback extraction for allegati
+        testo_completo = extract_article_content_fallback(allegato_html)
+    
+    return {
+        'testo_completo': testo_completo,
+        'testo_pulito': clean_article_text(testo_completo),
+        'data_attivazione': extract_article_activation_date(allegato_html),
+        'data_cessazione': extract_article_end_date(allegato_html)
+    }
+
 # ========================================
 # ENHANCED ARTICLE PROCESSING WITH BODYTEXT AND VERSIONING
 # ========================================
 
-def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
+def enhanced_article_scraping_with_versioning(base_url, session, documento_id, document=None, context=None):
     """
     Enhanced article scraping that extracts text from bodyTesto divs and supports versioning
     
@@ -1112,6 +1348,8 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
         base_url: Base URL of the document
         session: requests session
         documento_id: Document ID in database
+        document: DocumentFetch already downloaded for base_url (optional)
+        context: DocumentContext del documento salvato (titolo, URN, anno; optional)
         
     Returns:
         list: List of article IDs that were processed
@@ -1120,13 +1358,24 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
     
     try:
         print(f"[enhanced_article_scraping] Processing with bodyTesto extraction: {base_url}")
-        response = session.get(base_url)
+        if document is None:
+            document = fetch_document(base_url, session)
         
-        if response.status_code != 200:
-            print(f"[enhanced_article_scraping] Error {response.status_code} for {base_url}")
+        if document.status_code != 200:
+            print(f"[enhanced_article_scraping] Error {document.status_code} for {base_url}")
             return []
             
-        html_content = lxml.html.fromstring(response.content)
+        html_content = document.tree
+        
+        # Allegati condivisi da navigazione, articoli e versioni del documento
+        allegati_registry = AllegatoRegistry(session)
+        
+        # Modalità --update su un documento già salvato: versioni presenti per articolo
+        stored_articles = None
+        if update_mode and context is not None and context.existing:
+            writer = get_database_writer()
+            if writer.capabilities.has_versioning:
+                stored_articles = writer.get_articolo_versions(documento_id)
         
         # Extract articles using different methods
         # Method 1: Try to extract from navigation
@@ -1139,13 +1388,22 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
             articles_by_number = {}
             for article_info in article_links:
                 if article_info['content_type'] == 'allegato':
+                    stored_allegato = (stored_articles or {}).get(f"Allegato-{article_info['number']}")
+                    if stored_allegato:
+                        # --update: allegato già salvato, gli articoli lo riferiscono per id
+                        saved = Future()
+                        saved.set_result(WriteResult([stored_allegato['base_id']]))
+                        allegati_registry.register_row(article_info['url'], saved)
+                        article_ids.append(stored_allegato['base_id'])
+                        continue
                     # Handle allegati separately
                     allegato_id = process_allegato_content(
                         article_info['url'], 
                         article_info['number'], 
                         session, 
                         documento_id,
-                        base_url
+                        base_url,
+                        registry=allegati_registry
                     )
                     if allegato_id:
                         article_ids.append(allegato_id)
@@ -1172,7 +1430,10 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
                     article_versions,
                     session,
                     documento_id,
-                    base_url
+                    base_url,
+                    registry=allegati_registry,
+                    context=context,
+                    stored=stored_articles.get(str(base_number)) if stored_articles is not None else None
                 )
                 if article_id:
                     article_ids.append(article_id)
@@ -1188,7 +1449,9 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
                         str(i), 
                         documento_id, 
                         base_url,  # Use main document URL
-                        session
+                        session,
+                        registry=allegati_registry,
+                        context=context
                     )
                     if article_id:
                         article_ids.append(article_id)
@@ -1199,6 +1462,9 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
                 if article_id:
                     article_ids.append(article_id)
         
+        if allegati_registry.downloads or allegati_registry.reused:
+            print(f"[enhanced_article_scraping] Allegati: {allegati_registry.downloads} downloaded, "
+                  f"{allegati_registry.reused} reused")
         print(f"[enhanced_article_scraping] Successfully processed {len(article_ids)} articles")
         return article_ids
         
@@ -1206,7 +1472,7 @@ def enhanced_article_scraping_with_versioning(base_url, session, documento_id):
         print(f"❌ Error in enhanced article scraping: {e}")
         return []
 
-def extract_single_version_content(article_url, version_info, session, documento_id, base_url):
+def extract_single_version_content(article_url, version_info, session, documento_id, base_url, registry=None, context=None):
     """Extract content for a single article version"""
     try:
         print(f"[extract_single_version] Extracting {version_info.get('tipo_versione', 'unknown')} version from: {article_url}")
@@ -1217,31 +1483,24 @@ def extract_single_version_content(article_url, version_info, session, documento
             print(f"[extract_single_version] Error {article_response.status_code} for {article_url}")
             return None
         
-        article_html = lxml.html.fromstring(article_response.content)
-        
-        # Extract article title using enhanced logic
-        article_title = extract_article_title_enhanced(article_html, version_info.get('numero_aggiornamento', ''), documento_id)
-        
-        # Extract activation and end dates
-        activation_date = extract_article_activation_date(article_html)
-        end_date = extract_article_end_date(article_html)
-        
-        # Extract content from bodyTesto
-        body_testo = article_html.xpath('.//div[contains(@class, "bodyTesto")]')
-        if body_testo:
-            body_div = body_testo[0]
-            testo_completo = body_div.text_content().strip()
-            testo_pulito = clean_article_text(testo_completo)
-            articoli_correlati = extract_correlated_articles(body_div)
-        else:
-            # Fallback extraction
-            content = extract_article_content_fallback(article_html)
-            testo_completo = content
-            testo_pulito = clean_article_text(content)
-            articoli_correlati = []
+        # Parsing (titolo, date, bodyTesto, testo pulito, correlati, link allegati) nel pool di processi;
+        # il titolo del documento arriva dal DocumentContext perché i worker non accedono al database
+        page = run_parse(
+            parse_article_page,
+            article_response.content,
+            article_url,
+            version_info.get('numero_aggiornamento', ''),
+            get_document_title(documento_id, context) if documento_id else None
+        )
+        article_title = page['titoloAtto']
+        activation_date = page['data_attivazione']
+        end_date = page['data_cessazione']
+        testo_completo = page['testo_completo']
+        testo_pulito = page['testo_pulito']
+        articoli_correlati = page['articoli_correlati']
         
-        # Extract allegati
-        allegati = extract_allegati_content(article_html, session, article_url)
+        # Extract allegati (richieste HTTP nel thread di crawling)
+        allegati = fetch_allegati(page['allegati'], session, registry)
         
         # Determine version dates and status
         data_inizio_vigore = activation_date or datetime.now().date()
@@ -1282,8 +1541,12 @@ def extract_single_version_content(article_url, version_info, session, documento
     except Exception as e:
         print(f"❌ Error extracting version content: {e}")
         return None
-def process_article_with_versions(article_number, article_versions, session, documento_id, base_url):
-    """Process an article with all its versions - creates one main article with linked versions"""
+def process_article_with_versions(article_number, article_versions, session, documento_id, base_url, registry=None, context=None, stored=None):
+    """
+    Process an article with all its versions - creates one main article with linked versions.
+    stored (modalità --update): versioni dell'articolo già nel database, da get_articolo_versions;
+    si scaricano solo le versioni nuove e la 'current', le altre restano come sono.
+    """
     try:
         print(f"[process_article_with_versions] Processing article {article_number} with {len(article_versions)} versions")
         
@@ -1293,21 +1556,49 @@ def process_article_with_versions(article_number, article_versions, session, doc
             x['version_info']['numero_aggiornamento'] if x['version_info']['numero_aggiornamento'] is not None else -1
         ))
         
+        if stored is not None:
+            new_versions = [
+                version for version in article_versions
+                if version['version_info']['tipo_versione'] not in stored['versions']
+            ]
+            if not new_versions:
+                with update_stats_lock:
+                    update_stats['unchanged'] += 1
+                print(f"[update] Article {article_number}: no new versions, skipped")
+                return stored['base_id']
+            # Il testo della versione corrente cambia con ogni aggiornamento: viene riscritto
+            article_versions = [
+                version for version in article_versions
+                if version in new_versions or version['version_info']['tipo_versione'] == 'current'
+            ]
+            print(f"[update] Article {article_number}: {len(new_versions)} new versions")
+        
         # Collect all version data
         versions_data = []
         main_article_data = None
         current_version_data = None
         
-        for version_info in article_versions:
-            # Extract content for this version
-            version_data = extract_single_version_content(
+        def fetch_version(version_info):
+            return extract_single_version_content(
                 version_info['url'],
                 version_info['version_info'],
                 session,
                 documento_id,
-                base_url
+                base_url,
+                registry,
+                context
             )
-            
+        
+        # Fetch version pages in parallel (the shared session still caps concurrent
+        # requests); executor.map returns results in the sort order above
+        if len(article_versions) > 1:
+            max_workers = min(VERSION_FETCH_WORKERS, len(article_versions))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='versions') as executor:
+                fetched_versions = list(executor.map(fetch_version, article_versions))
+        else:
+            fetched_versions = [fetch_version(version_info) for version_info in article_versions]
+        
+        for version_info, version_data in zip(article_versions, fetched_versions):
             if version_data:
                 versions_data.append(version_data)
                 
@@ -1340,6 +1631,8 @@ def process_article_with_versions(article_number, article_versions, session, doc
             'versions': versions_data
         }
         
+        if stored is not None:
+            return save_articolo_update(articolo_data, stored)
         return save_articolo_with_versions(articolo_data)
         
     except Exception as e:
@@ -1373,11 +1666,14 @@ def process_single_article_with_bodytext(article_url, article_number, session, d
         print(f"❌ Error processing single article {article_number}: {e}")
         return None
 
-def process_article_element_with_bodytext(article_element, article_number, documento_id, article_url, session):
+def process_article_element_with_bodytext(article_element, article_number, documento_id, article_url, session, registry=None, context=None):
     """Process an article element with enhanced bodyTesto extraction"""
     try:
-        # Extract basic article information - pass documento_id to get the document title
-        article_title = extract_article_title_enhanced(article_element, article_number, documento_id)
+        # Extract basic article information - document title from the context (or the database)
+        article_title = extract_article_title_enhanced(
+            article_element, article_number, documento_id,
+            document_title=get_document_title(documento_id, context) if documento_id else None
+        )
         
         # Extract article activation date
         activation_date = extract_article_activation_date(article_element)
@@ -1410,7 +1706,7 @@ def process_article_element_with_bodytext(article_element, article_number, docum
             articoli_correlati = []
         
         # Extract allegati if present
-        allegati = extract_allegati_content(article_element, session, article_url)
+        allegati = extract_allegati_content(article_element, session, article_url, registry)
         
         # Check for article versions (original + aggiornamenti)
         versions = []
@@ -1456,30 +1752,43 @@ def process_article_element_with_bodytext(article_element, article_number, docum
         print(f"❌ Error processing article element {article_number}: {e}")
         return None
 
-def extract_article_title_enhanced(article_element, article_number, documento_id=None):
-    """Extract article title with enhanced logic - should return the document title, not article content"""
+def normalize_document_title(title):
+    """Titolo del documento pulito; None se assente o troppo corto"""
+    if not title:
+        return None
+    # Remove extra whitespace and line breaks (\s comprende già \r e \n)
+    document_title = re.sub(r'\s+', ' ', title).strip()
+    if len(document_title) > 10:
+        return document_title
+    return None
+
+@lru_cache(maxsize=DOCUMENT_TITLE_CACHE_SIZE)
+def _load_document_title(writer, documento_id):
+    # Il writer fa parte della chiave: gli id valgono per un solo database.
+    # Gli errori si propagano e non vengono messi in cache.
+    return normalize_document_title(writer.get_documento_title(documento_id))
+
+def get_document_title(documento_id, context=None):
+    """Titolo del documento: dal DocumentContext se disponibile, altrimenti dal database (con LRU)"""
+    if context is not None and context.documento_id == documento_id:
+        return context.titolo
+    try:
+        return _load_document_title(get_database_writer(), documento_id)
+    except Exception as e:
+        print(f"⚠️ Error getting document title from database: {e}")
+    return None
+
+def extract_article_title_enhanced(article_element, article_number, documento_id=None, document_title=None):
+    """
+    Extract article title with enhanced logic - should return the document title, not article content.
+    document_title (già letto dal database) evita l'accesso al database, es. nei processi di parsing.
+    """
     try:
         # If we have documento_id, get the document title from the database
-        if documento_id:
-            try:
-                conn = sqlite3.connect('data.sqlite')
-                cursor = conn.cursor()
-                cursor.execute('SELECT titoloAtto FROM documenti_normativi WHERE id = ?', [documento_id])
-                result = cursor.fetchone()
-                conn.close()
-                
-                if result and result[0]:
-                    # Clean the document title
-                    document_title = result[0].strip()
-                    # Remove extra whitespace and line breaks
-                    document_title = re.sub(r'\s+', ' ', document_title)
-                    document_title = re.sub(r'\r\n|\r|\n', ' ', document_title)
-                    document_title = re.sub(r'\s+', ' ', document_title).strip()
-                    
-                    if document_title and len(document_title) > 10:
-                        return document_title
-            except Exception as e:
-                print(f"⚠️ Error getting document title from database: {e}")
+        if document_title is None and documento_id:
+            document_title = get_document_title(documento_id)
+        if document_title:
+            return document_title
         
         # Try to find the document title directly in the HTML (titoloAtto)
         title_selectors = [
@@ -1645,211 +1954,171 @@ def create_single_article_from_content(html_element, documento_id, base_url):
         print(f"[ERROR] Error creating single article: {e}")
         return None
 
-def extract_all_articles_with_bodytext(base_url, session, documento_id):
+def extract_all_articles_with_bodytext(base_url, session, documento_id, document=None, context=None):
     """
     Fallback article extraction with bodyTesto support
     """
-    return enhanced_article_scraping_with_versioning(base_url, session, documento_id)
+    return enhanced_article_scraping_with_versioning(base_url, session, documento_id, document=document, context=context)
 
 # ========================================
 # DATABASE FUNCTIONS WITH VERSIONING SUPPORT
 # ========================================
 
 def save_articolo_with_versions(articolo_data):
-    """Save article with simplified versioning support"""
+    """
+    Save article with simplified versioning support.
+    L'articolo viene accodato al thread writer: restituisce il Future con il WriteResult.
+    """
     try:
-        conn = sqlite3.connect('data.sqlite')
-        cursor = conn.cursor()
-        
-        # Check if article already exists
-        cursor.execute(
-            "SELECT id, titoloAtto FROM articoli WHERE documento_id = ? AND numero_articolo = ?",
-            [articolo_data['documento_id'], articolo_data['numero_articolo']]
-        )
-        existing_article = cursor.fetchone()
-        
-        if existing_article:
-            article_id, existing_title = existing_article
-            print(f"✅ Article {articolo_data['numero_articolo']} already exists with id: {article_id}")
-            print(f"   Title: {existing_title}")
-            print(f"   Document ID: {articolo_data['documento_id']}")
-            conn.close()
-            return article_id
-        
-        # Check if we have the simplified versioning columns
-        cursor.execute("PRAGMA table_info(articoli)")
-        columns = [column[1] for column in cursor.fetchall()]
-        has_simplified_versioning = 'articolo_base_id' in columns
+        writer = get_database_writer()
         
-        if has_simplified_versioning:
-            result = save_articolo_with_simplified_versioning(articolo_data, cursor, conn)
-        else:
-            result = save_articolo_basic(articolo_data, cursor, conn)
-        
-        conn.close()
-        return result
+        # Versioning columns come from the schema capabilities read at startup
+        if writer.capabilities.has_versioning:
+            return save_articolo_with_simplified_versioning(articolo_data, writer)
+        return save_articolo_basic(articolo_data, writer)
             
     except Exception as e:
         print(f"[ERROR] Error saving article with versions: {e}")
-        if 'conn' in locals():
-            conn.close()
         return None
 
-def save_articolo_with_simplified_versioning(articolo_data, cursor, conn):
+def build_version_rows(articolo_data):
+    """
+    Righe articoli (colonne di SQL_INSERT_ARTICOLO_VERSIONED) per le versioni di un articolo.
+    Restituisce (righe, indice della versione base).
+    """
+    versions = articolo_data.get('versions', [])
+    rows = []
+    base_index = 0
+    
+    # Each version becomes a separate article record
+    for i, version in enumerate(versions):
+        # Determine status based on data_cessazione
+        status = 'abrogato' if version.get('data_cessazione') or articolo_data.get('data_cessazione') else 'vigente'
+        
+        # Determine tipo_versione and numero_aggiornamento
+        tipo_versione = version.get('tipo_versione', 'orig')
+        numero_aggiornamento = version.get('numero_aggiornamento')
+        
+        # Use version-specific content if available, fallback to main article data
+        testo_completo = version.get('testo_versione') or version.get('testo_completo') or articolo_data.get('testo_completo', '')
+        testo_pulito = version.get('testo_pulito') or articolo_data.get('testo_pulito', '')
+        
+        rows.append([
+            articolo_data['documento_id'],
+            articolo_data['numero_articolo'],
+            articolo_data['titoloAtto'],
+            testo_completo,
+            testo_pulito,
+            articolo_data.get('articoli_correlati', '[]'),
+            version.get('allegati') or articolo_data.get('allegati', '[]'),
+            version.get('data_inizio_vigore') or articolo_data.get('data_attivazione'),
+            version.get('data_fine_vigore') or articolo_data.get('data_cessazione'),
+            articolo_data.get('url_documento', ''),
+            status,
+            None,  # articolo_base_id: NULL for base article, set by the writer for updates
+            tipo_versione,
+            numero_aggiornamento
+        ])
+        
+        # The last original version is the base for the updates
+        if tipo_versione == 'orig':
+            base_index = i
+    return rows, base_index
+
+def save_articolo_with_simplified_versioning(articolo_data, writer):
     """Save article with simplified versioning support"""
     try:
         versions = articolo_data.get('versions', [])
         
         if not versions:
             # No versions provided, save as simple article
-            return save_articolo_basic(articolo_data, cursor, conn)
+            return save_articolo_basic(articolo_data, writer)
         
-        article_ids = []
-        base_article_id = None
+        rows, base_index = build_version_rows(articolo_data)
         
-        # Save each version as a separate article record
-        for version in versions:
-            # Determine status based on data_cessazione
-            status = 'abrogato' if version.get('data_cessazione') or articolo_data.get('data_cessazione') else 'vigente'
-            
-            # Determine tipo_versione and numero_aggiornamento
-            tipo_versione = version.get('tipo_versione', 'orig')
-            numero_aggiornamento = version.get('numero_aggiornamento')
+        def report_saved(result):
+            for article_id, row in zip(result.ids, rows):
+                print(f"+ Saved article version {row[12]} (ID: {article_id}, status: {row[10]})")
             
-            # Use version-specific content if available, fallback to main article data
-            testo_completo = version.get('testo_versione') or version.get('testo_completo') or articolo_data.get('testo_completo', '')
-            testo_pulito = version.get('testo_pulito') or articolo_data.get('testo_pulito', '')
-            
-            insert_query = """
-                INSERT INTO articoli (
-                    documento_id, numero_articolo, titoloAtto, testo_completo, 
-                    testo_pulito, articoli_correlati, allegati, data_attivazione, 
-                    data_cessazione, url_documento, status, 
-                    articolo_base_id, tipo_versione, numero_aggiornamento
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(insert_query, [
-                articolo_data['documento_id'],
-                articolo_data['numero_articolo'],
-                articolo_data['titoloAtto'],
-                testo_completo,
-                testo_pulito,
-                articolo_data.get('articoli_correlati', '[]'),
-                version.get('allegati') or articolo_data.get('allegati', '[]'),
-                version.get('data_inizio_vigore') or articolo_data.get('data_attivazione'),
-                version.get('data_fine_vigore') or articolo_data.get('data_cessazione'),
-                articolo_data.get('url_documento', ''),
-                status,
-                base_article_id,  # NULL for base article, set for updates
-                tipo_versione,
-                numero_aggiornamento
-            ])
-            
-            article_id = cursor.lastrowid
-            article_ids.append(article_id)
-            
-            # If this is the original article, use its ID as base for updates
-            if tipo_versione == 'orig' or base_article_id is None:
-                base_article_id = article_id
-            
-            print(f"+ Saved article version {tipo_versione} (ID: {article_id}, status: {status})")
-        
-        # Update articolo_base_id for update versions
-        if base_article_id and len(article_ids) > 1:
-            for article_id in article_ids[1:]:  # Skip the first (base) article
-                cursor.execute(
-                    "UPDATE articoli SET articolo_base_id = ? WHERE id = ?",
-                    [base_article_id, article_id]
-                )
+            print(f"+ Saved article {articolo_data['numero_articolo']} with {len(versions)} versions")
+            for i, version in enumerate(versions):
+                version_desc = version.get('tipo_versione', 'orig')
+                if version.get('numero_aggiornamento'):
+                    version_desc = f"agg.{version['numero_aggiornamento']}"
+                print(f"  - {version_desc} (ID: {result.ids[i]})")
         
-        conn.commit()
-        
-        print(f"+ Saved article {articolo_data['numero_articolo']} with {len(versions)} versions")
-        for i, version in enumerate(versions):
-            version_desc = version.get('tipo_versione', 'orig')
-            if version.get('numero_aggiornamento'):
-                version_desc = f"agg.{version['numero_aggiornamento']}"
-            print(f"  - {version_desc} (ID: {article_ids[i]})")
-        
-        return article_ids[0]  # Return base article ID
+        # Tutte le versioni in un solo record: il writer le scrive in un SAVEPOINT
+        record = ArticleRecord(articolo_data['documento_id'], articolo_data['numero_articolo'], rows, base_index)
+        return _submit_articolo(writer, record, articolo_data, report_saved)
         
     except Exception as e:
         print(f"[ERROR] Error saving article with simplified versioning: {e}")
-        conn.rollback()
         return None
 
-def save_articolo_basic(articolo_data, cursor, conn):
+def save_articolo_update(articolo_data, stored):
+    """
+    Modalità --update: accoda le versioni nuove di un articolo già salvato sotto il suo
+    articolo base e riscrive le versioni già presenti (es. 'current'); restituisce il Future.
+    """
+    try:
+        writer = get_database_writer()
+        rows, _ = build_version_rows(articolo_data)
+        new_rows = [row for row in rows if row[12] not in stored['versions']]
+        refreshed = [(stored['versions'][row[12]], row) for row in rows if row[12] in stored['versions']]
+        
+        def report_saved(result):
+            print(f"+ Updated article {articolo_data['numero_articolo']}: "
+                  f"{len(new_rows)} new versions (IDs: {result.ids}), {len(refreshed)} refreshed")
+        
+        with update_stats_lock:
+            update_stats['updated'] += 1
+            update_stats['appended'] += len(new_rows)
+        record = ArticleUpdateRecord(
+            articolo_data['documento_id'], articolo_data['numero_articolo'], stored['base_id'], new_rows, refreshed
+        )
+        return _submit_articolo(writer, record, articolo_data, report_saved)
+        
+    except Exception as e:
+        print(f"[ERROR] Error updating article {articolo_data.get('numero_articolo')}: {e}")
+        return None
+
+def save_articolo_basic(articolo_data, writer):
     """Save article using basic schema (fallback)"""
     try:
         # Determine status based on data_cessazione
         status = 'abrogato' if articolo_data.get('data_cessazione') else 'vigente'
         
-        # Check if we have the simplified versioning columns
-        cursor.execute("PRAGMA table_info(articoli)")
-        columns = [column[1] for column in cursor.fetchall()]
-        has_simplified_columns = 'articolo_base_id' in columns
-        
+        # Versioning columns come from the schema capabilities read at startup
+        has_simplified_columns = writer.capabilities.has_versioning
+        
+        values = [
+            articolo_data['documento_id'],
+            articolo_data['numero_articolo'],
+            articolo_data['titoloAtto'],
+            articolo_data['testo_completo'],
+            articolo_data['testo_pulito'],
+            articolo_data['articoli_correlati'],
+            articolo_data.get('allegati', '[]'),
+            articolo_data.get('data_attivazione'),
+            articolo_data.get('data_cessazione'),
+            articolo_data.get('url_documento', ''),
+            status
+        ]
         if has_simplified_columns:
             # Use simplified schema with versioning columns
-            insert_query = """
-                INSERT INTO articoli (
-                    documento_id, numero_articolo, titoloAtto, testo_completo, 
-                    testo_pulito, articoli_correlati, allegati, data_attivazione, 
-                    data_cessazione, url_documento, status, 
-                    articolo_base_id, tipo_versione, numero_aggiornamento
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(insert_query, [
-                articolo_data['documento_id'],
-                articolo_data['numero_articolo'],
-                articolo_data['titoloAtto'],
-                articolo_data['testo_completo'],
-                articolo_data['testo_pulito'],
-                articolo_data['articoli_correlati'],
-                articolo_data.get('allegati', '[]'),
-                articolo_data.get('data_attivazione'),
-                articolo_data.get('data_cessazione'),
-                articolo_data.get('url_documento', ''),
-                status,
+            values += [
                 None,  # articolo_base_id (NULL for single articles)
                 'orig',  # tipo_versione (default to original)
                 None   # numero_aggiornamento (NULL for original)
-            ])
-        else:
-            # Fallback to basic schema
-            insert_query = """
-                INSERT INTO articoli (
-                    documento_id, numero_articolo, titoloAtto, testo_completo, 
-                    testo_pulito, articoli_correlati, allegati, data_attivazione, 
-                    data_cessazione, url_documento, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(insert_query, [
-                articolo_data['documento_id'],
-                articolo_data['numero_articolo'],
-                articolo_data['titoloAtto'],
-                articolo_data['testo_completo'],
-                articolo_data['testo_pulito'],
-                articolo_data['articoli_correlati'],
-                articolo_data.get('allegati', '[]'),
-                articolo_data.get('data_attivazione'),
-                articolo_data.get('data_cessazione'),
-                articolo_data.get('url_documento', ''),
-                status
-            ])
-        
-        article_id = cursor.lastrowid
-        conn.commit()
+            ]
         
-        print(f"+ Saved article {articolo_data['numero_articolo']} (basic schema, status: {status})")
-        return article_id
+        record = ArticleRecord(articolo_data['documento_id'], articolo_data['numero_articolo'], [values])
+        return _submit_articolo(writer, record, articolo_data, lambda result: print(
+            f"+ Saved article {articolo_data['numero_articolo']} (basic schema, status: {status})"
+        ))
         
     except Exception as e:
         print(f"[ERROR] Error saving article with basic schema: {e}")
-        conn.rollback()
         return None
 
 # ========================================
@@ -1900,32 +2169,37 @@ def _get_name_type_year(norma_urn):
     norma_name = f"{norma_type_initials} {norma_number} del {norma_date}"
     return (norma_name, norma_type, norma_year)
 
-def _get_relative_url(absolute_url, base_url=normattiva_url):
+def _get_relative_url(absolute_url, base_url=None):
     """elimina la base_url da una url assoluta"""
-    return absolute_url.replace(base_url, '')
+    return absolute_url.replace(base_url or normattiva_url, '')
 
-def _get_absolute_url(relative_url, base_url=normattiva_url):
+def _get_absolute_url(relative_url, base_url=None):
     """torna una url assoluta, partendo da una relativa"""
-    return f"{base_url}{relative_url}"
+    return f"{base_url or normattiva_url}{relative_url}"
 
 def _get_permalinks(tmp_url, session=None):
+    """
+    Verifica che il documento esista e restituisce (permalinks, urn, documento).
+    Il DocumentFetch restituito viene riutilizzato da process_permalinks, quindi
+    la pagina principale viene scaricata una sola volta.
+    """
     print(f"[_get_permalinks] tmp_url: {tmp_url}")
     norma_url_tmp = _get_absolute_url(tmp_url)
     print(f"[_get_permalinks] norma_url_tmp: {norma_url_tmp}")
-    norma_res_tmp = session.get(norma_url_tmp)
-    print(f"[_get_permalinks] status_code: {norma_res_tmp.status_code}")
+    document = fetch_document(norma_url_tmp, session)
+    print(f"[_get_permalinks] status_code: {document.status_code}")
     
-    if norma_res_tmp.status_code == 404:
+    if document.status_code == 404:
         print("[_get_permalinks] 404 Not Found")
         return None
     
     # Check if content contains "Provvedimento non trovato"
-    if b'Provvedimento non trovato in banca dati' in norma_res_tmp.content:
+    if b'Provvedimento non trovato in banca dati' in document.content:
         print("[_get_permalinks] Provvedimento non trovato in banca dati")
         return None
     
     # Check if content contains "Errore nel caricamento delle informazioni" (404 page)
-    if b'Errore nel caricamento delle informazioni' in norma_res_tmp.content:
+    if b'Errore nel caricamento delle informazioni' in document.content:
         print("[_get_permalinks] Errore nel caricamento delle informazioni (404 page)")
         return None
     
@@ -1934,19 +2208,113 @@ def _get_permalinks(tmp_url, session=None):
     law_urn = urn_match.group(0) if urn_match else None
     
     # For this type of page, return the current URL as the only permalink
-    return [tmp_url], law_urn
+    return [tmp_url], law_urn, document
 
-def get_year_configuration():
+def parse_cli_options(args):
+    """
+    Separa le opzioni --nome valore dagli argomenti posizionali (anno, numero documenti).
+    
+    Opzioni supportate:
+        --engine sync|async   motore di scraping (default: sync)
+        --concurrency N       richieste HTTP contemporanee verso normattiva.it
+        --cache PATH          file della cache HTTP (default: http_cache.sqlite)
+        --cache-ttl SECONDI   età massima di una risposta prima della rivalidazione
+        --no-cache            disabilita la cache HTTP su disco
+        --base-url URL        sostituisce http://www.normattiva.it (es. server di replay locale)
+        --record PATH         registra tutte le risposte in un archivio per il replay
+        --replay PATH         avvia replay_server.py sull'archivio e fa lo scraping offline
+        --index PATH          indice dei numeri esistenti (default: existence_index.sqlite)
+        --no-index            riverifica tutti i numeri senza usare l'indice
+        --parallel-formats    pre-1900: se il formato più probabile fallisce, prova gli altri in parallelo
+        --rate N              richieste al secondo massime verso normattiva.it (0 = nessun limite)
+        --parse-workers N     processi per il parsing HTML (0 = parsing nei thread di crawling)
+        --update              riverifica i documenti già salvati e aggiunge solo le versioni nuove degli articoli
+    
+    Returns:
+        tuple: (dict opzioni, lista argomenti posizionali)
+    """
+    options = {
+        'engine': 'sync',
+        'concurrency': None,
+        'cache': DEFAULT_CACHE_PATH,
+        'cache_ttl': DEFAULT_TTL,
+        'no_cache': False,
+        'base_url': None,
+        'record': None,
+        'replay': None,
+        'index': DEFAULT_INDEX_PATH,
+        'no_index': False,
+        'parallel_formats': False,
+        'rate': DEFAULT_RATE,
+        'parse_workers': DEFAULT_PARSE_WORKERS,
+        'update': False,
+    }
+    # Opzioni senza valore
+    flags = {'no_cache', 'no_index', 'parallel_formats', 'update'}
+    positional = []
+    
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            name = name.replace('-', '_')
+            if name in flags:
+                options[name] = True
+                i += 1
+                continue
+            if not value and i + 1 < len(args) and not args[i + 1].startswith('--'):
+                value = args[i + 1]
+                i += 1
+            if name not in options:
+                print(f"[WARNING] Unknown option --{name}, ignored")
+            elif name == 'engine':
+                if value not in ('sync', 'async'):
+                    print(f"[ERROR] Invalid engine: {value}. Using sync engine.")
+                else:
+                    options['engine'] = value
+            elif name == 'concurrency':
+                try:
+                    options['concurrency'] = max(1, int(value))
+                except ValueError:
+                    print(f"[ERROR] Invalid concurrency: {value}. Using default.")
+            elif name == 'parse_workers':
+                try:
+                    options['parse_workers'] = max(0, int(value))
+                except ValueError:
+                    print(f"[ERROR] Invalid parse workers: {value}. Using default.")
+            elif name == 'rate':
+                try:
+                    options['rate'] = float(value) if float(value) > 0 else None
+                except ValueError:
+                    print(f"[ERROR] Invalid rate: {value}. Using default.")
+            elif name == 'cache_ttl':
+                try:
+                    options['cache_ttl'] = int(value)
+                except ValueError:
+                    print(f"[ERROR] Invalid cache TTL: {value}. Using default.")
+            else:
+                options[name] = value
+        else:
+            positional.append(arg)
+        i += 1
+    
+    return options, positional
+
+def get_year_configuration(args=None):
     """Get year configuration from command line arguments or default"""
-    if len(sys.argv) >= 2:
+    if args is None:
+        args = sys.argv[1:]
+    
+    if len(args) >= 1:
         try:
-            target_year = int(sys.argv[1])
+            target_year = int(args[0])
             
             # Check for optional second argument for number of documents
             num_docs = None
-            if len(sys.argv) >= 3:
+            if len(args) >= 2:
                 try:
-                    num_docs = int(sys.argv[2])
+                    num_docs = int(args[1])
                 except ValueError:
                     pass
             
@@ -1970,7 +2338,7 @@ def get_year_configuration():
             
             return OrderedDict([(target_year, estimated_docs)])
         except ValueError:
-            print(f"[ERROR] Invalid year: {sys.argv[1]}. Using default configuration.")
+            print(f"[ERROR] Invalid year: {args[0]}. Using default configuration.")
     
     # Default configuration for testing
     return OrderedDict([
@@ -1987,7 +2355,9 @@ def process_permalinks(permalinks_and_urn, session=None):
         print("[process_permalinks] No permalinks data provided")
         return None
         
-    permalinks, law_urn = permalinks_and_urn
+    permalinks, law_urn = permalinks_and_urn[:2]
+    # Pagina già scaricata da _get_permalinks (se presente)
+    prefetched = permalinks_and_urn[2] if len(permalinks_and_urn) > 2 else None
     print(f"[process_permalinks] permalinks: {permalinks}, law_urn: {law_urn}")
     if session is None:
         print("La sessione deve essere specificata")
@@ -1999,9 +2369,13 @@ def process_permalinks(permalinks_and_urn, session=None):
     for permalink_url in permalinks:
         print(f"[process_permalinks] Processing permalink_url: {permalink_url}")
         norma_url = _get_absolute_url(permalink_url)
-        norma_res = session.get(norma_url)
-        print(f"[process_permalinks] norma_res status_code: {norma_res.status_code}")
-        norma_el = lxml.html.fromstring(norma_res.content)
+        if prefetched is not None and prefetched.url == norma_url:
+            document = prefetched
+            print(f"[process_permalinks] Reusing fetched page ({len(document.content)} bytes)")
+        else:
+            document = fetch_document(norma_url, session)
+        print(f"[process_permalinks] norma_res status_code: {document.status_code}")
+        norma_el = document.tree
         
         # Extract law metadata from meta tags and HTML elements
         meta_title = norma_el.xpath('//meta[@property="eli:title"]/@content')
@@ -2161,10 +2535,11 @@ def process_permalinks(permalinks_and_urn, session=None):
         }
         
         # Salva documento
-        documento_id = save_documento_normativo(documento_data)
-        if not documento_id:
+        document_context = save_documento_context(documento_data)
+        if not document_context:
             print(f"[process_permalinks] Failed to save document")
             continue
+        documento_id = document_context.documento_id
 
         # ==================================================
         # ENHANCED ARTICLE SCRAPING WITH BODYTEXT AND VERSIONING
@@ -2175,7 +2550,7 @@ def process_permalinks(permalinks_and_urn, session=None):
         # Use enhanced article scraping that handles bodyTesto and versioning
         try:
             print(f"[process_permalinks] Using enhanced article scraping with bodyTesto extraction")
-            article_ids = enhanced_article_scraping_with_versioning(norma_url, session, documento_id)
+            article_ids = enhanced_article_scraping_with_versioning(norma_url, session, documento_id, document=document, context=document_context)
             if article_ids:
                 articoli_extracted = True
                 print(f"[process_permalinks] Enhanced scraping processed {len(article_ids)} articles with bodyTesto and versioning")
@@ -2187,7 +2562,7 @@ def process_permalinks(permalinks_and_urn, session=None):
         # Fallback to standard article extraction if enhanced scraping didn't work
         if not articoli_extracted:
             print("[process_permalinks] Using standard article extraction")
-            articoli_extracted = extract_all_articles_with_bodytext(norma_url, session, documento_id)
+            articoli_extracted = extract_all_articles_with_bodytext(norma_url, session, documento_id, document=document, context=document_context)
         
         # Final fallback: create main article if no articles were extracted
         if not articoli_extracted:
@@ -2225,6 +2600,9 @@ def process_permalinks(permalinks_and_urn, session=None):
                 }]
             }
             save_articolo_with_versions(articolo_data)
+        
+        # Una transazione per documento: documento, articoli e versioni con un solo commit
+        get_database_writer().commit_document()
     
     return True  # Return True to indicate successful processing
 
@@ -2269,6 +2647,35 @@ def construct_norma_url(year, doc_number, multivigente=True, format_type='auto')
         else:
             return f"/uri-res/N2Ls?urn:nir:{year};{doc_number}"
 
+def candidate_document_urls(year, doc_number, multivigente=True):
+    """Formati URN-NIR (nome, url relativo) di un documento, nell'ordine di probabilità"""
+    if year >= 1900:
+        return [('standard', construct_norma_url(year, doc_number, multivigente))]
+    
+    suffix = '!multivigente~' if multivigente else ''
+    return [
+        ('regio.decreto', f"/uri-res/N2Ls?urn:nir:stato:regio.decreto:{year};{doc_number}{suffix}"),
+        ('legge_with_date', f"/uri-res/N2Ls?urn:nir:stato:legge:{year}-12-31;{doc_number}{suffix}"),
+        ('legge_simple', f"/uri-res/N2Ls?urn:nir:stato:legge:{year};{doc_number}{suffix}"),
+        ('ministero_decree', f"/uri-res/N2Ls?urn:nir:ministero.pubblica.istruzione:decreto.ministeriale:{year}-10-31;{doc_number}{suffix}"),
+        ('standard', f"/uri-res/N2Ls?urn:nir:{year};{doc_number}{suffix}")
+    ]
+
+def probe_document_formats(year, doc_number, session, multivigente=True):
+    """
+    Prova i formati URN-NIR del documento nell'ordine appreso da format_selector.
+    Restituisce (formato, url, risultato di _get_permalinks) o None se nessun formato funziona:
+    il risultato contiene già la pagina scaricata, da passare a process_permalinks.
+    """
+    candidates = candidate_document_urls(year, doc_number, multivigente)
+    if len(candidates) == 1:
+        format_name, url = candidates[0]
+        result = _get_permalinks(url, session=session)
+        return (format_name, url, result) if result is not None else None
+    
+    return format_selector.probe(year, doc_number, candidates,
+                                 lambda url: _get_permalinks(url, session=session))
+
 def try_multiple_formats_for_old_documents(year, doc_number, session, multivigente=True):
     """
     Try multiple URN-NIR formats for older documents (pre-1900).
@@ -2278,66 +2685,145 @@ def try_multiple_formats_for_old_documents(year, doc_number, session, multivigen
         # For modern documents, use standard format
         return construct_norma_url(year, doc_number, multivigente)
     
-    # For pre-1900 documents, try multiple formats in order of likelihood
-    formats_to_try = [
-        ('regio.decreto', f"/uri-res/N2Ls?urn:nir:stato:regio.decreto:{year};{doc_number}{'!multivigente~' if multivigente else ''}"),
-        ('legge_with_date', f"/uri-res/N2Ls?urn:nir:stato:legge:{year}-12-31;{doc_number}{'!multivigente~' if multivigente else ''}"),
-        ('legge_simple', f"/uri-res/N2Ls?urn:nir:stato:legge:{year};{doc_number}{'!multivigente~' if multivigente else ''}"),
-        ('ministero_decree', f"/uri-res/N2Ls?urn:nir:ministero.pubblica.istruzione:decreto.ministeriale:{year}-10-31;{doc_number}{'!multivigente~' if multivigente else ''}"),
-        ('standard', f"/uri-res/N2Ls?urn:nir:{year};{doc_number}{'!multivigente~' if multivigente else ''}")
-    ]
-    
-    for format_name, url in formats_to_try:
-        print(f"🔍 Trying format '{format_name}' for {year};{doc_number}")
-        
-        result = _get_permalinks(url, session=session)
-        if result is not None:
-            print(f"✅ Format '{format_name}' works for {year};{doc_number}")
-            return url
-        else:
-            print(f"❌ Format '{format_name}' failed for {year};{doc_number}")
-    
-    print(f"❌ No format worked for {year};{doc_number}")
-    return None
+    located = probe_document_formats(year, doc_number, session, multivigente)
+    return located[1] if located else None
 
 def find_last_document_for_year(year, session, max_search=50000):
     """
-    Find the last available document number for a given year using binary search.
-    For older documents (pre-1900), tries multiple URN-NIR formats.
+    Find the last available document number for a given year.
+    Probing esponenziale + k-ario concorrente (year_discovery.py) al posto della
+    ricerca binaria seriale; per gli anni pre-1900 ogni verifica prova i vari formati URN-NIR.
     """
     print(f"🔍 Finding last document for year {year}...")
+    started = time.time()
+    
+    def document_exists(doc_number):
+        # Passa dall'indice di esistenza: i numeri già verificati non generano richieste
+        return discover_document(year, doc_number, session) is not None
+    
+    # Un punto per slot della sessione: più punti per round resterebbero in coda sul semaforo
+    probes_per_round = getattr(session, 'max_concurrency', DEFAULT_CONCURRENCY)
+    last_valid, probes, rounds = find_last_document(document_exists, max_search, probes_per_round)
+    
+    print(f"✅ Last document for year {year}: {last_valid} "
+          f"({probes} probes in {rounds} rounds, {time.time() - started:.1f}s)")
+    return last_valid
+
+def discover_document(anno, doc_number, session):
+    """
+    Verifica se il documento anno;numero esiste e ne scarica la pagina.
+    Con l'indice di esistenza attivo (existence_index.py):
+    - numero mancante verificato entro il TTL: None senza richieste
+    - documento già salvato e verificato entro il TTL: DOCUMENT_UNCHANGED senza richieste
+      (non in modalità --update, che riverifica sempre i documenti salvati)
+    - oltre il TTL: DOCUMENT_UNCHANGED se la pagina ha lo stesso hash dell'ultima verifica
+    - formato già noto: URL diretto invece di riprovare i formati pre-1900
+    Restituisce il risultato di _get_permalinks, None o DOCUMENT_UNCHANGED.
+    """
+    index = existence_index
+    entry = index.lookup(anno, doc_number) if index is not None else None
+    
+    if entry is not None and entry['fresh']:
+        if entry['status'] == STATUS_MISSING:
+            index.skipped_missing += 1
+            print(f"[index] Document {anno};{doc_number} known missing, skipped")
+            return None
+        if entry['urn'] and not update_mode and get_documento_by_urn(entry['urn']):
+            index.skipped_unchanged += 1
+            print(f"[index] Document {anno};{doc_number} already saved and checked recently, skipped")
+            return DOCUMENT_UNCHANGED
     
-    # Binary search to find the last available document
-    low = 1
-    high = max_search
-    last_valid = 0
+    if entry is not None and entry['status'] == STATUS_FOUND and entry['url']:
+        index.known_format += 1
+        formato, norma_url = entry['formato'], entry['url']
+        result = _get_permalinks(norma_url, session=session)
+    else:
+        # La pagina del formato vincente è già scaricata: nessun secondo GET
+        located = probe_document_formats(anno, doc_number, session)
+        formato, norma_url, result = located if located else (None, None, None)
     
-    while low <= high:
-        mid = (low + high) // 2
+    if index is not None:
+        if result is None:
+            # Solo 404 o pagina "non trovato": gli errori transitori sono già stati propagati
+            index.record_missing(anno, doc_number)
+            return None
         
+        page_hash = content_hash(result[2].content)
+        index.record_found(anno, doc_number, formato, norma_url, result[1], page_hash)
+        
+        # Riverifica dopo il TTL: pagina identica e documento già salvato, niente da rielaborare
+        if entry is not None and entry['content_hash'] == page_hash and result[1] and get_documento_by_urn(result[1]):
+            index.skipped_unchanged += 1
+            print(f"[index] Document {anno};{doc_number} unchanged since last check, skipped")
+            return DOCUMENT_UNCHANGED
+    return result
+
+def process_year_sequential(anno, n_norme, session):
+    """Elabora i documenti 1..n_norme di un anno uno alla volta (motore sync)"""
+    consecutive_404s = 0
+    max_consecutive_404s = 10  # Reduced since we now know the actual range
+    processed_count = 0
+    
+    for k in range(1, n_norme + 1):
+        # Use multivigente mode to show article updates buttons
         # For older documents, try multiple formats
-        if year < 1900:
-            norma_url = try_multiple_formats_for_old_documents(year, mid, session, multivigente=True)
-            if norma_url:
-                result = _get_permalinks(norma_url, session=session)
-            else:
-                result = None
-        else:
-            norma_url = construct_norma_url(year, mid, multivigente=True)
-            result = _get_permalinks(norma_url, session=session)
-        
-        if result is not None:
-            # Document exists, search higher
-            last_valid = mid
-            low = mid + 1
-            print(f"📄 Document {mid} exists, searching higher...")
+        try:
+            permalinks_result = discover_document(anno, k, session)
+        except requests.exceptions.RequestException as e:
+            # Non registrato come mancante: verrà riprovato alla prossima esecuzione
+            print(f"❌ Document {k} could not be fetched: {e}")
+            continue
+        if permalinks_result is None:
+            consecutive_404s += 1
+            print(f"⚠️ Document {k} not found in any format (consecutive 404s: {consecutive_404s})")
+            
+            if consecutive_404s >= max_consecutive_404s:
+                print(f"🛑 Stopping year {anno} processing after {consecutive_404s} consecutive 404s")
+                break
+            continue
+        
+        if permalinks_result == DOCUMENT_UNCHANGED:
+            consecutive_404s = 0
+            continue
+        
+        print(f"Processing document {k}/{n_norme} for year {anno}")
+
+        # urn e url parziali della norma
+        try:
+            result = process_permalinks(permalinks_result, session=session)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Document {k} could not be processed: {e}")
+            continue
+        
+        # Check if we got a 404 or "not found"
+        if result is None:
+            consecutive_404s += 1
+            print(f"⚠️ Document {k} not found (consecutive 404s: {consecutive_404s})")
+            
+            if consecutive_404s >= max_consecutive_404s:
+                print(f"🛑 Stopping year {anno} processing after {consecutive_404s} consecutive 404s")
+                break
         else:
-            # Document doesn't exist, search lower
-            high = mid - 1
-            print(f"❌ Document {mid} doesn't exist, searching lower...")
+            consecutive_404s = 0  # Reset counter on successful processing
+            processed_count += 1
     
-    print(f"✅ Last document for year {year}: {last_valid}")
-    return last_valid
+    return processed_count
+
+def process_year_async(anno, n_norme, session, concurrency):
+    """Elabora i documenti di un anno con il motore asyncio (crawl_engine.py)"""
+    from crawl_engine import run_year_async
+    
+    stats = run_year_async(
+        anno,
+        n_norme,
+        session,
+        discover_document=discover_document,
+        process_document=process_permalinks,
+        concurrency=concurrency,
+    )
+    print(f"[async] Year {anno}: {stats['processed']} processed, {stats['unchanged']} unchanged, "
+          f"{stats['failed']} failed, {stats['not_found']} not found")
+    return stats['processed']
 
 # ========================================
 # MAIN EXECUTION
@@ -2357,13 +2843,21 @@ if __name__ == '__main__':
     # Show usage if help requested
     if len(sys.argv) >= 2 and sys.argv[1] in ['-h', '--help', 'help']:
         print("USAGE:")
-        print("  python scraper_optimized.py [anno] [numero_documenti]")
+        print("  python scraper_optimized.py [anno] [numero_documenti] [--engine sync|async] [--concurrency N]")
+        print("                              [--cache PATH] [--cache-ttl SECONDI] [--no-cache]")
+        print("                              [--base-url URL] [--record ARCHIVIO] [--replay ARCHIVIO]")
+        print("                              [--index PATH] [--no-index] [--parallel-formats] [--rate N]")
+        print("                              [--parse-workers N] [--update]")
         print()
         print("Esempi:")
         print("  python scraper_optimized.py 2024          # Estrae 10 documenti del 2024")
         print("  python scraper_optimized.py 2024 50       # Estrae 50 documenti del 2024") 
         print("  python scraper_optimized.py 2023 100      # Estrae 100 documenti del 2023")
         print("  python scraper_optimized.py               # Configurazione di default (2024, 5 docs)")
+        print("  python scraper_optimized.py 2024 --engine async --concurrency 8   # 8 richieste in parallelo")
+        print("  python scraper_optimized.py 2024 20 --record crawl_2024.sqlite     # registra il crawl")
+        print("  python scraper_optimized.py 2024 20 --replay crawl_2024.sqlite     # benchmark offline")
+        print("  python scraper_optimized.py 2024 --update                          # solo articoli con nuove versioni")
         print()
         print("Per resettare il database:")
         print("  python clear_database.py")
@@ -2374,28 +2868,77 @@ if __name__ == '__main__':
         print("  - Supporto versioning (originale + aggiornamenti)")
         print("  - Modalità multivigente per rilevare pulsanti aggiornamenti")
         print("  - Popolamento automatico fonte_origine dopo scraping")
+        print("  - Cache HTTP su disco: le riesecuzioni leggono le pagine già scaricate dal disco")
+        print("  - Indice dei numeri esistenti: le esecuzioni incrementali saltano i numeri già verificati")
         print()
         sys.exit(0)
 
+    cli_options, positional_args = parse_cli_options(sys.argv[1:])
+    
     # Inizializza il database ottimizzato
     init_optimized_database()
 
     # Get year configuration
-    norme_anno = get_year_configuration()
+    norme_anno = get_year_configuration(positional_args)
+    
+    engine = cli_options['engine']
+    concurrency = cli_options['concurrency'] or DEFAULT_CONCURRENCY
+    rate = cli_options['rate']
+    print(f"ENGINE: {engine} (max {concurrency} concurrent requests)")
+    
+    # Parsing HTML in processi separati: scala sui core e si sovrappone ai download
+    parse_pool = ParsePool(cli_options['parse_workers'])
+    print(f"PARSE WORKERS: {parse_pool.workers or 'none (parsing in crawl threads)'}")
+    
+    # Replay offline: server locale che imita normattiva.it a partire da un archivio registrato
+    replay_server = None
+    if cli_options['replay']:
+        from replay_server import ReplayServer
+        replay_server = ReplayServer(cli_options['replay'], port=0)
+        normattiva_url = replay_server.start_in_background()
+        print(f"REPLAY: {cli_options['replay']} served on {normattiva_url}")
+        # Server locale: nessun limite di frequenza, il benchmark misura lo scraper
+        rate = None
+    elif cli_options['base_url']:
+        normattiva_url = cli_options['base_url'].rstrip('/')
+        print(f"BASE URL: {normattiva_url}")
+    
+    # Cache HTTP persistente (riprese e riesecuzioni leggono dal disco)
+    response_cache = None
+    if cli_options['record']:
+        from replay_server import open_recording_archive
+        response_cache = open_recording_archive(cli_options['record'])
+        print(f"RECORD: saving every response to {cli_options['record']}")
+    elif not cli_options['no_cache'] and not replay_server:
+        response_cache = ResponseCache(cli_options['cache'], ttl=cli_options['cache_ttl'])
+        print(f"CACHE: {cli_options['cache']} (TTL {cli_options['cache_ttl']}s)")
+        if cli_options['update']:
+            # Le pagine salvate nelle esecuzioni precedenti vengono rivalidate (ETag/Last-Modified)
+            response_cache.revalidate_before = time.time()
+    
+    # Aggiornamento incrementale dei documenti già salvati
+    update_mode = cli_options['update']
+    if update_mode:
+        print("UPDATE: saved documents are rechecked, only new article versions are fetched")
+    
+    # Indice di esistenza (disattivato nel replay, che deve riprodurre sempre lo stesso crawl)
+    if not cli_options['no_index'] and not replay_server:
+        existence_index = ExistenceIndex(cli_options['index'])
+        print(f"INDEX: {cli_options['index']}")
+        # I formati pre-1900 già trovati nelle esecuzioni precedenti ordinano subito i candidati
+        seeded = format_selector.seed(existence_index.known_formats())
+        if seeded:
+            print(f"FORMATS: learned from {seeded} indexed pre-1900 documents")
+    
+    format_selector.concurrent = cli_options['parallel_formats']
+    
+    run_started = time.time()
+    total_processed = 0
 
     # genera istanza di navigazione,
-    # con header modificati e timeout per evitare hang
-    with requests.session() as session:
-        session.headers.update({
-            'User-agent': "Mozilla/5.0"
-                "(Macintosh; Intel Mac OS X 10_11_6) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/55.0.2883.95 Safari/537.36",
-            'Connection': 'keep-alive'
-        })
-        
-        # Add default timeout for all requests to prevent hanging
-        session.timeout = 30
+    # con header modificati, timeout, limite di richieste contemporanee e cache
+    print(f"RATE: {f'{rate:g} requests/s (adaptive)' if rate else 'unlimited'}")
+    with create_session(max_concurrency=concurrency, cache=response_cache, rate=rate) as session:
 
         # Process all documents for the specified years
         for anno, n_norme in norme_anno.items():
@@ -2404,8 +2947,14 @@ if __name__ == '__main__':
             print(f"{'='*60}")
             
             # Find the actual last document for this year
-            if n_norme > 1000:  # Only use binary search for large numbers
-                actual_last_doc = find_last_document_for_year(anno, session)
+            if n_norme > 1000:  # Only run boundary discovery for large numbers
+                try:
+                    actual_last_doc = find_last_document_for_year(anno, session)
+                except requests.exceptions.RequestException as e:
+                    # Un errore transitorio non deve abbassare il limite: si usa quello richiesto,
+                    # il ciclo si ferma comunque dopo i 404 consecutivi
+                    print(f"⚠️ Boundary discovery for year {anno} failed ({e}), using {n_norme}")
+                    actual_last_doc = n_norme
                 if actual_last_doc == 0:
                     print(f"⚠️ No documents found for year {anno}")
                     continue
@@ -2414,50 +2963,23 @@ if __name__ == '__main__':
             else:
                 print(f"📊 Processing up to {n_norme} documents for year {anno}")
             
-            consecutive_404s = 0
-            max_consecutive_404s = 10  # Reduced since we now know the actual range
-            processed_count = 0
+            if engine == 'async':
+                processed_count = process_year_async(anno, n_norme, session, concurrency)
+            else:
+                processed_count = process_year_sequential(anno, n_norme, session)
             
-            for k in range(1, n_norme + 1):
-                # Use multivigente mode to show article updates buttons
-                # For older documents, try multiple formats
-                if anno < 1900:
-                    norma_url = try_multiple_formats_for_old_documents(anno, k, session, multivigente=True)
-                    if not norma_url:
-                        consecutive_404s += 1
-                        print(f"⚠️ Document {k} not found in any format (consecutive 404s: {consecutive_404s})")
-                        
-                        if consecutive_404s >= max_consecutive_404s:
-                            print(f"🛑 Stopping year {anno} processing after {consecutive_404s} consecutive 404s")
-                            break
-                        continue
-                else:
-                    norma_url = construct_norma_url(anno, k, multivigente=True)
-                
-                print(f"Processing document {k}/{n_norme} for year {anno}")
-
-                # urn e url parziali della norma
-                result = process_permalinks(
-                    _get_permalinks(
-                        norma_url,
-                        session=session
-                    ),
-                    session=session
-                )
-                
-                # Check if we got a 404 or "not found"
-                if result is None:
-                    consecutive_404s += 1
-                    print(f"⚠️ Document {k} not found (consecutive 404s: {consecutive_404s})")
-                    
-                    if consecutive_404s >= max_consecutive_404s:
-                        print(f"🛑 Stopping year {anno} processing after {consecutive_404s} consecutive 404s")
-                        break
-                else:
-                    consecutive_404s = 0  # Reset counter on successful processing
-                    processed_count += 1
-                    
+            total_processed += processed_count
             print(f"✅ Completed processing year {anno} - processed {processed_count} documents")
+        
+        # Throughput dello scraping (confrontabile tra esecuzioni sullo stesso archivio di replay)
+        elapsed = time.time() - run_started
+        print(f"\n⏱️ Scraping time: {elapsed:.1f}s for {total_processed} documents "
+              f"({total_processed / elapsed if elapsed > 0 else 0:.2f} docs/s)")
+
+        parse_pool.shutdown()
+        
+        # Commit delle ultime righe prima che altri script aprano data.sqlite
+        close_database_writer()
 
         # ========================================
         # AUTOMATIC FONTE ORIGINE POPULATION
@@ -2484,7 +3006,7 @@ if __name__ == '__main__':
 
         # Statistiche finali
         try:
-            conn = sqlite3.connect('data.sqlite')
+            conn = connect_monitor()
             cursor = conn.cursor()
             
             cursor.execute("SELECT COUNT(*) FROM documenti_normativi")
@@ -2558,7 +3080,8 @@ if __name__ == '__main__':
             
             # Try to get bodyTesto extraction statistics
             try:
-                cursor.execute("SELECT COUNT(*) FROM articoli WHERE testo_pulito IS NOT NULL AND LENGTH(testo_pulito) > 0")
+                text_source = SchemaCapabilities.from_connection(conn).article_text_source
+                cursor.execute(f"SELECT COUNT(*) FROM {text_source} WHERE testo_pulito IS NOT NULL AND LENGTH(testo_pulito) > 0")
                 result = cursor.fetchone()
                 bodytext_count = result[0] if result else 0
                 
@@ -2598,5 +3121,45 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"Error generating statistics: {e}")
         
+        if response_cache is not None:
+            cache_stats = response_cache.stats()
+            print(f"\n=== CACHE HTTP ===")
+            print(f"Risposte dalla cache: {cache_stats['hits']}")
+            print(f"Rivalidate (304): {cache_stats['revalidated']}")
+            print(f"Scaricate dalla rete: {cache_stats['misses']}")
+            response_cache.close()
+        
+        if update_mode:
+            print(f"\n=== AGGIORNAMENTO ===")
+            print(f"Articoli senza nuove versioni (saltati): {update_stats['unchanged']}")
+            print(f"Articoli aggiornati: {update_stats['updated']} ({update_stats['appended']} nuove versioni)")
+        
+        if existence_index is not None:
+            index_stats = existence_index.stats()
+            print(f"\n=== INDICE DOCUMENTI ===")
+            print(f"Numeri esistenti / mancanti nell'indice: {index_stats['found']} / {index_stats['missing']}")
+            print(f"Saltati (mancanti di recente): {index_stats['skipped_missing']}")
+            print(f"Saltati (già salvati, entro il TTL): {index_stats['skipped_unchanged']}")
+            print(f"Formato URN già noto: {index_stats['known_format']}")
+            existence_index.close()
+
+        http_stats = session.stats()
+        rate_text = f"{http_stats['rate']:.1f} req/s" if http_stats['rate'] else "nessun limite di frequenza"
+        print(f"\n=== HTTP ===")
+        print(f"Retry: {http_stats['retries']}, richieste abbandonate: {http_stats['gave_up']}")
+        print(f"Limitatore: {http_stats['limit']:.1f} richieste contemporanee, {rate_text} "
+              f"({http_stats['decreases']} riduzioni)")
+
+        format_stats = format_selector.stats()
+        if format_stats['located']:
+            print(f"\n=== FORMATI URN PRE-1900 ===")
+            print(f"Documenti trovati: {format_stats['located']} "
+                  f"({format_stats['first_try']} al primo formato provato)")
+            print(f"Richieste per trovare il formato: {format_stats['requests']}")
+
+        if replay_server is not None:
+            print(f"Replay server: {replay_server.hits} hits, {replay_server.misses} not found")
+            replay_server.stop()
+        
         print("+ Unified scraping completed with enhanced bodyTesto extraction, versioning, and automatic fonte origine population!")
         print("+ All articles now have fonte_origine values populated automatically!")
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Full-text search index (SQLite FTS5) over data.sqlite
+Primo stadio del retrieval: al posto delle scansioni LIKE '%...%' due tabelle FTS5
+con ranking BM25, mantenute allineate da trigger su articoli e commi.
+
+- articoli_fts: titoloAtto e testo_pulito degli articoli (tutte le versioni)
+- commi_fts: testo dei commi estratti da legal_ai_enhancer.py
+- tabelle "external content": l'indice non duplica i testi, li rilegge dalla vista
+  articoli_testo (deposito testi_articoli) e da commi solo per gli snippet
+- tokenizer unicode61 con remove_diacritics 2: "perché", "perche" e "PERCHÉ" sono
+  lo stesso termine; l'apostrofo separa le elisioni ("dell'articolo" -> dell, articolo)
+- FTS5 non ha uno stemmer italiano: le varianti si cercano per prefisso
+  (prefix=True, servito dagli indici di prefisso)
+
+I trigger leggono il testo dal deposito tramite l'hash della riga: il writer
+inserisce il testo in testi_articoli prima della riga articolo, quindi il trigger
+AFTER INSERT lo trova sempre. I testi del deposito non vengono mai cancellati,
+così il 'delete' FTS5 riceve esattamente i valori indicizzati.
+
+Usage:
+    python search_index.py "responsabilità amministrativa" [--commi] [--limit 20] [--prefix]
+    python search_index.py --rebuild
+"""
+
+import re
+import sys
+
+from db_connection import DEFAULT_DB_PATH, connect_database, connect_monitor
+from db_writer import SchemaCapabilities, ensure_text_store
+
+# Configuration constants
+DEFAULT_SEARCH_LIMIT = 20
+FTS_TOKENIZER = 'unicode61 remove_diacritics 2'
+FTS_PREFIX_LENGTHS = '3 5'  # Indici di prefisso per le ricerche "termine*"
+BM25_TITLE_WEIGHT = 0.5  # titoloAtto è il titolo dell'atto, uguale per tutti i suoi articoli
+BM25_TEXT_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+
+# ========================================
+# SCHEMA
+# ========================================
+
+# Testo indicizzato di una riga articolo: dal deposito se ha l'hash, altrimenti in linea
+_ARTICLE_TEXT = "COALESCE((SELECT testo FROM testi_articoli WHERE hash = {row}.hash_testo_pulito), {row}.testo_pulito)"
+
+SQL_CREATE_ARTICOLI_FTS = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS articoli_fts USING fts5(
+        titoloAtto, testo_pulito,
+        content='articoli_testo', content_rowid='id',
+        tokenize='{FTS_TOKENIZER}', prefix='{FTS_PREFIX_LENGTHS}'
+    )
+"""
+
+SQL_CREATE_ARTICOLI_FTS_TRIGGERS = f"""
+    CREATE TRIGGER IF NOT EXISTS articoli_fts_insert AFTER INSERT ON articoli BEGIN
+        INSERT INTO articoli_fts (rowid, titoloAtto, testo_pulito)
+        VALUES (new.id, new.titoloAtto, {_ARTICLE_TEXT.format(row='new')});
+    END;
+    CREATE TRIGGER IF NOT EXISTS articoli_fts_delete AFTER DELETE ON articoli BEGIN
+        INSERT INTO articoli_fts (articoli_fts, rowid, titoloAtto, testo_pulito)
+        VALUES ('delete', old.id, old.titoloAtto, {_ARTICLE_TEXT.format(row='old')});
+    END;
+    CREATE TRIGGER IF NOT EXISTS articoli_fts_update
+    AFTER UPDATE OF titoloAtto, testo_pulito, hash_testo_pulito ON articoli BEGIN
+        INSERT INTO articoli_fts (articoli_fts, rowid, titoloAtto, testo_pulito)
+        VALUES ('delete', old.id, old.titoloAtto, {_ARTICLE_TEXT.format(row='old')});
+        INSERT INTO articoli_fts (rowid, titoloAtto, testo_pulito)
+        VALUES (new.id, new.titoloAtto, {_ARTICLE_TEXT.format(row='new')});
+    END;
+"""
+
+SQL_CREATE_COMMI_FTS = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS commi_fts USING fts5(
+        testo,
+        content='commi', content_rowid='id',
+        tokenize='{FTS_TOKENIZER}', prefix='{FTS_PREFIX_LENGTHS}'
+    )
+"""
+
+SQL_CREATE_COMMI_FTS_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS commi_fts_insert AFTER INSERT ON commi BEGIN
+        INSERT INTO commi_fts (rowid, testo) VALUES (new.id, new.testo);
+    END;
+    CREATE TRIGGER IF NOT EXISTS commi_fts_delete AFTER DELETE ON commi BEGIN
+        INSERT INTO commi_fts (commi_fts, rowid, testo) VALUES ('delete', old.id, old.testo);
+    END;
+    CREATE TRIGGER IF NOT EXISTS commi_fts_update AFTER UPDATE OF testo ON commi BEGIN
+        INSERT INTO commi_fts (commi_fts, rowid, testo) VALUES ('delete', old.id, old.testo);
+        INSERT INTO commi_fts (rowid, testo) VALUES (new.id, new.testo);
+    END;
+"""
+
+
+def _table_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+
+
+def ensure_search_index(conn):
+    """
+    Crea (se mancano) le tabelle FTS5 e i trigger; le tabelle nuove vengono popolate
+    dalle righe già presenti. Restituisce i nomi delle tabelle FTS ricostruite.
+    """
+    ensure_text_store(conn)  # I trigger degli articoli leggono hash_testo_pulito
+    tables = _table_names(conn)
+    rebuilt = []
+
+    if 'articoli_fts' not in tables:
+        conn.execute(SQL_CREATE_ARTICOLI_FTS)
+        conn.execute("INSERT INTO articoli_fts (articoli_fts) VALUES ('rebuild')")
+        rebuilt.append('articoli_fts')
+    conn.executescript(SQL_CREATE_ARTICOLI_FTS_TRIGGERS)
+
+    if 'commi' in tables:
+        if 'commi_fts' not in tables:
+            conn.execute(SQL_CREATE_COMMI_FTS)
+            conn.execute("INSERT INTO commi_fts (commi_fts) VALUES ('rebuild')")
+            rebuilt.append('commi_fts')
+        conn.executescript(SQL_CREATE_COMMI_FTS_TRIGGERS)
+
+    conn.commit()
+    return rebuilt
+
+
+def rebuild_search_index(conn):
+    """Ricostruisce gli indici dai testi (dopo modifiche fatte con i trigger assenti)"""
+    ensure_search_index(conn)
+    conn.execute("INSERT INTO articoli_fts (articoli_fts) VALUES ('rebuild')")
+    if 'commi_fts' in _table_names(conn):
+        conn.execute("INSERT INTO commi_fts (commi_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+# ========================================
+# QUERY
+# ========================================
+
+_QUERY_TERM = re.compile(r'\w+')
+
+
+def build_match_query(text, prefix=False):
+    """
+    Testo libero -> espressione MATCH FTS5: ogni parola tra virgolette (nessun operatore
+    o carattere speciale interpretato), tutte richieste. prefix=True: "termine"*.
+    """
+    suffix = '*' if prefix else ''
+    return ' '.join(f'"{term}"{suffix}' for term in _QUERY_TERM.findall(text))
+
+
+class SearchIndex:
+    """Ricerca BM25 su articoli e commi (connessione in sola lettura)"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.conn = connect_monitor(db_path)
+        capabilities = SchemaCapabilities.from_connection(self.conn)
+        self.has_commi = 'commi_fts' in capabilities.tables
+        # Chiavi di versione restituite solo se lo schema le ha
+        if capabilities.has_versioning:
+            self._version_columns = "a.tipo_versione, a.numero_aggiornamento, a.articolo_base_id"
+        else:
+            self._version_columns = "'orig', NULL, NULL"
+        self.has_versioning = capabilities.has_versioning
+
+    def _version_filter(self, tipo_versione, params):
+        if not tipo_versione or not self.has_versioning:
+            return ""
+        if isinstance(tipo_versione, str):
+            tipo_versione = [tipo_versione]
+        params.extend(tipo_versione)
+        return f" AND a.tipo_versione IN ({', '.join('?' * len(tipo_versione))})"
+
+    def search_articoli(self, query, limit=DEFAULT_SEARCH_LIMIT, tipo_versione=None, prefix=False, snippets=True):
+        """
+        Articoli che contengono tutte le parole di query, dal più rilevante (BM25).
+
+        Args:
+            query: testo libero
+            limit: risultati massimi
+            tipo_versione: filtro sulle versioni ('current', ['orig', 'agg.1'], ...)
+            prefix: parole come prefissi (varianti morfologiche)
+            snippets: estratto del testo con i termini tra [ ]
+
+        Returns:
+            list di dict con documento_id, urn, articolo_id, numero_articolo,
+            tipo_versione, numero_aggiornamento, articolo_base_id, score (più basso = migliore)
+        """
+        match = build_match_query(query, prefix)
+        if not match:
+            return []
+        params = [match]
+        version_filter = self._version_filter(tipo_versione, params)
+        params.append(limit)
+        snippet = (f"snippet(articoli_fts, 1, '[', ']', '...', {SNIPPET_TOKENS})" if snippets else "NULL")
+        rows = self.conn.execute(f"""
+            SELECT a.documento_id, d.urn, a.id, a.numero_articolo, {self._version_columns},
+                   bm25(articoli_fts, {BM25_TITLE_WEIGHT}, {BM25_TEXT_WEIGHT}) AS score, {snippet}
+            FROM articoli_fts
+            JOIN articoli a ON a.id = articoli_fts.rowid
+            LEFT JOIN documenti_normativi d ON d.id = a.documento_id
+            WHERE articoli_fts MATCH ?{version_filter}
+            ORDER BY score
+            LIMIT ?
+        """, params).fetchall()
+        return [{
+            'documento_id': row[0], 'urn': row[1], 'articolo_id': row[2], 'numero_articolo': row[3],
+            'tipo_versione': row[4], 'numero_aggiornamento': row[5], 'articolo_base_id': row[6],
+            'score': row[7], 'snippet': row[8],
+        } for row in rows]
+
+    def search_commi(self, query, limit=DEFAULT_SEARCH_LIMIT, tipo_versione=None, prefix=False, snippets=True):
+        """Come search_articoli sui commi; ogni risultato ha anche comma_id e numero_comma"""
+        if not self.has_commi:
+            return []
+        match = build_match_query(query, prefix)
+        if not match:
+            return []
+        params = [match]
+        version_filter = self._version_filter(tipo_versione, params)
+        params.append(limit)
+        snippet = (f"snippet(commi_fts, 0, '[', ']', '...', {SNIPPET_TOKENS})" if snippets else "NULL")
+        rows = self.conn.execute(f"""
+            SELECT a.documento_id, d.urn, a.id, a.numero_articolo, {self._version_columns},
+                   c.id, c.numero_comma, bm25(commi_fts) AS score, {snippet}
+            FROM commi_fts
+            JOIN commi c ON c.id = commi_fts.rowid
+            JOIN articoli a ON a.id = c.articolo_id
+            LEFT JOIN documenti_normativi d ON d.id = a.documento_id
+            WHERE commi_fts MATCH ?{version_filter}
+            ORDER BY score
+            LIMIT ?
+        """, params).fetchall()
+        return [{
+            'documento_id': row[0], 'urn': row[1], 'articolo_id': row[2], 'numero_articolo': row[3],
+            'tipo_versione': row[4], 'numero_aggiornamento': row[5], 'articolo_base_id': row[6],
+            'comma_id': row[7], 'numero_comma': row[8], 'score': row[9], 'snippet': row[10],
+        } for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--rebuild' in args:
+        conn = connect_database()
+        rebuild_search_index(conn)
+        conn.close()
+        print("✅ Search index rebuilt")
+        sys.exit(0)
+
+    limit = DEFAULT_SEARCH_LIMIT
+    if '--limit' in args:
+        limit = int(args[args.index('--limit') + 1])
+        del args[args.index('--limit'):args.index('--limit') + 2]
+    terms = [arg for arg in args if not arg.startswith('--')]
+    if not terms:
+        print(__doc__)
+        sys.exit(1)
+
+    index = SearchIndex()
+    search = index.search_commi if '--commi' in args else index.search_articoli
+    for result in search(' '.join(terms), limit=limit, prefix='--prefix' in args):
+        comma = f" comma {result['numero_comma']}" if 'numero_comma' in result else ""
+        print(f"{result['score']:8.3f}  {result['urn']} art. {result['numero_articolo']}{comma} "
+              f"({result['tipo_versione']})  {result['snippet']}")
+    index.close()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming, size-capped allegato download (scraper_optimized.download_allegato)
+and the per-document AllegatoRegistry. Runs offline against a local HTTP server.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_writer import WriteResult
+from http_client import create_session
+from scraper_optimized import (
+    download_allegato, fetch_allegato_text, AllegatoRegistry,
+    SKIP_CONTENT_LENGTH, SKIP_DOWNLOAD_CAP, SKIP_HTTP_ERROR
+)
+
+SMALL_PAGE = b'<html><body><div class="bodyTesto">Tabella   A allegata</div></body></html>'
+CHUNK = b'<p>' + b'x' * 1021 + b'</p>'
+
+
+class AllegatoHandler(BaseHTTPRequestHandler):
+    """/small, /declared (Content-Length enorme), /chunked (senza Content-Length), /missing"""
+    protocol_version = 'HTTP/1.1'
+    chunks_sent = 0
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == '/small':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(SMALL_PAGE)))
+            self.end_headers()
+            self.wfile.write(SMALL_PAGE)
+        elif self.path == '/declared':
+            self.send_response(200)
+            self.send_header('Content-Length', str(50 * 1024 ** 2))
+            self.end_headers()
+        elif self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for _ in range(2000):
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(CHUNK), CHUNK))
+                    AllegatoHandler.chunks_sent += 1
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AllegatoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_streaming_cap():
+    """Content-Length controllato prima del corpo; download interrotto al superamento del limite"""
+    print("🧪 Testing streaming allegato download...")
+    server, base_url = _start_server()
+    try:
+        with create_session(max_concurrency=2, rate=None) as session:
+            content, reason, size = download_allegato(f"{base_url}/small", session)
+            assert content == SMALL_PAGE and reason is None and size == len(SMALL_PAGE)
+
+            text, reason = fetch_allegato_text(f"{base_url}/small", session)
+            assert text == "Tabella A allegata" and reason is None
+
+            content, reason, size = download_allegato(f"{base_url}/declared", session, max_bytes=10000)
+            assert content is None and reason == SKIP_CONTENT_LENGTH and size == 50 * 1024 ** 2
+
+            content, reason, size = download_allegato(f"{base_url}/chunked", session, max_bytes=10000)
+            assert content is None and reason == SKIP_DOWNLOAD_CAP
+            # Interrotto poco dopo il limite, non dopo 2 MB
+            assert 10000 < size <= 10000 + 64 * 1024, size
+
+            text, reason = fetch_allegato_text(f"{base_url}/missing", session)
+            assert text == "" and reason == SKIP_HTTP_ERROR
+    finally:
+        server.shutdown()
+    print("✅ Streaming allegato download OK")
+
+
+def test_registry_fetches_once():
+    """Versioni parallele e riga Allegato-N condividono un solo download per URL"""
+    print("🧪 Testing per-document allegato registry...")
+    server, base_url = _start_server()
+    url = f"{base_url}/small"
+    AllegatoHandler.hits.clear()
+    try:
+        with create_session(max_concurrency=4, rate=None) as session:
+            registry = AllegatoRegistry(session)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                texts = list(executor.map(lambda _: registry.text(url), range(8)))
+            assert texts == [("Tabella A allegata", None)] * 8
+            assert registry.download(url)[0] == SMALL_PAGE
+            assert AllegatoHandler.hits == {'/small': 1}, AllegatoHandler.hits
+            assert registry.downloads == 1 and registry.reused == 8
+
+            # Riga Allegato-N salvata: gli articoli la riferiscono per id (anche con http/https diversi)
+            assert registry.row_id(url) is None
+            saved = Future()
+            saved.set_result(WriteResult([42]))
+            registry.register_row(url, saved)
+            assert registry.row_id(url.replace('http://', 'https://')) == 42
+    finally:
+        server.shutdown()
+    print("✅ Allegato registry OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing streaming allegato download...")
+    print("=" * 70)
+    test_streaming_cap()
+    test_registry_fetches_once()
+    print("=" * 70)
+    print("🎉 All allegato streaming tests passed!")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for extract_correlated_articles (set-based dedup, link target resolution)
+Runs offline on sample bodyTesto fragments.
+"""
+
+import os
+import sys
+import time
+
+import lxml.html
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scraper_optimized import extract_correlated_articles, resolve_link_target
+
+
+def test_references_and_targets():
+    """Riferimenti dal testo e dall'URL, duplicati scartati, destinazione risolta"""
+    print("🧪 Testing correlated article extraction...")
+    body = lxml.html.fromstring(
+        '<div class="bodyTesto">'
+        '<a href="/uri-res/N2Ls?urn:nir:stato:legge:1990-08-07;241~art5!vig=">art. 5, comma 2</a> '
+        '<a href="/uri-res/N2Ls?urn:nir:stato:legge:1990-08-07;241~art5!vig=">articolo 5</a> '
+        '<a href="/atto/caricaArticolo?art.idArticolo=12&amp;art.progressivo=0">legge n. 3</a> '
+        '<a href="#nota">nota</a> <a href="/atto/x">   </a>'
+        '</div>'
+    )
+    references = extract_correlated_articles(body)
+    assert [(ref['article_number'], ref['type']) for ref in references] == [
+        ('5', 'article_reference'), ('2', 'article_reference'), ('12', 'url_reference')
+    ]
+    assert references[0]['urn'] == "urn:nir:stato:legge:1990-08-07;241"
+    assert references[0]['target_article'] == '5'
+    assert references[2]['urn'] is None and references[2]['target_article'] == '12'
+
+    assert resolve_link_target("/uri-res/N2Ls?urn:nir:stato:decreto.legge:2008-06-25;112~art2bis") == {
+        'urn': "urn:nir:stato:decreto.legge:2008-06-25;112", 'target_article': '2bis'
+    }
+    print("✅ Correlated article extraction OK")
+
+
+def test_dense_article_is_linear():
+    """Migliaia di rinvii (decreti omnibus): niente confronto con tutta la lista per ogni link"""
+    print("🧪 Testing extraction on a dense article...")
+    links = ''.join(
+        f'<a href="/uri-res/N2Ls?urn:nir:stato:legge:2020;{i}~art{i}">art. {i}, comma {i % 7}</a> '
+        for i in range(7, 5007)
+    )
+    body = lxml.html.fromstring(f'<div class="bodyTesto">{links}</div>')
+    start = time.perf_counter()
+    references = extract_correlated_articles(body)
+    elapsed = time.perf_counter() - start
+    assert len(references) == 10000
+    assert elapsed < 2, elapsed
+    print(f"✅ 5000 links in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing correlated article extraction...")
+    print("=" * 70)
+    test_references_and_targets()
+    test_dense_article_is_linear()
+    print("=" * 70)
+    print("🎉 All correlated article tests passed!")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for the async crawl engine (crawl_engine.py)
+Runs offline with simulated discovery and processing functions.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from crawl_engine import run_year_async
+from existence_index import DOCUMENT_UNCHANGED
+
+
+def _process(permalinks_result, session=None):
+    return permalinks_result
+
+
+def test_transient_errors_are_not_404s():
+    """Errori di rete durante la scoperta: contati come falliti, non fermano l'anno"""
+    print("🧪 Testing transient discovery errors...")
+    processed = []
+
+    def discover(anno, numero, session):
+        if numero <= 12:
+            raise requests.exceptions.ConnectionError("simulated timeout")
+        if numero == 13:
+            return DOCUMENT_UNCHANGED
+        if numero in (14, 15):
+            return None
+        processed.append(numero)
+        return numero
+
+    stats = run_year_async(2024, 20, None, discover, _process, concurrency=2)
+    # 12 errori consecutivi (più di MAX_CONSECUTIVE_404S): l'anno prosegue comunque
+    assert stats == {'processed': 5, 'unchanged': 1, 'failed': 12, 'not_found': 2}, stats
+    assert sorted(processed) == [16, 17, 18, 19, 20]
+    print("✅ Transient discovery errors OK")
+
+
+def test_consecutive_404s_stop_the_year():
+    """Numeri mancanti consecutivi: l'anno si ferma come nel ciclo sequenziale"""
+    print("🧪 Testing consecutive 404 stop...")
+
+    def discover(anno, numero, session):
+        return numero if numero <= 3 else None
+
+    stats = run_year_async(2024, 100, None, discover, _process, concurrency=4)
+    assert stats == {'processed': 3, 'unchanged': 0, 'failed': 0, 'not_found': 10}, stats
+    print("✅ Consecutive 404 stop OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing async crawl engine...")
+    print("=" * 70)
+    test_transient_errors_are_not_404s()
+    test_consecutive_404s_stop_the_year()
+    print("=" * 70)
+    print("🎉 All crawl engine tests passed!")
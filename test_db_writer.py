@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Test script for the batched database writer thread (db_writer.py)
+Runs offline on a temporary copy of the optimized schema.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_writer import (
+    DatabaseWriter, DatabaseWriterThread, SchemaCapabilities,
+    DocumentRecord, ArticleRecord, ArticleUpdateRecord, CommitRecord, SkippedAllegatoRecord,
+    SQL_INSERT_ARTICOLO_BASIC, SQL_INSERT_ARTICOLO_VERSIONED
+)
+from compact_article_texts import compact_article_texts
+from testing_utils import create_test_database
+
+def _document_record(numero):
+    urn = f"urn:nir:2024;{numero}"
+    return DocumentRecord(urn, str(numero), 2024, 'Legge', [
+        str(numero), 2024, 'Legge', f"LEGGE n. {numero}", '2024-01-01',
+        'Altro', 'vigente', 2, None, urn, ''
+    ])
+
+
+def _article_row(documento_id, numero, tipo_versione='orig', numero_aggiornamento=None):
+    return [documento_id, numero, 'Titolo', 'Testo', 'Testo', '[]', '[]', None, None, '', 'vigente',
+            None, tipo_versione, numero_aggiornamento]
+
+
+def test_document_ids_and_version_linkage():
+    """L'id del documento arriva dal Future; le versioni puntano all'articolo base"""
+    print("🧪 Testing document futures and articolo_base_id linkage...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+
+        doc_id = writer.submit(_document_record(1)).result().ids[0]
+        again = writer.submit(_document_record(1)).result()
+        assert again.existing and again.ids == [doc_id]
+
+        rows = [_article_row(doc_id, '1'), _article_row(doc_id, '1', 'agg.1', 1), _article_row(doc_id, '1', 'agg.2', 2)]
+        result = writer.submit(ArticleRecord(doc_id, '1', rows)).result()
+        assert len(result.ids) == 3
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        links = conn.execute("SELECT id, articolo_base_id FROM articoli ORDER BY id").fetchall()
+        conn.close()
+        base_id = result.ids[0]
+        assert links == [(base_id, None), (result.ids[1], base_id), (result.ids[2], base_id)], links
+    print("✅ Futures and version linkage OK")
+
+
+def test_failed_article_rolls_back_only_itself():
+    """Un articolo che fallisce non annulla le righe già scritte nel batch"""
+    print("🧪 Testing per-article savepoint rollback...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+
+        doc_id = writer.submit(_document_record(2)).result().ids[0]
+        writer.submit(ArticleRecord(doc_id, '1', [_article_row(doc_id, '1')]))
+        broken = writer.submit(ArticleRecord(doc_id, '2', [_article_row(doc_id, '2'), ['too', 'short']]))
+        writer.submit(ArticleRecord(doc_id, '3', [_article_row(doc_id, '3')]))
+        writer.submit(CommitRecord())
+        assert broken.exception() is not None
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        articles = conn.execute("SELECT numero_articolo FROM articoli ORDER BY numero_articolo").fetchall()
+        conn.close()
+        assert articles == [('1',), ('3',)], articles
+    print("✅ Savepoint rollback OK")
+
+
+def test_schema_capabilities():
+    """Lo statement di inserimento segue le colonne presenti, senza PRAGMA per articolo"""
+    print("🧪 Testing schema capabilities...")
+    with tempfile.TemporaryDirectory() as tmp:
+        basic_path = os.path.join(tmp, 'basic.sqlite')
+        create_test_database(basic_path).close()
+        writer = DatabaseWriterThread(DatabaseWriter(basic_path))
+        assert not writer.capabilities.has_versioning
+        assert writer.capabilities.insert_articolo_sql == SQL_INSERT_ARTICOLO_BASIC
+
+        doc_id = writer.submit(_document_record(3)).result().ids[0]
+        # Schema senza versioning: righe da 11 colonne
+        result = writer.submit(ArticleRecord(doc_id, '1', [_article_row(doc_id, '1')[:11]])).result()
+        assert len(result.ids) == 1
+        writer.close()
+
+        versioned_path = os.path.join(tmp, 'versioned.sqlite')
+        create_test_database(versioned_path, versioning=True).close()
+        conn = sqlite3.connect(versioned_path)
+        capabilities = SchemaCapabilities.from_connection(conn)
+        conn.close()
+        assert capabilities.has_versioning and not capabilities.has_fonte_origine
+        assert capabilities.insert_articolo_sql == SQL_INSERT_ARTICOLO_VERSIONED
+    print(f"✅ Schema capabilities OK ({capabilities.describe()})")
+
+
+def test_skipped_allegati():
+    """Gli allegati scartati finiscono in allegati_scartati (ignorati se la tabella manca)"""
+    print("🧪 Testing skipped allegati records...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+        assert writer.capabilities.has_allegati_scartati
+        doc_id = writer.submit(_document_record(4)).result().ids[0]
+        writer.submit(SkippedAllegatoRecord([doc_id, '2', 'http://x/allegato2', 'download_cap', 150001])).result()
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT documento_id, numero_allegato, motivo, dimensione FROM allegati_scartati").fetchall()
+        conn.execute("DROP TABLE allegati_scartati")
+        conn.commit()
+        conn.close()
+        assert rows == [(doc_id, '2', 'download_cap', 150001)], rows
+
+        # Database precedente alla tabella: il record viene ignorato
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+        assert not writer.capabilities.has_allegati_scartati
+        writer.submit(SkippedAllegatoRecord([doc_id, '3', 'http://x/allegato3', 'text_length', 60000])).result()
+        writer.close()
+    print("✅ Skipped allegati records OK")
+
+
+def test_article_update_appends_versions():
+    """--update: versioni nuove sotto la base esistente, versione corrente riscritta"""
+    print("🧪 Testing article update records...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+        doc_id = writer.submit(_document_record(5)).result().ids[0]
+        rows = [_article_row(doc_id, '1'), _article_row(doc_id, '1', 'current')]
+        base_id, current_id = writer.submit(ArticleRecord(doc_id, '1', rows)).result().ids
+        writer.submit(ArticleRecord(doc_id, 'Allegato-A', [_article_row(doc_id, 'Allegato-A')])).result()
+
+        stored = writer.get_articolo_versions(doc_id)
+        assert stored['1'] == {'base_id': base_id, 'versions': {'orig': base_id, 'current': current_id}}, stored
+        assert set(stored) == {'1', 'Allegato-A'}
+
+        refreshed = _article_row(doc_id, '1', 'current')
+        refreshed[3] = 'Testo aggiornato'
+        result = writer.submit(ArticleUpdateRecord(
+            doc_id, '1', base_id, [_article_row(doc_id, '1', 'agg.1', 1)], [(current_id, refreshed)]
+        )).result()
+        assert len(result.ids) == 1 and not result.existing
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            "SELECT id, tipo_versione, articolo_base_id, testo_completo FROM articoli WHERE numero_articolo = '1' ORDER BY id"
+        ).fetchall()
+        conn.close()
+        assert rows == [
+            (base_id, 'orig', None, 'Testo'),
+            (current_id, 'current', base_id, 'Testo aggiornato'),
+            (result.ids[0], 'agg.1', base_id, 'Testo'),
+        ], rows
+    print("✅ Article update records OK")
+
+
+def test_text_store_shares_identical_versions():
+    """Versioni con lo stesso testo: una sola copia in testi_articoli, lettura dalla vista articoli_testo"""
+    print("🧪 Testing shared article text store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True, text_store=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+        assert writer.capabilities.has_text_store
+        assert writer.capabilities.article_text_source == 'articoli_testo'
+        doc_id = writer.submit(_document_record(6)).result().ids[0]
+
+        rows = [_article_row(doc_id, '1'), _article_row(doc_id, '1', 'agg.1', 1), _article_row(doc_id, '1', 'current')]
+        rows[2][3] = 'Testo modificato'
+        base_id, agg_id, current_id = writer.submit(ArticleRecord(doc_id, '1', rows)).result().ids
+
+        refreshed = _article_row(doc_id, '1', 'current')
+        refreshed[3] = refreshed[4] = 'Testo aggiornato'
+        new_id = writer.submit(ArticleUpdateRecord(
+            doc_id, '1', base_id, [_article_row(doc_id, '1', 'agg.2', 2)], [(current_id, refreshed)]
+        )).result().ids[0]
+        # 'Testo' (completo e pulito), 'Testo modificato', 'Testo aggiornato'
+        assert (writer.writer.texts_stored, writer.writer.texts_shared) == (3, 7)
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT COUNT(*) FROM testi_articoli").fetchone()[0]
+        inline = conn.execute("SELECT COUNT(*) FROM articoli WHERE testo_completo != '' OR testo_pulito != ''").fetchone()[0]
+        texts = conn.execute("SELECT id, testo_completo, testo_pulito FROM articoli_testo ORDER BY id").fetchall()
+        conn.close()
+        assert stored == 3 and inline == 0, (stored, inline)
+        assert texts == [
+            (base_id, 'Testo', 'Testo'),
+            (agg_id, 'Testo', 'Testo'),
+            (current_id, 'Testo aggiornato', 'Testo aggiornato'),
+            (new_id, 'Testo', 'Testo'),
+        ], texts
+    print("✅ Shared text store OK")
+
+
+def test_compact_existing_texts():
+    """Righe con testo in linea (database precedente): spostate nel deposito, stessa lettura dalla vista"""
+    print("🧪 Testing compaction of inline article texts...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+        assert not writer.capabilities.has_text_store
+        doc_id = writer.submit(_document_record(7)).result().ids[0]
+        rows = [_article_row(doc_id, '1'), _article_row(doc_id, '1', 'agg.1', 1)]
+        rows[1][4] = None
+        writer.submit(ArticleRecord(doc_id, '1', rows)).result()
+        writer.close()
+
+        stats = compact_article_texts(db_path)
+        assert stats == {'rows': 2, 'texts_stored': 1, 'texts_shared': 2}, stats
+        assert compact_article_texts(db_path)['rows'] == 0
+
+        conn = sqlite3.connect(db_path)
+        assert SchemaCapabilities.from_connection(conn).has_text_store
+        inline = conn.execute("SELECT testo_completo, testo_pulito FROM articoli ORDER BY id").fetchall()
+        texts = conn.execute("SELECT testo_completo, testo_pulito FROM articoli_testo ORDER BY id").fetchall()
+        conn.close()
+        assert inline == [('', ''), ('', None)], inline
+        assert texts == [('Testo', 'Testo'), ('Testo', None)], texts
+    print("✅ Text compaction OK")
+
+
+def test_bounded_queue_back_pressure():
+    """Con la coda piena submit() blocca il produttore"""
+    print("🧪 Testing bounded queue back-pressure...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        create_test_database(db_path, versioning=True).close()
+        writer = DatabaseWriterThread(DatabaseWriter(db_path), max_pending=2)
+
+        # Il thread writer resta bloccato sul lock della connessione: la coda si riempie
+        writer.writer.lock.acquire()
+        try:
+            for numero in range(3):
+                writer.submit(_document_record(10 + numero))
+            assert writer.queue.full()
+        finally:
+            writer.writer.lock.release()
+        writer.flush()
+        writer.close()
+
+        conn = sqlite3.connect(db_path)
+        count = conn.execute("SELECT COUNT(*) FROM documenti_normativi").fetchone()[0]
+        conn.close()
+        assert count == 3, count
+    print("✅ Back-pressure OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing database writer thread...")
+    print("=" * 70)
+    test_document_ids_and_version_linkage()
+    test_failed_article_rolls_back_only_itself()
+    test_schema_capabilities()
+    test_skipped_allegati()
+    test_article_update_appends_versions()
+    test_text_store_shares_identical_versions()
+    test_compact_existing_texts()
+    test_bounded_queue_back_pressure()
+    print("=" * 70)
+    print("🎉 All database writer tests passed!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-document context (scraper_optimized.DocumentContext)
+and the LRU fallback of get_document_title. Runs offline with a fake writer.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scraper_optimized
+from scraper_optimized import DocumentContext, get_document_title
+
+
+class CountingWriter:
+    """Writer finto: conta le letture del titolo"""
+
+    def __init__(self, titles):
+        self.titles = titles
+        self.queries = 0
+
+    def get_documento_title(self, documento_id):
+        self.queries += 1
+        return self.titles.get(documento_id)
+
+
+def test_context_title():
+    """Il titolo arriva dal contesto, senza leggere il database"""
+    print("🧪 Testing document context title...")
+    context = DocumentContext(7, "  LEGGE 1 gennaio 2024,\r\n n. 1  ", urn="urn:nir:stato:legge:2024-01-01;1", anno=2024)
+    assert context.titolo == "LEGGE 1 gennaio 2024, n. 1"
+    assert DocumentContext(8, "Breve").titolo is None
+
+    writer = CountingWriter({})
+    original = scraper_optimized.get_database_writer
+    scraper_optimized.get_database_writer = lambda: writer
+    try:
+        for _ in range(400):
+            assert get_document_title(7, context) == "LEGGE 1 gennaio 2024, n. 1"
+    finally:
+        scraper_optimized.get_database_writer = original
+    assert writer.queries == 0
+    print("✅ Document context title OK")
+
+
+def test_lru_fallback():
+    """Senza contesto il titolo viene letto una volta per documento e writer"""
+    print("🧪 Testing document title LRU fallback...")
+    writer = CountingWriter({1: "DECRETO LEGISLATIVO 10 marzo 2023, n. 24", 2: "DPR 1"})
+    original = scraper_optimized.get_database_writer
+    scraper_optimized.get_database_writer = lambda: writer
+    try:
+        for _ in range(50):
+            assert get_document_title(1) == "DECRETO LEGISLATIVO 10 marzo 2023, n. 24"
+            assert get_document_title(2) is None
+        # Contesto di un altro documento: si usa il database
+        assert get_document_title(1, DocumentContext(3, "Altro titolo di prova")) == "DECRETO LEGISLATIVO 10 marzo 2023, n. 24"
+        assert writer.queries == 2
+
+        # Nuovo writer (altro database): stessi id, nessun titolo riutilizzato
+        other = CountingWriter({1: "LEGGE 5 maggio 2020, n. 9"})
+        scraper_optimized.get_database_writer = lambda: other
+        assert get_document_title(1) == "LEGGE 5 maggio 2020, n. 9"
+    finally:
+        scraper_optimized.get_database_writer = original
+    print("✅ Document title LRU fallback OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing document context...")
+    print("=" * 70)
+    test_context_title()
+    test_lru_fallback()
+    print("=" * 70)
+    print("🎉 All document context tests passed!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for batched embedding generation in legal_ai_enhancer.py
+Runs offline: batch planning and chunked writes are checked with a stand-in
+embedding generator, the BERT forward pass is not executed.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import legal_ai_enhancer
+from legal_ai_enhancer import LegalAIEnhancer, iter_windows, plan_batches
+from embedding_store import unpack_embedding
+from testing_utils import create_test_database
+
+
+def test_plan_batches():
+    """Batch di testi con lunghezza simile, ogni indice esattamente una volta"""
+    print("🧪 Testing length-bucketed batch planning...")
+    lengths = [50, 3, 512, 7, 3, 300, 12, 9]
+    batches = plan_batches(lengths, batch_size=3)
+    assert batches == [[1, 4, 3], [7, 6, 0], [5, 2]], batches
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+
+    # Padding totale (token di riempimento) molto inferiore all'ordine di arrivo
+    def padding(plan):
+        return sum(max(lengths[i] for i in batch) * len(batch) - sum(lengths[i] for i in batch) for batch in plan)
+    arrival = [list(range(start, min(start + 3, len(lengths)))) for start in range(0, len(lengths), 3)]
+    assert padding(batches) < padding(arrival) / 2
+
+    assert plan_batches([], batch_size=4) == []
+    assert [len(window) for window in iter_windows(range(10), 4)] == [4, 4, 2]
+    assert list(iter_windows(iter(()), 4)) == []
+    print("✅ Batch planning OK")
+
+
+def test_embeddings_stream_to_database_in_chunks():
+    """Gli embedding vengono scritti (e committati) a blocchi mentre il generatore produce i successivi"""
+    print("🧪 Testing chunked embedding writes...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        conn = create_test_database(db_path)
+        conn.executemany(
+            "INSERT INTO commi (id, articolo_id, numero_comma, testo) VALUES (?, 1, ?, ?)",
+            [(i, i, f"comma {i}") for i in range(1, 11)]
+        )
+        conn.commit()
+
+        enhancer = LegalAIEnhancer(db_path)
+        visible_while_generating = []
+
+        def fake_batches(items, batch_size=legal_ai_enhancer.EMBEDDING_BATCH_SIZE):
+            # Sostituisce il modello: embedding = [id, lunghezza del testo], batch da 3
+            for window in iter_windows(items, 3):
+                visible_while_generating.append(
+                    conn.execute("SELECT COUNT(*) FROM commi WHERE embedding_comma IS NOT NULL").fetchone()[0]
+                )
+                yield [(row_id, [float(row_id), float(len(text))]) for row_id, text in window]
+
+        enhancer.generate_embeddings_batch = fake_batches
+        original_chunk = legal_ai_enhancer.EMBEDDING_WRITE_CHUNK
+        legal_ai_enhancer.EMBEDDING_WRITE_CHUNK = 4
+        try:
+            items = ((row_id, testo) for row_id, testo in conn.execute("SELECT id, testo FROM commi").fetchall())
+            stored = enhancer.store_embeddings(items, 'commi', 'embedding_comma')
+        finally:
+            legal_ai_enhancer.EMBEDDING_WRITE_CHUNK = original_chunk
+            enhancer.close()
+
+        # Blocchi da 4 righe: scritti dopo il secondo (6 righe) e il quarto batch (12 -> 10 righe)
+        assert sorted(stored) == list(range(1, 11))
+        assert visible_while_generating == [0, 0, 6, 6], visible_while_generating
+        rows = conn.execute("SELECT id, embedding_comma FROM commi ORDER BY id").fetchall()
+        conn.close()
+        assert [list(unpack_embedding(value)) for _, value in rows] == [
+            [float(row_id), float(len(f"comma {row_id}"))] for row_id, _ in rows
+        ]
+    print("✅ Chunked embedding writes OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing batched embedding generation...")
+    print("=" * 70)
+    test_plan_batches()
+    test_embeddings_stream_to_database_in_chunks()
+    print("=" * 70)
+    print("🎉 All embedding batch tests passed!")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for binary embedding storage and top-k search (embedding_store.py)
+Runs offline; the NumPy path (matmul + IVF) is exercised only when NumPy is installed.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import embedding_store
+from embedding_store import VectorIndex, convert_json_embeddings, pack_embedding, unpack_embedding
+from testing_utils import create_test_database
+
+DIMENSION = 768
+
+
+def _random_vectors(count, dimension, seed):
+    rng = random.Random(seed)
+    return [[rng.gauss(0.0, 1.0) for _ in range(dimension)] for _ in range(count)]
+
+
+def test_pack_round_trip():
+    """float32 esatto, int8 con errore entro mezzo passo di quantizzazione, JSON legacy leggibile"""
+    print("🧪 Testing embedding packing...")
+    vector = _random_vectors(1, DIMENSION, seed=1)[0]
+
+    packed = pack_embedding(vector)
+    assert len(packed) == 1 + 4 * DIMENSION
+    assert len(json.dumps(vector)) > 4 * len(packed)
+    assert unpack_embedding(packed) == array('f', vector)
+
+    quantized = pack_embedding(vector, quantize=True)
+    assert len(quantized) == 1 + 4 + DIMENSION
+    step = max(abs(value) for value in vector) / 127
+    assert max(abs(a - b) for a, b in zip(unpack_embedding(quantized), vector)) <= step / 2 + 1e-6
+
+    assert list(unpack_embedding(json.dumps([0.5, -1.0]))) == [0.5, -1.0]
+    assert unpack_embedding(None) is None
+    assert list(unpack_embedding(pack_embedding([0.0, 0.0], quantize=True))) == [0.0, 0.0]
+    print("✅ Embedding packing OK")
+
+
+def test_convert_and_search_database():
+    """Embedding JSON convertiti in BLOB; il vicino più simile di una riga è la riga stessa"""
+    print("🧪 Testing JSON conversion and top-k search from the database...")
+    vectors = _random_vectors(40, 32, seed=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        conn = create_test_database(db_path)
+        conn.executemany(
+            "INSERT INTO articoli (id, documento_id, numero_articolo, testo_completo, embedding_articolo) VALUES (?, 1, ?, '', ?)",
+            [(i + 1, str(i + 1), json.dumps(vector)) for i, vector in enumerate(vectors)]
+        )
+        conn.execute("INSERT INTO articoli (id, documento_id, numero_articolo, testo_completo) VALUES (100, 1, '100', '')")
+        conn.commit()
+
+        assert convert_json_embeddings(conn) == {'articoli': 40, 'commi': 0, 'documenti': 0}
+        assert convert_json_embeddings(conn)['articoli'] == 0
+        types = {row[0] for row in conn.execute("SELECT typeof(embedding_articolo) FROM articoli")}
+        assert types == {'blob', 'null'}, types
+
+        index = VectorIndex.from_database(conn, 'articoli')
+        assert len(index) == 40
+        query = conn.execute("SELECT embedding_articolo FROM articoli WHERE id = 7").fetchone()[0]
+        results = index.search(query, k=5)
+        conn.close()
+
+    assert results[0][0] == 7 and abs(results[0][1] - 1.0) < 1e-5, results
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True) and len(results) == 5
+    print("✅ JSON conversion and top-k search OK")
+
+
+def test_exact_top_k_matches_brute_force():
+    """Ricerca esaustiva identica al calcolo diretto della similarità coseno"""
+    print("🧪 Testing exact top-k against a reference computation...")
+    vectors = _random_vectors(200, 16, seed=3)
+    query = _random_vectors(1, 16, seed=4)[0]
+
+    def cosine(a, b):
+        return sum(x * y for x, y in zip(a, b)) / (sum(x * x for x in a) ** 0.5 * sum(y * y for y in b) ** 0.5)
+
+    expected = sorted(range(200), key=lambda i: -cosine(query, vectors[i]))[:10]
+    results = VectorIndex(range(200), vectors, ivf_lists=0).search(query, k=10)
+    assert [row_id for row_id, _ in results] == expected, results
+    assert VectorIndex([], []).search(query) == []
+    print("✅ Exact top-k OK")
+
+
+def test_ivf_recall():
+    """IVF: con nprobe ragionevole ritrova quasi tutti i vicini esatti (solo con NumPy)"""
+    if not embedding_store.NUMPY_AVAILABLE:
+        print("⚠️ NumPy not installed: IVF test skipped")
+        return
+    print("🧪 Testing IVF recall...")
+    import numpy as np
+    rng = np.random.default_rng(5)
+    # Dati a gruppi, come embedding di testi su temi diversi
+    centers = rng.normal(size=(50, 64))
+    vectors = centers[rng.integers(0, 50, size=20000)] + 0.3 * rng.normal(size=(20000, 64))
+    exact = VectorIndex(range(20000), vectors, ivf_lists=0)
+    ivf = VectorIndex(range(20000), vectors, ivf_lists=100)
+    assert ivf.centroids is not None and sum(len(members) for members in ivf.lists) == 20000
+
+    hits = 0
+    for query in vectors[:50]:
+        expected = {row_id for row_id, _ in exact.search(query, k=10)}
+        hits += len(expected & {row_id for row_id, _ in ivf.search(query, k=10, nprobe=10)})
+    recall = hits / 500
+    assert recall >= 0.9, recall
+    print(f"   recall@10 with nprobe=10/100: {recall:.2f}")
+    print("✅ IVF recall OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing binary embedding storage...")
+    print("=" * 70)
+    test_pack_round_trip()
+    test_convert_and_search_database()
+    test_exact_top_k_matches_brute_force()
+    test_ivf_recall()
+    print("=" * 70)
+    print("🎉 All embedding store tests passed!")
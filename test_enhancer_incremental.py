@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental, resumable LegalAIEnhancer.enhance_database
+Runs offline on a temporary copy of the optimized schema (no embedding model needed).
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import legal_ai_enhancer
+from legal_ai_enhancer import LegalAIEnhancer
+from testing_utils import create_test_database
+
+ARTICLE_TEXT = ("1. Il contratto di lavoro è regolato dalla presente legge e dai contratti collettivi.\n"
+                "2. Il datore di lavoro che viola l'articolo 3 del decreto è punito con sanzione amministrativa.")
+
+
+def _create_database(path, articles=3):
+    conn = create_test_database(path)
+    conn.execute("INSERT INTO documenti_normativi (numero, anno, tipo_atto, titoloAtto, data_pubblicazione, testo_completo) "
+                 "VALUES ('1', 2024, 'Legge', 'LEGGE n. 1', '2024-01-01', 'Disciplina del contratto di lavoro')")
+    conn.executemany("INSERT INTO articoli (documento_id, numero_articolo, testo_completo) VALUES (1, ?, ?)",
+                     [(str(numero), ARTICLE_TEXT) for numero in range(1, articles + 1)])
+    conn.commit()
+    conn.close()
+
+
+def _counts(db_path):
+    conn = sqlite3.connect(db_path)
+    counts = tuple(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                   for table in ('commi', 'citazioni_normative', 'documento_categorie', 'stato_arricchimento'))
+    conn.close()
+    return counts
+
+
+def test_second_run_skips_unchanged_rows():
+    """Seconda esecuzione senza modifiche: niente rielaborato, niente duplicato"""
+    print("🧪 Testing incremental enhancement...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        _create_database(db_path)
+
+        enhancer = LegalAIEnhancer(db_path)
+        first = enhancer.enhance_database()
+        after_first = _counts(db_path)
+        second = enhancer.enhance_database()
+        assert _counts(db_path) == after_first, (after_first, _counts(db_path))
+        assert first['articles_classified'] == 3 and first['commi_extracted'] == 6
+        assert second['articles_classified'] == 0 and second['articles_unchanged'] == 3
+        assert second['documents_categorized'] == 0 and second['documents_unchanged'] == 1
+
+        # Testo modificato (es. versione 'current' riscritta da --update): solo quell'articolo
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE articoli SET testo_completo = ? WHERE numero_articolo = '2'",
+                     ["1. Il termine per il ricorso è di sessanta giorni dalla notifica dell'atto."])
+        conn.commit()
+        conn.close()
+        third = enhancer.enhance_database()
+        assert third['articles_classified'] == 1 and third['articles_unchanged'] == 2
+        commi, citations, categories, state = _counts(db_path)
+        assert commi == after_first[0] - 1, commi  # 2 commi sostituiti da 1
+        assert categories == after_first[2] and state == after_first[3]
+
+        # Rielaborazione completa: stessi conteggi (sostituzione, non inserimento)
+        enhancer.enhance_database(full=True)
+        assert _counts(db_path) == (commi, citations, categories, state)
+        enhancer.close()
+    print("✅ Incremental enhancement OK")
+
+
+def test_interrupted_run_resumes_after_checkpoint():
+    """Interruzione a metà: i blocchi già committati non vengono rielaborati"""
+    print("🧪 Testing resume after an interrupted run...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        _create_database(db_path, articles=5)
+
+        original_checkpoint = legal_ai_enhancer.ENHANCE_CHECKPOINT_SIZE
+        legal_ai_enhancer.ENHANCE_CHECKPOINT_SIZE = 2
+        enhancer = LegalAIEnhancer(db_path)
+        original_extract = enhancer.extract_citations
+        calls = []
+
+        def failing_extract(text):
+            calls.append(text)
+            if len(calls) == 3:
+                raise RuntimeError("simulated crash")
+            return original_extract(text)
+
+        try:
+            enhancer.extract_citations = failing_extract
+            try:
+                enhancer.enhance_database()
+                assert False, "the simulated crash should propagate"
+            except RuntimeError:
+                pass
+            enhancer.close()
+
+            # Il primo blocco (2 articoli) è committato; il secondo è stato annullato
+            commi, citations, _, state = _counts(db_path)
+            assert state == 2 and commi == 4, (state, commi)
+
+            enhancer = LegalAIEnhancer(db_path)
+            resumed = enhancer.enhance_database()
+            enhancer.close()
+        finally:
+            legal_ai_enhancer.ENHANCE_CHECKPOINT_SIZE = original_checkpoint
+
+        assert resumed['articles_classified'] == 3 and resumed['articles_unchanged'] == 2, resumed
+        commi, citations, categories, state = _counts(db_path)
+        assert (commi, state) == (10, 6), (commi, state)
+        conn = sqlite3.connect(db_path)
+        per_article = conn.execute("SELECT COUNT(DISTINCT articolo_citante_id), COUNT(*) FROM citazioni_normative").fetchone()
+        conn.close()
+        assert per_article[0] == 5 and per_article[1] == 5 * (citations // 5), per_article
+    print("✅ Resume after interruption OK")
+
+
+def test_failed_embedding_batch_is_retried():
+    """Batch di embedding fallito: le sue righe non vengono registrate e la prossima esecuzione le riprova"""
+    print("🧪 Testing retry of failed embedding batches...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        _create_database(db_path, articles=4)
+        failing_text = "1. Il termine per il ricorso è di sessanta giorni dalla notifica dell'atto."
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE articoli SET testo_completo = ? WHERE id = 2", [failing_text])
+        conn.commit()
+        conn.close()
+        failing = {failing_text}
+
+        def fake_batches(items, batch_size=legal_ai_enhancer.EMBEDDING_BATCH_SIZE):
+            # Sostituisce il modello: il batch con il testo in failing fallisce (saltato dopo il log d'errore)
+            for row_id, text in items:
+                if text not in failing:
+                    yield [(row_id, [1.0, float(len(text))])]
+
+        enhancer = LegalAIEnhancer(db_path)
+        enhancer.embedding_model_available = True
+        enhancer.enhancer_version = f"{legal_ai_enhancer.ENHANCER_VERSION}/fake-model"
+        enhancer.generate_embeddings_batch = fake_batches
+        first = enhancer.enhance_database()
+        assert first['embeddings_generated'] == 3, first
+
+        conn = sqlite3.connect(db_path)
+        marked = {row[0] for row in conn.execute("SELECT riga_id FROM stato_arricchimento WHERE tabella = 'articoli'")}
+        conn.close()
+        assert marked == {1, 3, 4}, marked
+
+        failing.clear()
+        second = enhancer.enhance_database()
+        enhancer.close()
+        assert second['articles_classified'] == 1 and second['embeddings_generated'] == 1, second
+        conn = sqlite3.connect(db_path)
+        missing = conn.execute("SELECT COUNT(*) FROM articoli WHERE embedding_articolo IS NULL").fetchone()[0]
+        conn.close()
+        assert missing == 0
+    print("✅ Failed embedding batches retried OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing incremental legal AI enhancement...")
+    print("=" * 70)
+    test_second_run_skips_unchanged_rows()
+    test_interrupted_run_resumes_after_checkpoint()
+    test_failed_embedding_batch_is_retried()
+    print("=" * 70)
+    print("🎉 All incremental enhancement tests passed!")
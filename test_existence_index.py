@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent document-existence index (existence_index.py)
+Runs the scraper twice against the offline replay server: the second run
+must not touch numbers already known to be missing or already saved.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scraper_optimized
+from db_writer import close_database_writer
+from existence_index import ExistenceIndex, STATUS_FOUND, STATUS_MISSING
+from format_selector import UrnFormatSelector
+from http_client import create_session
+from replay_server import ReplayServer
+from test_replay_server import _record_archive
+from testing_utils import SCHEMA_PATH
+
+
+def test_index_records_and_expires():
+    """Le voci scadono dopo il TTL del loro stato"""
+    print("🧪 Testing index entries and TTL...")
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ExistenceIndex(os.path.join(tmp, 'index.sqlite'), found_ttl=3600, missing_ttl=0)
+        index.record_found(2024, 1, 'standard', '/uri-res/N2Ls?urn:nir:2024;1!multivigente~', 'urn:nir:2024;1', 'abc')
+        index.record_missing(2024, 2)
+
+        found = index.lookup(2024, 1)
+        assert found['status'] == STATUS_FOUND and found['fresh'] and found['formato'] == 'standard'
+        missing = index.lookup(2024, 2)
+        assert missing['status'] == STATUS_MISSING and not missing['fresh']
+        assert index.lookup(2024, 3) is None
+        index.close()
+    print("✅ Index entries OK")
+
+
+def test_second_run_skips_known_numbers():
+    """Seconda esecuzione: nessuna richiesta per i numeri mancanti né per i documenti già salvati"""
+    print("🧪 Testing incremental run with the existence index...")
+    original_cwd = os.getcwd()
+    original_url = scraper_optimized.normattiva_url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, 'crawl.sqlite')
+        _record_archive(archive_path)
+        shutil.copy(SCHEMA_PATH, tmp)
+        os.chdir(tmp)
+
+        server = ReplayServer(archive_path, port=0)
+        scraper_optimized.normattiva_url = server.start_in_background()
+        scraper_optimized.existence_index = ExistenceIndex('existence_index.sqlite')
+        try:
+            scraper_optimized.init_optimized_database()
+            with create_session(max_concurrency=2) as session:
+                first = scraper_optimized.process_year_sequential(2024, 3, session)
+                requests_after_first = server.hits + server.misses
+                second = scraper_optimized.process_year_sequential(2024, 3, session)
+            assert first == 1, first
+            assert second == 0, second
+            assert server.hits + server.misses == requests_after_first, "second run hit the network"
+            stats = scraper_optimized.existence_index.stats()
+            assert stats['skipped_unchanged'] == 1 and stats['skipped_missing'] == 2, stats
+        finally:
+            server.stop()
+            scraper_optimized.existence_index.close()
+            scraper_optimized.existence_index = None
+            scraper_optimized.normattiva_url = original_url
+            close_database_writer()
+            os.chdir(original_cwd)
+    print("✅ Incremental run OK")
+
+
+class _UnavailableSession:
+    """Sessione che risponde 503 a ogni richiesta (retry esauriti)"""
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        response = requests.Response()
+        response.status_code = 503
+        response.url = url
+        response._content = b'Service Unavailable'
+        return response
+
+
+def test_transient_error_is_not_recorded_missing():
+    """503 durante il probing dei formati pre-1900: nessuna voce "mancante" nell'indice"""
+    print("🧪 Testing transient errors with the existence index...")
+    original_selector = scraper_optimized.format_selector
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper_optimized.existence_index = ExistenceIndex(os.path.join(tmp, 'index.sqlite'))
+        scraper_optimized.format_selector = UrnFormatSelector()
+        session = _UnavailableSession()
+        try:
+            try:
+                scraper_optimized.discover_document(1870, 5, session)
+                assert False, "the 503 should propagate"
+            except requests.exceptions.HTTPError:
+                pass
+            assert len(session.urls) == len(scraper_optimized.candidate_document_urls(1870, 5))
+            assert scraper_optimized.existence_index.lookup(1870, 5) is None
+            # Nessun formato penalizzato dall'errore
+            assert scraper_optimized.format_selector.counts == {}
+        finally:
+            scraper_optimized.existence_index.close()
+            scraper_optimized.existence_index = None
+            scraper_optimized.format_selector = original_selector
+    print("✅ Transient errors OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing document-existence index...")
+    print("=" * 70)
+    test_index_records_and_expires()
+    test_second_run_skips_known_numbers()
+    test_transient_error_is_not_recorded_missing()
+    print("=" * 70)
+    print("🎉 All existence index tests passed!")
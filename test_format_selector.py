@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the adaptive pre-1900 URN format selector (format_selector.py)
+Runs offline with a simulated set of documents and formats.
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from format_selector import UrnFormatSelector
+
+FORMATS = ['regio.decreto', 'legge_with_date', 'legge_simple', 'ministero_decree', 'standard']
+
+
+def _candidates(year, numero):
+    return [(name, f"{name}:{year};{numero}") for name in FORMATS]
+
+
+def _simulated_site(winner_for):
+    """Funzione di download: esiste solo l'URL del formato winner_for(numero)"""
+    calls = []
+    lock = threading.Lock()
+
+    def fetch(url):
+        with lock:
+            calls.append(url)
+        name, _, ref = url.partition(':')
+        numero = int(ref.split(';')[1])
+        return f"page {url}" if name == winner_for(numero) else None
+
+    return fetch, calls
+
+
+def test_learns_winning_format():
+    """Dopo pochi documenti il formato vincente dell'anno viene provato per primo"""
+    print("🧪 Testing format learning...")
+    selector = UrnFormatSelector()
+    fetch, calls = _simulated_site(lambda numero: 'legge_simple')
+
+    for numero in range(1, 51):
+        formato, url, result = selector.probe(1870, numero, _candidates(1870, numero), fetch)
+        assert formato == 'legge_simple' and result == f"page {url}"
+
+    stats = selector.stats()
+    assert stats['located'] == 50 and stats['requests'] == len(calls)
+    # Fisso: 3 richieste per documento (150); appreso: solo il primo documento paga l'ordine di default
+    assert len(calls) == 3 + 49, len(calls)
+    assert stats['first_try'] == 49
+    print(f"   {len(calls)} requests for 50 documents (fixed order: 150)")
+    print("✅ Format learning OK")
+
+
+def test_number_ranges_and_seed():
+    """Fasce di numeri con formati diversi nello stesso anno; seed dall'indice"""
+    print("🧪 Testing per-range learning and seeding...")
+    winner_for = lambda numero: 'regio.decreto' if numero < 500 else 'ministero_decree'
+    selector = UrnFormatSelector(range_size=500)
+    seeded = selector.seed([(1880, n, winner_for(n)) for n in (10, 20, 600, 700)] + [(1880, 30, None)])
+    assert seeded == 4
+
+    assert selector.order(1880, 100, _candidates(1880, 100))[0][0] == 'regio.decreto'
+    assert selector.order(1880, 800, _candidates(1880, 800))[0][0] == 'ministero_decree'
+
+    fetch, calls = _simulated_site(winner_for)
+    assert selector.probe(1880, 900, _candidates(1880, 900), fetch)[0] == 'ministero_decree'
+    assert len(calls) == 1
+    print("✅ Per-range learning and seeding OK")
+
+
+def test_concurrent_probe_and_missing():
+    """In parallelo vince il primo formato nell'ordine appreso; None se nessuno funziona"""
+    print("🧪 Testing concurrent probing...")
+    selector = UrnFormatSelector(concurrent=True)
+    fetch, calls = _simulated_site(lambda numero: 'standard' if numero != 3 else None)
+
+    formato, url, _ = selector.probe(1890, 1, _candidates(1890, 1), fetch)
+    assert formato == 'standard' and url == 'standard:1890;1'
+    assert len(calls) == len(FORMATS)
+
+    assert selector.probe(1890, 3, _candidates(1890, 3), fetch) is None
+    # Il numero mancante non cambia il formato preferito
+    assert selector.order(1890, 4, _candidates(1890, 4))[0][0] == 'standard'
+    print("✅ Concurrent probing OK")
+
+
+def test_fetch_errors_propagate():
+    """Errore di rete su un formato: propagato se nessun formato funziona, mai registrato come fallimento"""
+    print("🧪 Testing fetch errors...")
+    for concurrent in (False, True):
+        selector = UrnFormatSelector(concurrent=concurrent)
+        site, _ = _simulated_site(lambda numero: 'legge_simple' if numero == 1 else None)
+
+        def fetch(url):
+            if url.startswith('regio.decreto'):
+                raise ConnectionError("simulated 503")
+            return site(url)
+
+        # Un altro formato risponde: il documento viene trovato comunque
+        assert selector.probe(1870, 1, _candidates(1870, 1), fetch)[0] == 'legge_simple'
+        try:
+            selector.probe(1870, 2, _candidates(1870, 2), fetch)
+            assert False, "the error should propagate instead of returning None"
+        except ConnectionError:
+            pass
+        assert 'regio.decreto' not in selector.counts[('all',)]
+    print("✅ Fetch errors OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing adaptive URN format selector...")
+    print("=" * 70)
+    test_learns_winning_format()
+    test_number_ranges_and_seed()
+    test_concurrent_probe_and_missing()
+    test_fetch_errors_propagate()
+    print("=" * 70)
+    print("🎉 All format selector tests passed!")
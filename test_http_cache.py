@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent HTTP response cache (http_cache.py)
+Runs offline against a small local HTTP server.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_cache import ResponseCache, normalize_url
+from http_client import create_session
+
+PAGE = "<html><body><div class='bodyTesto'>Art. 1 - Testo di prova</div></body></html>".encode('utf-8')
+ETAG = '"v1"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Server minimale che supporta ETag / If-None-Match"""
+    requests_seen = []
+
+    def do_GET(self):
+        _Handler.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_normalize_url():
+    """http:// e https:// dello stesso documento condividono la chiave"""
+    print("🧪 Testing URL normalization...")
+    a = normalize_url("http://www.normattiva.it/uri-res/N2Ls?urn:nir:2024;1!multivigente~")
+    b = normalize_url("https://WWW.normattiva.it:443/uri-res/N2Ls?urn:nir:2024;1!multivigente~#top")
+    assert a == b, (a, b)
+    print(f"✅ {a}")
+
+
+def test_store_and_dedup():
+    """Corpi identici vengono salvati una sola volta"""
+    print("🧪 Testing store/lookup and content-addressed bodies...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'))
+        cache.store("http://www.normattiva.it/a", 200, {'Content-Type': 'text/html'}, PAGE)
+        cache.store("http://www.normattiva.it/b", 200, {'Content-Type': 'text/html'}, PAGE)
+
+        entry = cache.lookup("https://www.normattiva.it/a")
+        assert entry is not None and entry['body'] == PAGE
+        bodies = cache.conn.execute("SELECT COUNT(*) FROM cache_bodies").fetchone()[0]
+        assert bodies == 1, bodies
+        cache.close()
+    print("✅ Store/lookup and dedup OK")
+
+
+def test_session_cache_and_revalidation():
+    """Seconda GET servita dal disco; voce scaduta rivalidata con If-None-Match"""
+    print("🧪 Testing cached session and conditional revalidation...")
+    server = _start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/uri-res/N2Ls?urn:nir:2024;1"
+    _Handler.requests_seen = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'), ttl=3600)
+        with create_session(max_concurrency=2, cache=cache) as session:
+            first = session.get(url)
+            second = session.get(url)
+            assert first.content == PAGE and second.content == PAGE
+            assert second.from_cache is True
+            assert len(_Handler.requests_seen) == 1, _Handler.requests_seen
+
+            # TTL scaduto: richiesta condizionale, il server risponde 304
+            cache.ttl = 0
+            third = session.get(url)
+            assert third.status_code == 200 and third.content == PAGE
+            assert _Handler.requests_seen[-1][1] == ETAG, _Handler.requests_seen
+            assert cache.stats()['revalidated'] == 1
+        cache.close()
+
+    server.shutdown()
+    print("✅ Cache hit and 304 revalidation OK")
+
+
+def test_size_eviction():
+    """Le voci meno usate vengono rimosse oltre max_size"""
+    print("🧪 Testing size-based eviction...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'), max_size=None)
+        for i in range(20):
+            cache.store(f"http://www.normattiva.it/doc{i}", 200, {}, os.urandom(2000))
+        cache.max_size = cache.total_size() // 2
+        cache.evict()
+        assert cache.total_size() <= cache.max_size
+        # Le prime voci (meno recenti) sono state rimosse, le ultime restano
+        assert cache.lookup("http://www.normattiva.it/doc0") is None
+        assert cache.lookup("http://www.normattiva.it/doc19") is not None
+        cache.close()
+    print("✅ Eviction OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing persistent HTTP response cache...")
+    print("=" * 70)
+    test_normalize_url()
+    test_store_and_dedup()
+    test_session_cache_and_revalidation()
+    test_size_eviction()
+    print("=" * 70)
+    print("🎉 All HTTP cache tests passed!")
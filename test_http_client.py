@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared HTTP client (http_client.py)
+Runs offline against a local HTTP server that fails on purpose.
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import http_client
+from http_client import AdaptiveLimiter, create_session
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """/fail/N: le prime N richieste rispondono 503; /busy: sempre 429 con Retry-After"""
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[self.path] = self.hits.get(self.path, 0) + 1
+            count = self.hits[self.path]
+
+        if self.path.startswith('/fail/') and count <= int(self.path.rsplit('/', 1)[1]):
+            self.send_response(503)
+        elif self.path == '/busy':
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+        else:
+            self.send_response(200)
+        body = f"attempt {count}".encode()
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_retries_transient_errors():
+    """I 503 vengono ritentati con backoff; dopo MAX_RETRIES la risposta arriva al chiamante"""
+    print("🧪 Testing retry with backoff...")
+    original_base = http_client.BACKOFF_BASE
+    http_client.BACKOFF_BASE = 0.01
+    server, base_url = _start_server()
+    try:
+        with create_session(max_concurrency=2, rate=None) as session:
+            response = session.get(f"{base_url}/fail/2")
+            assert response.status_code == 200 and response.text == "attempt 3"
+            assert session.retries == 2 and session.gave_up == 0
+
+            response = session.get(f"{base_url}/busy")
+            assert response.status_code == 429
+            assert session.gave_up == 1
+            assert FlakyHandler.hits['/busy'] == session.max_retries + 1
+            # 429 e 503 hanno ridotto la finestra di concorrenza
+            assert session.stats()['decreases'] >= 1
+    finally:
+        http_client.BACKOFF_BASE = original_base
+        server.shutdown()
+    print("✅ Retry with backoff OK")
+
+
+def test_deadline_stops_retries():
+    """La deadline della richiesta interrompe i retry anche prima di MAX_RETRIES"""
+    print("🧪 Testing per-request deadline...")
+    server, base_url = _start_server()
+    try:
+        with create_session(max_concurrency=1, rate=None) as session:
+            started = time.monotonic()
+            response = session.get(f"{base_url}/fail/100", deadline=0.5)
+            assert response.status_code == 503
+            assert time.monotonic() - started < 2
+            assert session.gave_up == 1
+    finally:
+        server.shutdown()
+    print("✅ Per-request deadline OK")
+
+
+def test_aimd_limiter():
+    """Dimezzamento su congestione, aumento additivo sulle risposte veloci, token bucket"""
+    print("🧪 Testing AIMD limiter...")
+    limiter = AdaptiveLimiter(max_concurrency=8, rate=20.0)
+
+    limiter.acquire()
+    limiter.release(0.1, 503)
+    assert limiter.limit == 4.0 and limiter.rate == 10.0
+
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1, 200)
+    assert 4.0 < limiter.limit <= 8.0 and 10.0 < limiter.rate <= 20.0
+
+    # Token bucket: oltre il burst le richieste vengono distanziate
+    limiter = AdaptiveLimiter(max_concurrency=2, rate=20.0)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+        limiter.release()
+    elapsed = time.monotonic() - started
+    assert elapsed >= 0.15, elapsed
+    print(f"✅ AIMD limiter OK (6 requests at 20 req/s, burst 2: {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing shared HTTP client...")
+    print("=" * 70)
+    test_retries_transient_errors()
+    test_deadline_stops_retries()
+    test_aimd_limiter()
+    print("=" * 70)
+    print("🎉 All HTTP client tests passed!")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for the process-pool parsing stage (parse_pool.py + scraper_optimized.parse_article_page)
+Runs offline on a sample article page.
+"""
+
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parse_pool import ParsePool
+from scraper_optimized import parse_article_page, parse_allegato_page
+
+ARTICLE_URL = "http://www.normattiva.it/atto/caricaArticolo?art.progressivo=0&art.idArticolo=1"
+ARTICLE_PAGE = (
+    '<html><body><div id="titoloAtto">LEGGE 1 gennaio 2024, n. 1 - Disposizioni di prova</div>'
+    '<span id="artInizio" class="rosso">01-02-2024</span>'
+    '<div class="bodyTesto">1. Il   presente articolo rinvia all\'<a href="/uri-res/N2Ls?urn:nir:stato:legge:2020;5~art3">art. 3</a>'
+    ' e all\'<a href="/atto/allegato1">Allegato 1</a>.</div></body></html>'
+).encode()
+
+
+def test_worker_records_match_inline():
+    """Il record prodotto da un processo worker è identico a quello del parsing nel thread"""
+    print("🧪 Testing parse records from worker processes...")
+    inline = parse_article_page(ARTICLE_PAGE, ARTICLE_URL, '1', None)
+
+    pool = ParsePool(workers=2)
+    try:
+        pooled = pool.run(parse_article_page, ARTICLE_PAGE, ARTICLE_URL, '1', None)
+        allegato = pool.run(parse_allegato_page, ARTICLE_PAGE)
+    finally:
+        pool.shutdown()
+
+    assert pooled == inline
+    assert pool.submitted == 2 and pool.inline == 0
+    assert pooled['titoloAtto'] == "LEGGE 1 gennaio 2024, n. 1 - Disposizioni di prova"
+    assert pooled['data_attivazione'] == date(2024, 2, 1)
+    assert pooled['testo_pulito'].startswith("1. Il presente articolo")
+    assert [link['url'] for link in pooled['allegati']] == ["http://www.normattiva.it/atto/allegato1"]
+    assert allegato['testo_completo'] == inline['testo_completo']
+
+    # Titolo del documento passato dal chiamante: nessun accesso al database nel worker
+    titled = parse_article_page(ARTICLE_PAGE, ARTICLE_URL, '1', "DECRETO LEGISLATIVO di prova")
+    assert titled['titoloAtto'] == "DECRETO LEGISLATIVO di prova"
+    print("✅ Worker parse records OK")
+
+
+def test_inline_mode():
+    """workers=0: nessun processo, parsing nel thread chiamante"""
+    print("🧪 Testing inline parse mode...")
+    pool = ParsePool(workers=0)
+    assert pool.run(parse_allegato_page, ARTICLE_PAGE)['data_attivazione'] == date(2024, 2, 1)
+    assert pool.submitted == 0 and pool.inline == 1
+    pool.shutdown()
+    print("✅ Inline parse mode OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing process-pool parsing stage...")
+    print("=" * 70)
+    test_worker_records_match_inline()
+    test_inline_mode()
+    print("=" * 70)
+    print("🎉 All parse pool tests passed!")
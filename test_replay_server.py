@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for the offline replay mode (replay_server.py)
+Builds a tiny recorded archive, serves it locally and runs the scraper against it.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scraper_optimized
+from db_writer import close_database_writer
+from http_client import create_session
+from replay_server import ReplayServer, open_recording_archive
+from testing_utils import SCHEMA_PATH
+
+DOCUMENT_PAGE = """<html><head>
+<meta property="eli:title" content="LEGGE 10 gennaio 2024, n. 1"/>
+<meta property="eli:type_document" resource="http://www.normattiva.it/eli#LEGGE"/>
+<meta property="eli:date_document" content="2024-01-10"/>
+</head><body>
+<div id="titoloAtto">LEGGE 10 gennaio 2024, n. 1 - Disposizioni di prova per il replay</div>
+<div class="bodyTesto">Testo del documento di prova</div>
+<ul>
+<li><a onclick="showArticle('/atto/caricaArticolo?art.progressivo=1')">art. 1</a></li>
+<li><a onclick="showArticle('/atto/caricaArticolo?art.progressivo=2')">art. 2</a></li>
+</ul>
+</body></html>"""
+
+ARTICLE_PAGE = """<html><body>
+<span id="artInizio" class="rosso">10-01-2024</span>
+<div class="bodyTesto">Art. {n}. Testo dell'articolo {n}, vedi <a href="https://www.normattiva.it/uri-res/N2Ls?urn:nir:2024;1~art1">art. 1</a></div>
+</body></html>"""
+
+
+def _record_archive(path):
+    """Archivio con il documento 2024;1 e i suoi due articoli"""
+    archive = open_recording_archive(path)
+    headers = {'Content-Type': 'text/html; charset=utf-8'}
+    archive.store("https://www.normattiva.it/uri-res/N2Ls?urn:nir:2024;1!multivigente~",
+                  200, headers, DOCUMENT_PAGE.encode('utf-8'))
+    for n in (1, 2):
+        archive.store(f"https://www.normattiva.it/atto/caricaArticolo?art.progressivo={n}",
+                      200, headers, ARTICLE_PAGE.format(n=n).encode('utf-8'))
+    archive.close()
+
+
+def test_replay_server_not_found_page():
+    """Gli URN non registrati ricevono la pagina di errore di normattiva"""
+    print("🧪 Testing stand-in 404 page...")
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, 'crawl.sqlite')
+        _record_archive(archive_path)
+        server = ReplayServer(archive_path, port=0)
+        base_url = server.start_in_background()
+        try:
+            with create_session(max_concurrency=2) as session:
+                response = session.get(f"{base_url}/uri-res/N2Ls?urn:nir:2024;999!multivigente~")
+                assert b'Errore nel caricamento delle informazioni' in response.content
+                response = session.get(f"{base_url}/uri-res/N2Ls?urn:nir:2024;1!multivigente~")
+                assert b'Disposizioni di prova per il replay' in response.content
+        finally:
+            server.stop()
+    print("✅ Stand-in pages OK")
+
+
+def test_scraper_against_replay():
+    """Scraping completo di un anno sul server locale, senza rete"""
+    print("🧪 Testing scraper in replay mode...")
+    original_cwd = os.getcwd()
+    original_url = scraper_optimized.normattiva_url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, 'crawl.sqlite')
+        _record_archive(archive_path)
+        shutil.copy(SCHEMA_PATH, tmp)
+        os.chdir(tmp)
+
+        server = ReplayServer(archive_path, port=0)
+        scraper_optimized.normattiva_url = server.start_in_background()
+        try:
+            scraper_optimized.init_optimized_database()
+            with create_session(max_concurrency=2) as session:
+                processed = scraper_optimized.process_year_sequential(2024, 3, session)
+            assert processed == 1, processed
+            close_database_writer()
+
+            conn = sqlite3.connect('data.sqlite')
+            documents = conn.execute("SELECT urn FROM documenti_normativi").fetchall()
+            articles = conn.execute("SELECT numero_articolo FROM articoli ORDER BY numero_articolo").fetchall()
+            conn.close()
+            assert documents == [('urn:nir:2024;1',)], documents
+            assert articles == [('1',), ('2',)], articles
+            assert server.hits >= 3
+        finally:
+            server.stop()
+            scraper_optimized.normattiva_url = original_url
+            close_database_writer()
+            os.chdir(original_cwd)
+    print("✅ Replay scraping OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing offline replay mode...")
+    print("=" * 70)
+    test_replay_server_not_found_page()
+    test_scraper_against_replay()
+    print("=" * 70)
+    print("🎉 All replay tests passed!")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for the FTS5 search index (search_index.py)
+Runs offline on a temporary copy of the optimized schema.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_writer import DatabaseWriter, DatabaseWriterThread, DocumentRecord, ArticleRecord, ArticleUpdateRecord
+from search_index import SearchIndex, build_match_query, ensure_search_index
+from testing_utils import create_test_database
+
+def _document_record(numero):
+    urn = f"urn:nir:2024;{numero}"
+    return DocumentRecord(urn, str(numero), 2024, 'Legge', [
+        str(numero), 2024, 'Legge', f"LEGGE n. {numero}", '2024-01-01',
+        'Altro', 'vigente', 2, None, urn, ''
+    ])
+
+
+def _article_row(documento_id, numero, testo, tipo_versione='orig', numero_aggiornamento=None):
+    return [documento_id, numero, 'LEGGE di prova', testo, testo, '[]', '[]', None, None, '', 'vigente',
+            None, tipo_versione, numero_aggiornamento]
+
+
+def test_match_query():
+    """Testo libero -> termini tra virgolette, nessun operatore FTS5 interpretato"""
+    print("🧪 Testing MATCH query builder...")
+    assert build_match_query('responsabilità "civile" OR -danno') == '"responsabilità" "civile" "OR" "danno"'
+    assert build_match_query("dell'articolo", prefix=True) == '"dell"* "articolo"*'
+    assert build_match_query(' ( ) ') == ''
+    print("✅ MATCH query builder OK")
+
+
+def test_index_follows_writer():
+    """Righe scritte dal writer (testi nel deposito), aggiornate e cancellate: l'indice resta allineato"""
+    print("🧪 Testing FTS5 index maintenance...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        conn = create_test_database(db_path, versioning=True)
+        # Riga salvata prima dell'indice: inclusa dalla ricostruzione iniziale
+        conn.execute("INSERT INTO documenti_normativi (numero, anno, tipo_atto, titoloAtto, data_pubblicazione, urn) "
+                     "VALUES ('9', 2023, 'Legge', 'LEGGE n. 9', '2023-01-01', 'urn:nir:2023;9')")
+        conn.execute("INSERT INTO articoli (documento_id, numero_articolo, titoloAtto, testo_completo, testo_pulito) "
+                     "VALUES (1, '1', 'LEGGE n. 9', 'Disciplina della pesca', 'Disciplina della pesca')")
+        conn.commit()
+        assert ensure_search_index(conn) == ['articoli_fts', 'commi_fts']
+        assert ensure_search_index(conn) == []
+        conn.close()
+
+        writer = DatabaseWriterThread(DatabaseWriter(db_path))
+        assert writer.capabilities.has_text_store
+        doc_id = writer.submit(_document_record(1)).result().ids[0]
+        rows = [
+            _article_row(doc_id, '1', "La responsabilità dell'ente è esclusa."),
+            _article_row(doc_id, '1', "La responsabilità dell'ente è esclusa.", 'agg.1', 1),
+            _article_row(doc_id, '1', "Sanzioni amministrative pecuniarie.", 'current'),
+        ]
+        base_id, agg_id, current_id = writer.submit(ArticleRecord(doc_id, '1', rows)).result().ids
+        writer.submit(ArticleRecord(doc_id, '2', [_article_row(doc_id, '2', "Disposizioni finanziarie.")])).result()
+        writer.flush()
+
+        index = SearchIndex(db_path)
+        # Maiuscole e accenti ripiegati; l'elisione separa "dell'"
+        results = index.search_articoli('RESPONSABILITA ente')
+        assert [r['articolo_id'] for r in sorted(results, key=lambda r: r['articolo_id'])] == [base_id, agg_id], results
+        assert {r['urn'] for r in results} == {'urn:nir:2024;1'}
+        assert results[0]['snippet'].startswith('La [responsabilità]'), results[0]['snippet']
+        assert index.search_articoli('responsabilita', tipo_versione='agg.1')[0]['numero_aggiornamento'] == 1
+        assert [r['articolo_id'] for r in index.search_articoli('sanzion', prefix=True)] == [current_id]
+        assert index.search_articoli('sanzion') == []
+        assert [r['urn'] for r in index.search_articoli('pesca')] == ['urn:nir:2023;9']
+
+        # --update: la versione corrente cambia testo
+        refreshed = _article_row(doc_id, '1', "Sanzioni interdittive.", 'current')
+        writer.submit(ArticleUpdateRecord(doc_id, '1', base_id, [], [(current_id, refreshed)])).result()
+        writer.close()
+        assert index.search_articoli('pecuniarie') == []
+        assert [r['articolo_id'] for r in index.search_articoli('interdittive')] == [current_id]
+
+        # Commi inseriti e articoli cancellati da altri script
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO commi (articolo_id, numero_comma, testo) VALUES (?, 1, 'Le sanzioni interdittive sono')",
+                     [current_id])
+        conn.execute("DELETE FROM articoli WHERE numero_articolo = '2'")
+        conn.commit()
+        commi = index.search_commi('interdittive')
+        assert [(r['articolo_id'], r['numero_comma'], r['tipo_versione']) for r in commi] == [(current_id, 1, 'current')]
+        assert index.search_articoli('finanziarie') == []
+        for table in ('articoli_fts', 'commi_fts'):
+            conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('integrity-check', 1)")
+        conn.close()
+        index.close()
+    print("✅ FTS5 index maintenance OK")
+
+
+def test_bm25_query_speed():
+    """Ricerca BM25 su molte righe: tempo nell'ordine dei millisecondi"""
+    print("🧪 Testing BM25 query speed...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        conn = create_test_database(db_path, versioning=True)
+        ensure_search_index(conn)
+        conn.execute("INSERT INTO documenti_normativi (numero, anno, tipo_atto, titoloAtto, data_pubblicazione, urn) "
+                     "VALUES ('1', 2024, 'Legge', 'LEGGE n. 1', '2024-01-01', 'urn:nir:2024;1')")
+        words = ['termine', 'contratto', 'obbligo', 'sanzione', 'ente', 'decreto', 'comma', 'regolamento']
+        conn.executemany(
+            "INSERT INTO articoli (documento_id, numero_articolo, titoloAtto, testo_completo, testo_pulito) VALUES (1, ?, 'LEGGE', '', ?)",
+            [(str(i), ' '.join(words[(i * k) % len(words)] for k in range(1, 30)) + (' appalto' if i % 1000 == 0 else ''))
+             for i in range(50000)]
+        )
+        conn.commit()
+        conn.close()
+
+        index = SearchIndex(db_path)
+        started = time.perf_counter()
+        results = index.search_articoli('appalto termine', limit=10)
+        elapsed = time.perf_counter() - started
+        index.close()
+        assert len(results) == 10, len(results)
+        print(f"   50000 articles, top-10 in {elapsed * 1000:.1f} ms")
+    print("✅ BM25 query speed OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing full-text search index...")
+    print("=" * 70)
+    test_match_query()
+    test_index_follows_writer()
+    test_bm25_query_speed()
+    print("=" * 70)
+    print("🎉 All search index tests passed!")
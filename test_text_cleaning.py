@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for the compiled clean_article_text engine (text_cleaning.py)
+Confronta l'output con l'implementazione originale su un corpus fisso.
+"""
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from text_cleaning import clean_article_text, _CASE_FOLD
+from benchmark_clean_text import build_corpus, clean_article_text_reference
+
+
+def test_matches_reference_on_corpus():
+    """Output identico all'implementazione originale sul corpus fisso"""
+    print("🧪 Testing compiled cleaner against the reference implementation...")
+    corpus = build_corpus(500)
+    for text in corpus:
+        assert clean_article_text(text) == clean_article_text_reference(text), text
+    print(f"✅ {len(corpus)} texts identical")
+
+
+def test_edge_cases():
+    """Parentesi vuote annidate, caratteri equiparati dall'IGNORECASE, 'nascondi' finale"""
+    print("🧪 Testing cleaner edge cases...")
+    cases = [
+        None, "", "   \n\t", "[()]", "([ ])", "Art. 1 ( ) [ ] testo",
+        "ſtampa queſta pagina e poi altro", "Torna ſu", "\u212aELVIN: torna all'inizio",
+        "İl menu dı navigazione", "Testo\n\nnascondi \n", "nascondi e testo",
+        "vigente dal 2000, in vigore al 01/02/2000", "vigente al 1/2/2000",
+        "(GU n.12 del 16-01-2024) Art. 1", "(gu  n.12  del 16-01-2024)",
+        "Mostra|nascondI", "articolo 1, precedente al successivo",
+    ]
+    for text in cases:
+        assert clean_article_text(text) == clean_article_text_reference(text), text
+
+    assert clean_article_text("Testo\n\n  1.  Comma ( ) unico  ") == "Testo 1. Comma unico"
+    assert clean_article_text("Art. 1 (GU n.12 del 16-01-2024) Testo") == "Art. 1  Testo"
+    print("✅ Cleaner edge cases OK")
+
+
+def test_case_fold_covers_ignorecase():
+    """Ogni carattere che re.IGNORECASE equipara a una lettera ASCII viene piegato su quella lettera"""
+    print("🧪 Testing case folding table...")
+    ascii_letter = re.compile(r'[a-z]', re.IGNORECASE)
+    for code in range(0x110000):
+        char = chr(code)
+        if ascii_letter.fullmatch(char):
+            folded = char.translate(_CASE_FOLD)
+            assert len(folded) == 1 and 'a' <= folded <= 'z', hex(code)
+            assert re.fullmatch(folded, char, re.IGNORECASE), hex(code)
+    print("✅ Case folding table OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing compiled text cleaning engine...")
+    print("=" * 70)
+    test_matches_reference_on_corpus()
+    test_edge_cases()
+    test_case_fold_covers_ignorecase()
+    print("=" * 70)
+    print("🎉 All text cleaning tests passed!")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental --update mode of scraper_optimized.py
+Runs offline: local HTTP server for the article pages, temporary database.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_writer import get_database_writer, close_database_writer, set_schema_capabilities, SchemaCapabilities
+from http_client import create_session
+from scraper_optimized import DocumentContext, process_article_with_versions, update_stats
+from testing_utils import create_test_database
+
+PAGES = {}
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+    """Pagine degli articoli da PAGES; conta le richieste per percorso"""
+    hits = {}
+
+    def do_GET(self):
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        body = PAGES.get(self.path, b'')
+        self.send_response(200 if body else 404)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _page(text):
+    return (f'<html><body><span id="artInizio" class="rosso">01-02-2024</span>'
+            f'<div class="bodyTesto">{text}</div></body></html>').encode()
+
+
+def _version(base_url, path, tipo_versione, numero_aggiornamento=None):
+    return {
+        'url': f"{base_url}{path}",
+        'version_info': {
+            'tipo_versione': tipo_versione,
+            'numero_aggiornamento': numero_aggiornamento,
+            'is_current': tipo_versione == 'current'
+        }
+    }
+
+
+def _create_database(path):
+    conn = create_test_database(path, versioning=True)
+    conn.execute("INSERT INTO documenti_normativi (numero, anno, tipo_atto, titoloAtto, data_pubblicazione, urn) "
+                 "VALUES ('1', 2024, 'Legge', 'LEGGE 1 gennaio 2024, n. 1', '2024-01-01', 'urn:nir:2024;1')")
+    conn.commit()
+    # Come init_optimized_database: capacità dello schema registrate prima di avviare il writer
+    set_schema_capabilities(SchemaCapabilities.from_connection(conn))
+    conn.close()
+
+
+def test_update_appends_new_versions():
+    """Solo le versioni nuove e la corrente vengono scaricate; agg.N aggiunte sotto la base esistente"""
+    print("🧪 Testing --update article versions...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ArticleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.sqlite')
+        _create_database(db_path)
+        writer = get_database_writer(db_path)
+        context = DocumentContext(1, 'LEGGE 1 gennaio 2024, n. 1', existing=True)
+        try:
+            with create_session(max_concurrency=2, rate=None) as session:
+                # Prima esecuzione: versione originale e corrente
+                PAGES.update({'/orig': _page("Testo originale"), '/current': _page("Testo vigente")})
+                first = [_version(base_url, '/current', 'current'), _version(base_url, '/orig', 'orig')]
+                base_id = process_article_with_versions('1', first, session, 1, base_url, context=context).result().ids[0]
+
+                # Nessuna versione nuova: nessuna richiesta, nessuna scrittura
+                ArticleHandler.hits.clear()
+                stored = writer.get_articolo_versions(1)['1']
+                unchanged = process_article_with_versions('1', list(first), session, 1, base_url,
+                                                          context=context, stored=stored)
+                assert unchanged == stored['base_id'] and ArticleHandler.hits == {}
+
+                # agg.1 pubblicato: scaricate solo agg.1 e la corrente aggiornata
+                PAGES.update({'/agg1': _page("Testo modificato"), '/current': _page("Testo vigente modificato")})
+                updated = first + [_version(base_url, '/agg1', 'agg.1', 1)]
+                result = process_article_with_versions('1', updated, session, 1, base_url,
+                                                       context=context, stored=stored).result()
+                assert ArticleHandler.hits == {'/agg1': 1, '/current': 1}, ArticleHandler.hits
+                assert len(result.ids) == 1
+                assert update_stats['unchanged'] >= 1 and update_stats['appended'] >= 1
+        finally:
+            close_database_writer()
+            server.shutdown()
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT id, tipo_versione, articolo_base_id, testo_completo FROM articoli ORDER BY id").fetchall()
+        conn.close()
+        assert base_id == rows[0][0]
+        assert [(tipo, base, testo) for _, tipo, base, testo in rows] == [
+            ('orig', None, "Testo originale"),
+            ('current', base_id, "Testo vigente modificato"),
+            ('agg.1', base_id, "Testo modificato"),
+        ], rows
+    print("✅ --update article versions OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing incremental update mode...")
+    print("=" * 70)
+    test_update_appends_new_versions()
+    print("=" * 70)
+    print("🎉 All update mode tests passed!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent year boundary discovery (year_discovery.py)
+Runs offline with a simulated set of existing document numbers.
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from year_discovery import find_last_document
+
+
+def _simulated_year(last, gaps=()):
+    """Funzione di verifica che conta le richieste (anche concorrenti)"""
+    calls = []
+    lock = threading.Lock()
+
+    def exists(numero):
+        with lock:
+            calls.append(numero)
+        return numero <= last and numero not in gaps
+
+    return exists, calls
+
+
+def test_finds_last_document():
+    """L'ultimo documento viene trovato per anni piccoli, medi e al limite di max_search"""
+    print("🧪 Testing boundary discovery...")
+    for last in (0, 1, 5, 137, 1500, 49999, 50000):
+        exists, calls = _simulated_year(last)
+        found, probes, rounds = find_last_document(exists, max_search=50000)
+        assert found == last, (last, found)
+        assert probes == len(calls) == len(set(calls)), "every number is fetched at most once"
+        print(f"   last={last}: {probes} probes in {rounds} rounds")
+    print("✅ Boundary discovery OK")
+
+
+def test_tolerates_sparse_gaps():
+    """Un buco nella numerazione più corto della finestra non tronca l'anno"""
+    print("🧪 Testing gap tolerance...")
+    exists, _ = _simulated_year(1500, gaps={750, 751, 1499})
+    found, _, _ = find_last_document(exists, max_search=50000, gap_window=3)
+    assert found == 1500, found
+    print("✅ Gap tolerance OK")
+
+
+def test_fewer_rounds_than_binary_search():
+    """Con 4 verifiche per round servono meno round dei ~16 passi della ricerca binaria"""
+    print("🧪 Testing round count...")
+    exists, _ = _simulated_year(2345)
+    _, _, rounds = find_last_document(exists, max_search=50000, probes_per_round=4)
+    assert rounds <= 10, rounds
+    print(f"✅ {rounds} rounds")
+
+
+def test_probe_errors_propagate():
+    """Un errore durante il probing interrompe la ricerca invece di contare come numero mancante"""
+    print("🧪 Testing probe errors...")
+    exists, _ = _simulated_year(1500)
+
+    def flaky(numero):
+        if numero == 1024:
+            raise ConnectionError("simulated timeout")
+        return exists(numero)
+
+    try:
+        find_last_document(flaky, max_search=50000)
+        assert False, "the error should propagate"
+    except ConnectionError:
+        pass
+    print("✅ Probe errors OK")
+
+
+if __name__ == "__main__":
+    print("🔧 Testing year boundary discovery...")
+    print("=" * 70)
+    test_finds_last_document()
+    test_tolerates_sparse_gaps()
+    test_fewer_rounds_than_binary_search()
+    test_probe_errors_propagate()
+    print("=" * 70)
+    print("🎉 All discovery tests passed!")
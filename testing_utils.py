@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the offline test scripts (test_*.py)
+Database temporanei creati da database_schema.sql, come data.sqlite dopo init_optimized_database.
+"""
+
+import os
+import sqlite3
+
+from db_writer import ensure_text_store
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_schema.sql')
+
+# Colonne aggiunte da init_optimized_database per il versioning degli articoli
+VERSION_COLUMNS = (
+    ('articolo_base_id', 'INTEGER'),
+    ('tipo_versione', "TEXT DEFAULT 'orig'"),
+    ('numero_aggiornamento', 'INTEGER'),
+)
+
+
+def create_test_database(path, versioning=False, text_store=False):
+    """
+    Crea un database dallo schema ottimizzato e restituisce la connessione aperta.
+
+    Args:
+        path: file del database (di solito in una TemporaryDirectory)
+        versioning: aggiunge le colonne di versioning ad articoli
+        text_store: crea il deposito dei testi per hash (testi_articoli, vista articoli_testo)
+    """
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    if versioning:
+        for column, definition in VERSION_COLUMNS:
+            conn.execute(f"ALTER TABLE articoli ADD COLUMN {column} {definition}")
+    if text_store:
+        ensure_text_store(conn)
+    conn.commit()
+    return conn
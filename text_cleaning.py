@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Compiled text cleaning engine for NORMATTIVA-SCRAPE
+clean_article_text viene eseguita per ogni articolo, versione, allegato e documento.
+La versione originale faceva circa 30 re.sub per chiamata, ricompilando i pattern
+di navigazione (IGNORECASE|DOTALL) e percorrendo tutto il testo con i ".*?" anche
+quando le parole chiave non c'erano.
+
+Questo modulo produce esattamente lo stesso output (verificato da
+benchmark_clean_text.py e test_text_cleaning.py) con:
+- pattern compilati una volta all'import
+- le tre sostituzioni su '\\n' eliminate: dopo \\s+ -> ' ' il testo non contiene più
+  '\\n', quindi erano sempre no-op
+- pattern di navigazione eseguiti sul testo "piegato" in minuscolo senza IGNORECASE
+  (la piegatura conserva le posizioni, i tratti trovati si tolgono dal testo originale)
+- fast path: un pattern viene eseguito solo se le sue parole chiave compaiono nel
+  testo nell'ordine richiesto, quindi i ".*?" non scansionano più testi in cui non
+  possono trovare nulla
+
+I pattern di navigazione restano applicati uno dopo l'altro nell'ordine originale:
+un'unica alternanza cambierebbe il risultato quando due pattern si sovrappongono
+(es. 'nascondi.*?visualizza.*?atto.*?intero' e 'visualizza.*?atto.*?intero').
+Un'alternanza delle prime parole chiave fa da filtro rapido per i testi senza navigazione.
+"""
+
+import re
+import string
+
+_WHITESPACE = re.compile(r'\s+')
+_EMPTY_PARENTHESES = re.compile(r'\s*\(\s*\)')
+_EMPTY_BRACKETS = re.compile(r'\s*\[\s*\]')
+
+_DATE_SLASH = re.compile(r'\d{2}/\d{2}/\d{4}')
+_DATE_DASH = re.compile(r'\d{2}-\d{2}-\d{4}')
+
+# (pattern, parole chiave nell'ordine in cui il pattern le richiede).
+# I pattern sono quelli originali (IGNORECASE) scritti in minuscolo: si applicano al testo piegato.
+# Una parola chiave può essere una regex (le date), cercata dopo la precedente.
+NAVIGATION_PATTERNS = [
+    (r'nascondi.*?visualizza.*?atto.*?intero', ('nascondi', 'visualizza', 'atto', 'intero')),
+    (r'precedente.*?successivo', ('precedente', 'successivo')),
+    (r'stampa.*?questa.*?pagina', ('stampa', 'questa', 'pagina')),
+    (r'torna.*?su', ('torna', 'su')),
+    (r'vai.*?al.*?contenuto', ('vai', 'al', 'contenuto')),
+    (r'menu.*?di.*?navigazione', ('menu', 'di', 'navigazione')),
+    (r'testo.*?in.*?vigore.*?dal.*?\d{2}/\d{2}/\d{4}', ('testo', 'in', 'vigore', 'dal', _DATE_SLASH)),
+    (r'vigente.*?al.*?\d{2}/\d{2}/\d{4}', ('vigente', 'al', _DATE_SLASH)),
+    (r'gazzetta.*?ufficiale', ('gazzetta', 'ufficiale')),
+    (r'visualizza.*?atto.*?intero', ('visualizza', 'atto', 'intero')),
+    (r'elemento.*?grafico', ('elemento', 'grafico')),
+    (r'articolo.*?precedente', ('articolo', 'precedente')),
+    (r'articolo.*?successivo', ('articolo', 'successivo')),
+    (r'mostra.*?nascond[i|ere]', ('mostra', 'nascond')),
+    (r'chiudi.*?apri', ('chiudi', 'apri')),
+    (r'cerca.*?ricerca', ('cerca', 'ricerca')),
+    (r'home.*?indietro', ('home', 'indietro')),
+    (r'condividi.*?stampa', ('condividi', 'stampa')),
+    (r'\(gu\s+n\.\d+\s+del\s+\d{2}-\d{2}-\d{4}\)', ('(gu', 'del', _DATE_DASH)),
+    (r'visualizza\s+atto\s+intero', ('visualizza', 'atto', 'intero')),
+    (r'nascondi\s*$', ('nascondi',)),
+    (r'vigente\s+al\s+\d{2}/\d{2}/\d{4}', ('vigente', 'al', _DATE_SLASH)),
+]
+
+_COMPILED_NAVIGATION = [
+    (re.compile(pattern, re.DOTALL), keywords)
+    for pattern, keywords in NAVIGATION_PATTERNS
+]
+
+# Filtro rapido: nessuna prima parola chiave nel testo -> nessun pattern può trovare qualcosa
+_NAVIGATION_TRIGGER = re.compile('|'.join(sorted({re.escape(keywords[0]) for _, keywords in NAVIGATION_PATTERNS})))
+
+# Piegatura in minuscolo che conserva la lunghezza: oltre a A-Z, i caratteri che
+# re.IGNORECASE considera uguali a una lettera ASCII (İ ı -> i, ſ -> s, segno Kelvin -> k).
+# Un pattern minuscolo sul testo piegato trova così gli stessi tratti del pattern
+# originale con IGNORECASE sul testo originale.
+_CASE_FOLD = str.maketrans({
+    **{upper: lower for upper, lower in zip(string.ascii_uppercase, string.ascii_lowercase)},
+    '\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k',
+})
+
+
+def _keywords_in_order(folded, keywords):
+    """True se le parole chiave compaiono in sequenza (condizione necessaria per il match)"""
+    position = 0
+    for keyword in keywords:
+        if isinstance(keyword, str):
+            position = folded.find(keyword, position)
+            if position < 0:
+                return False
+            position += len(keyword)
+        else:
+            match = keyword.search(folded, position)
+            if match is None:
+                return False
+            position = match.end()
+    return True
+
+
+def _remove_matches(regex, text, folded):
+    """Toglie da text e folded i tratti trovati dalla regex in folded"""
+    text_parts = []
+    folded_parts = []
+    last = 0
+    for match in regex.finditer(folded):
+        start, end = match.span()
+        text_parts.append(text[last:start])
+        folded_parts.append(folded[last:start])
+        last = end
+    if not text_parts:
+        return text, folded
+    text_parts.append(text[last:])
+    folded_parts.append(folded[last:])
+    return ''.join(text_parts), ''.join(folded_parts)
+
+
+def clean_article_text(text):
+    """Clean article text by removing extra whitespace and normalizing"""
+    if not text:
+        return ""
+
+    # Remove multiple whitespaces (anche i line break: niente '\n' nel testo da qui in poi)
+    text = _WHITESPACE.sub(' ', text)
+
+    # Clean up common legal document artifacts
+    if '(' in text:
+        text = _EMPTY_PARENTHESES.sub('', text)  # Empty parentheses
+    if '[' in text:
+        text = _EMPTY_BRACKETS.sub('', text)  # Empty brackets
+
+    # Remove navigation patterns
+    folded = text.translate(_CASE_FOLD)
+    if _NAVIGATION_TRIGGER.search(folded) is None:
+        return text.strip()
+
+    for regex, keywords in _COMPILED_NAVIGATION:
+        if _keywords_in_order(folded, keywords):
+            text, folded = _remove_matches(regex, text, folded)
+
+    return text.strip()
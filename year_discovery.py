@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Year boundary discovery for scraper_optimized.py
+Trova l'ultimo numero di documento di un anno senza la ricerca binaria seriale
+(circa 16 GET in sequenza, fino a 5 formati URN ciascuna prima del 1900).
+
+Algoritmo:
+- probing esponenziale (1, 4, 16, 64, ...) per delimitare l'intervallo [lo, hi)
+- probing k-ario dentro l'intervallo: ad ogni round PROBES_PER_ROUND punti verificati in parallelo
+- ogni punto mancante viene ricontrollato su una piccola finestra (GAP_WINDOW numeri
+  successivi), così un buco isolato nella numerazione non tronca l'anno
+
+La funzione di verifica viene passata come parametro (come in crawl_engine.py),
+così il modulo non importa scraper_optimized.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration constants
+PROBES_PER_ROUND = 4  # Punti verificati in parallelo per round (default: limite della sessione)
+GROWTH_FACTOR = 4  # Passo del probing esponenziale
+GAP_WINDOW = 3  # Numeri consecutivi che devono mancare perché un punto conti come mancante
+
+
+class YearBoundaryFinder:
+    """Ricerca concorrente dell'ultimo documento esistente in 1..max_search"""
+
+    def __init__(self, exists, max_search=50000, probes_per_round=PROBES_PER_ROUND, gap_window=GAP_WINDOW):
+        """
+        Args:
+            exists: funzione numero -> bool (True se il documento esiste); le sue eccezioni
+                interrompono la ricerca
+            max_search: numero massimo verificato
+            probes_per_round: punti verificati in parallelo in ogni round
+            gap_window: numeri consecutivi verificati prima di considerare un punto mancante
+        """
+        self.exists = exists
+        self.max_search = max_search
+        self.probes_per_round = max(1, int(probes_per_round))
+        self.gap_window = max(1, int(gap_window))
+        self.results = {}  # numero -> bool, ogni numero viene scaricato una sola volta
+        self.rounds = 0
+
+    @property
+    def probes(self):
+        return len(self.results)
+
+    def _check(self, numero):
+        # Gli errori (timeout, 5xx) vengono propagati: contarli come mancanti abbasserebbe l'ultimo documento
+        return bool(self.exists(numero))
+
+    def _probe_numbers(self, numbers, executor):
+        numbers = [n for n in numbers if n not in self.results]
+        for numero, found in zip(numbers, executor.map(self._check, numbers)):
+            self.results[numero] = found
+
+    def _probe_points(self, points, executor):
+        """
+        Verifica i punti in parallelo; per quelli mancanti verifica la finestra successiva.
+        Restituisce {punto: numero più alto trovato nella finestra, o None}.
+        """
+        self.rounds += 1
+        self._probe_numbers(points, executor)
+
+        window = []
+        for point in points:
+            if not self.results[point]:
+                window.extend(range(point + 1, min(point + self.gap_window, self.max_search + 1)))
+        self._probe_numbers(window, executor)
+
+        found = {}
+        for point in points:
+            hits = [n for n in range(point, min(point + self.gap_window, self.max_search + 1)) if self.results.get(n)]
+            found[point] = max(hits) if hits else None
+        return found
+
+    def _narrow(self, lo, hi, points, executor):
+        """Un round: nuovo lo = documento più alto trovato, nuovo hi = primo punto mancante oltre lo"""
+        found = self._probe_points(points, executor)
+        for point in points:
+            if found[point] is not None:
+                lo = max(lo, found[point])
+        missing = [point for point in points if found[point] is None and point > lo]
+        return lo, min(missing + [hi])
+
+    def find_last(self):
+        """Restituisce l'ultimo numero esistente (0 se l'anno non ha documenti)"""
+        with ThreadPoolExecutor(max_workers=self.probes_per_round) as executor:
+            # Probing esponenziale: delimita l'intervallo che contiene l'ultimo documento
+            ladder = []
+            point = 1
+            while point < self.max_search:
+                ladder.append(point)
+                point *= GROWTH_FACTOR
+            ladder.append(self.max_search)
+
+            lo, hi = 0, self.max_search + 1
+            for start in range(0, len(ladder), self.probes_per_round):
+                lo, hi = self._narrow(lo, hi, ladder[start:start + self.probes_per_round], executor)
+                if hi <= self.max_search:
+                    break
+
+            # Probing k-ario dentro [lo, hi)
+            while hi - lo > 1:
+                span = hi - lo
+                if span - 1 <= self.probes_per_round:
+                    points = list(range(lo + 1, hi))
+                else:
+                    step = span / (self.probes_per_round + 1)
+                    points = sorted({lo + int(step * i) for i in range(1, self.probes_per_round + 1)})
+                    points = [p for p in points if lo < p < hi]
+                lo, hi = self._narrow(lo, hi, points, executor)
+
+        return lo
+
+
+def find_last_document(exists, max_search=50000, probes_per_round=PROBES_PER_ROUND, gap_window=GAP_WINDOW):
+    """Ultimo documento esistente, con il numero di richieste e di round usati"""
+    finder = YearBoundaryFinder(exists, max_search, probes_per_round, gap_window)
+    last = finder.find_last()
+    return last, finder.probes, finder.rounds